@@ -1,16 +1,10 @@
-import argparse
-import sys
 import pandas as pd
 import numpy as np
 from datetime import datetime
 from binance.client import Client
-from types import SimpleNamespace
-import pickle
 
-from services.technical_indicators import apply_indicators
-from services.trade_logic import check_buy_sell_signals
-from utils.logger import test_logger
-from config.profile_loader import get_profile_by_name
+from services.indicator_state import IndicatorState
+from config.profile_loader import load_profile
 
 
 def fetch_klines(symbol, interval, start_str, end_str):
@@ -35,71 +29,67 @@ def fetch_klines(symbol, interval, start_str, end_str):
 
 
 def run_backtest(df, profile):
-    test_logger()
-    df = apply_indicators(df, profile)
+    # Индикаторы считаются инкрементально, как в price_processor: профиль неизменяемый (Profile),
+    # поэтому текущая свеча не записывается в него, а передается в IndicatorState
+    indicator_state = IndicatorState.from_profile(profile)
+    closes = df["close"].to_numpy(dtype=np.float64)
 
     usdt = 100
     asset = 0
     last_buy_price = 0
     trades = 0
 
-    for i in range(len(df)):
-        row = df.iloc[i]
-        profile.LAST_ROW = row
-        signal = check_buy_sell_signals(profile)
+    for close in closes.tolist():
+        indicator_state.update(close)
+        signal = indicator_state.signal(profile, close)
 
         if signal == "buy" and usdt >= profile.MIN_TRADE_AMOUNT:
-            qty = usdt / row["close"]
+            qty = usdt / close
             usdt = 0
             asset = qty
-            last_buy_price = row["close"]
+            last_buy_price = close
             trades += 1
-            print(f"🟢 BUY @ {row['close']:.4f}")
+            print(f"🟢 BUY @ {close:.4f}")
         elif signal == "sell" and asset > 0:
-            usdt = asset * row["close"]
-            pnl = ((row["close"] - last_buy_price) / last_buy_price) * 100
-            print(f"🔴 SELL @ {row['close']:.4f} | PnL: {pnl:.2f}%")
+            usdt = asset * close
+            pnl = ((close - last_buy_price) / last_buy_price) * 100
+            print(f"🔴 SELL @ {close:.4f} | PnL: {pnl:.2f}%")
             asset = 0
 
-    final_balance = usdt if usdt > 0 else asset * df.iloc[-1]["close"]
+    final_balance = usdt if usdt > 0 else asset * closes[-1]
     result = ((final_balance - 100) / 100) * 100
     print(f"\n📊 Итог: {final_balance:.2f} USDT ({result:.2f}%) за период")
     print(f"💼 Совершено сделок: {trades}")
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument("profile_name", nargs="?", default=None)
-    parser.add_argument("--from-pkl", action="store_true")
-    args = parser.parse_args()
-
-    if args.from_pkl:
-        with open("temp_profile.pkl", "rb") as f:
-            profile = pickle.load(f)
-    elif args.profile_name:
-        profile_dict = get_profile_by_name(args.profile_name)
-        profile = SimpleNamespace(**{k.upper(): v for k, v in profile_dict.items()})
-    else:
-        print("❌ Укажи имя профиля или --from-pkl")
-        sys.exit(1)
-
-    print(f"✅ Профиль: {profile.SYMBOL} | Таймфрейм: {profile.TIMEFRAME}")
-
+def _input_date(prompt: str) -> str:
     while True:
+        value = input(prompt).strip()
         try:
-            start = input("📅 Введите дату начала (например: 1 Apr, 2025): ").strip()
-            datetime.strptime(start, "%d %b, %Y")
-            break
+            datetime.strptime(value, "%d %b, %Y")
+            return value
         except ValueError:
             print("❌ Формат неверный. Пример: 3 May, 2025")
 
-    while True:
-        try:
-            end = input("📅 Введите дату окончания (например: 3 May, 2025): ").strip()
-            datetime.strptime(end, "%d %b, %Y")
-            break
-        except ValueError:
-            print("❌ Формат неверный. Пример: 3 May, 2025")
 
+def run_backtest_interactive(profile):
+    """
+    Запрашивает период, загружает свечи и запускает бэктест в текущем процессе.
+    Вызывается из CLI и из manage_profiles (без отдельного интерпретатора и повторного импорта pandas/numpy).
+    """
+    print(f"✅ Профиль: {profile.SYMBOL} | Таймфрейм: {profile.TIMEFRAME}")
+    start = _input_date("📅 Введите дату начала (например: 1 Apr, 2025): ")
+    end = _input_date("📅 Введите дату окончания (например: 3 May, 2025): ")
     df = fetch_klines(profile.SYMBOL, profile.TIMEFRAME, start, end)
-    run_backtest(df, profile)
\ No newline at end of file
+    run_backtest(df, profile)
+
+
+if __name__ == "__main__":
+    # CLI-зависимости загружаются только при запуске скрипта, а не при импорте run_backtest
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("profile_name")
+    args = parser.parse_args()
+
+    run_backtest_interactive(load_profile(args.profile_name))
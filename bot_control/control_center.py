@@ -10,7 +10,8 @@ CURRENT_STATE = {
     "main_task": None,       # Ссылка на asyncio.Task, выполняющую trade_main_for_telegram -> trade_main
     "listener_task": None,   # Ссылка на asyncio.Task для listen_klines (устанавливается из trade_main)
     "processor_task": None,  # Ссылка на asyncio.Task для price_processor (устанавливается из trade_main)
-    "stop_event": None       # Экземпляр threading.Event для сигнализации остановки (устанавливается из trade_main)
+    "stop_event": None,      # Экземпляр asyncio.Event для сигнализации остановки (устанавливается из trade_main)
+    "stop_event_setter": None  # Потокобезопасная установка stop_event из других потоков (loop.call_soon_threadsafe)
 }
 
 def get_status():
@@ -25,6 +26,19 @@ def get_status():
         "stop_event_is_set": CURRENT_STATE["stop_event"].is_set() if CURRENT_STATE["stop_event"] else "N/A",
     }
 
+def request_stop_threadsafe() -> bool:
+    """
+    Сигнализирует остановку активной сессии из любого потока (не только из цикла событий).
+    asyncio.Event не потокобезопасен, поэтому set() планируется в его цикл через stop_event_setter.
+    Возвращает False, если активной сессии нет.
+    """
+    setter = CURRENT_STATE.get("stop_event_setter")
+    if setter is None:
+        return False
+    setter()
+    return True
+
+
 async def _internal_stop_logic(context_msg: str = ""):
     """
     Внутренняя логика для корректной остановки всех активных компонентов.
@@ -35,13 +49,14 @@ async def _internal_stop_logic(context_msg: str = ""):
     log_context = f" (контекст: {context_msg})" if context_msg else ""
     system_logger.info(f"control_center: Запуск _internal_stop_logic{log_context}...")
 
-    # 1. Сигнализируем через threading.Event потоку _listen_thread о необходимости остановиться
+    # 1. Устанавливаем asyncio.Event: price_processor просыпается сразу, listen_klines закрывает WebSocket
+    # Мы в потоке цикла событий, поэтому set() вызывается напрямую (из других потоков - request_stop_threadsafe)
     stop_event = CURRENT_STATE.get("stop_event")
     if stop_event and not stop_event.is_set():
         system_logger.info(f"control_center: Установка stop_event{log_context}...")
         stop_event.set()
         activity_performed = True
-        # Даем небольшую паузу, чтобы поток _listen_thread и корутина listen_klines
+        # Даем небольшую паузу, чтобы listen_klines и price_processor
         # могли отреагировать на установку stop_event перед отменой asyncio задач.
         await asyncio.sleep(0.2) 
     elif stop_event and stop_event.is_set():
@@ -135,7 +150,7 @@ async def start_trading(profile_name: str, trade_runner_coro_func): # trade_runn
     # trade_runner_coro_func (т.е. trade_main_for_telegram) должна вызывать trade_main,
     # а trade_main уже сама создаст stop_event, listener_task, processor_task
     # и зарегистрирует их в CURRENT_STATE.
-    main_task = asyncio.create_task(trade_runner_coro_func(profile_name))
+    main_task = asyncio.create_task(trade_runner_coro_func(profile_name), name=f"session:{profile_name}")
     CURRENT_STATE["main_task"] = main_task # Сохраняем основную задачу
     
     # Небольшая пауза, чтобы дать время trade_main инициализироваться и заполнить 
@@ -187,6 +202,7 @@ async def stop_trading():
     CURRENT_STATE["listener_task"] = None
     CURRENT_STATE["processor_task"] = None
     CURRENT_STATE["stop_event"] = None # Удаляем/сбрасываем stop_event
+    CURRENT_STATE["stop_event_setter"] = None
     
     msg = "🛑 Торговля успешно остановлена."
     system_logger.info(f"control_center: {msg}")
@@ -1,6 +1,8 @@
+import functools
 import json
 import os
 import sys
+from dataclasses import dataclass
 from config.settings import COMMISSION_RATE, MIN_PROFIT_RATIO, STOP_LOSS_RATIO, TAKE_PROFIT_RATIO, PRICE_PRECISION, MIN_ORDER_QUANTITY, MIN_TRADE_AMOUNT
 
 PROFILE_FILE = os.path.join("config", "profiles.json")
@@ -15,6 +17,55 @@ DEFAULT_PARAMS = {
     "min_trade_amount": MIN_TRADE_AMOUNT
 }
 
+
+
+@dataclass(slots=True, frozen=True)
+class Profile:
+    """
+    Неизменяемые настройки торгового профиля (ключи profiles.json в верхнем регистре).
+    Слоты вместо __dict__ ускоряют доступ к атрибутам на горячем пути price_processor.
+    """
+    SYMBOL: str
+    TIMEFRAME: str
+    USE_RSI: bool = True
+    RSI_PERIOD: int = 14
+    RSI_OVERBOUGHT: float = 70.0
+    RSI_OVERSOLD: float = 30.0
+    USE_MACD: bool = True
+    MACD_FAST_PERIOD: int = 12
+    MACD_SLOW_PERIOD: int = 26
+    MACD_SIGNAL_PERIOD: int = 9
+    USE_MACD_FOR_BUY: bool = False
+    USE_MACD_FOR_SELL: bool = False
+    USE_EMA: bool = False
+    EMA_PERIOD: int = 50
+    EMA_BUFFER: float = 0.002
+    EMA_BUY_BUFFER: float = 0.002
+    EMA_SELL_BUFFER: float = 0.002
+    COMMISSION_RATE: float = COMMISSION_RATE
+    MIN_PROFIT_RATIO: float = MIN_PROFIT_RATIO
+    STOP_LOSS_RATIO: float = STOP_LOSS_RATIO
+    TAKE_PROFIT_RATIO: float = TAKE_PROFIT_RATIO
+    PRICE_PRECISION: int = PRICE_PRECISION
+    MIN_ORDER_QUANTITY: float = MIN_ORDER_QUANTITY
+    MIN_TRADE_AMOUNT: float = MIN_TRADE_AMOUNT
+    PRICE_QUEUE_MAXSIZE: int = 1024
+
+
+def build_profile(profile_dict: dict) -> Profile:
+    """
+    Создает Profile из словаря профиля. Ключи приводятся к верхнему регистру,
+    неизвестные ключи игнорируются. EMA_BUY_BUFFER / EMA_SELL_BUFFER наследуют
+    общий EMA_BUFFER, если не заданы отдельно.
+    """
+    values = {k.upper(): v for k, v in profile_dict.items()
+              if k.upper() in Profile.__dataclass_fields__}
+    if "EMA_BUFFER" in values:
+        values.setdefault("EMA_BUY_BUFFER", values["EMA_BUFFER"])
+        values.setdefault("EMA_SELL_BUFFER", values["EMA_BUFFER"])
+    return Profile(**values)
+
+
 def get_profile_by_name(name):
     if not os.path.exists(PROFILE_FILE):
         raise FileNotFoundError("profiles.json не найден")
@@ -30,6 +81,25 @@ def get_profile_by_name(name):
     profile.update(profiles[name])
     return profile
 
+@functools.lru_cache(maxsize=64)
+def _load_profile_cached(name: str, mtime_ns: int) -> Profile:
+    # mtime входит в ключ кэша: после правки profiles.json профиль будет прочитан заново
+    return build_profile(get_profile_by_name(name))
+
+
+def load_profile(name: str) -> Profile:
+    """
+    Profile по имени из profiles.json. Повторные запуски того же профиля (например, из Telegram)
+    не читают файл и не собирают Profile заново, пока файл не изменился.
+    Profile неизменяемый, поэтому один экземпляр безопасно отдавать нескольким сессиям.
+    """
+    try:
+        mtime_ns = os.stat(PROFILE_FILE).st_mtime_ns
+    except FileNotFoundError:
+        raise FileNotFoundError("profiles.json не найден") from None
+    return _load_profile_cached(name, mtime_ns)
+
+
 def load_profiles():
     if not os.path.exists(PROFILE_FILE):
         return {}
@@ -16,6 +16,10 @@ MIN_TRADE_AMOUNT = 5           # Минимальная сумма ордера
 USE_COMMISSION = True
 COMMISSION_RATE = 0.001  
 
+# Тип ответа Binance на ордер (newOrderRespType): 'RESULT' - без списка fills (ответ меньше, комиссия
+# оценивается по COMMISSION_RATE), 'FULL' - со списком fills и фактической комиссией
+ORDER_RESPONSE_TYPE = 'RESULT'
+
 USE_MIN_PROFIT = True
 MIN_PROFIT_RATIO = 0.05  
 
@@ -28,7 +32,13 @@ TAKE_PROFIT_RATIO = 0.05
 PRICE_PRECISION = 2            # Количество знаков после запятой для цены
 MIN_ORDER_QUANTITY = 1         # Минимальное количество для ордера
 
-
-
-
-
+# --- Цикл событий ---
+# Модуль с функцией install() для io_uring цикла (Linux >= 5.11). None - не использовать,
+# тогда выбирается uvloop, если установлен, иначе стандартный цикл asyncio.
+EVENT_LOOP_URING_MODULE = None
+# Ядро CPU, к которому привязывается поток цикла событий (прием WebSocket и обработка цен), только Linux.
+# None - без привязки. Привязка и EVENT_LOOP_NICE применяются только к потоку цикла событий:
+# пулы потоков (REST_EXECUTOR, стандартный executor цикла) восстанавливают исходные настройки.
+EVENT_LOOP_CPU = None
+# Изменение приоритета (nice) потока цикла событий; отрицательное значение требует CAP_SYS_NICE. 0 - не менять.
+EVENT_LOOP_NICE = 0
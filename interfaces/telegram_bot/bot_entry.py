@@ -10,7 +10,8 @@ from interfaces.telegram_bot.handlers import router
 # Импортируем control_center для вызова stop_trading при завершении
 from bot_control import control_center
 # Импортируем system_logger из правильного места
-from utils.logger import system_logger
+from utils.logger import system_logger, stop_log_listeners
+from utils.event_loop import run_event_loop
 # Импортируем logging для корректного shutdown логгера
 import logging
 
@@ -125,7 +126,7 @@ if __name__ == "__main__":
 
     try:
         # Запускаем основную асинхронную функцию main()
-        asyncio.run(main())
+        run_event_loop(main())
     except KeyboardInterrupt:
         # Этот блок может и не выполниться, т.к. SIGINT обрабатывается signal_handler,
         # который отменяет задачи asyncio, что приводит к завершению asyncio.run() через CancelledError внутри main.
@@ -134,6 +135,7 @@ if __name__ == "__main__":
         system_logger.critical(f"Критическая неперехваченная ошибка в __main__: {e}", exc_info=True)
     finally:
         system_logger.info("="*20 + " Завершение работы Telegram бота (bot_entry.py) " + "="*20)
+        stop_log_listeners()  # Дописываем записи из очередей логгеров до закрытия обработчиков
         # Дополнительная гарантия закрытия логов, хотя logging.shutdown() уже есть в main()
         if logging.getLogger().handlers: # Проверяем, есть ли еще обработчики
             logging.shutdown()
@@ -285,7 +285,13 @@ if __name__ == "__main__":
             if action == '1':
                 subprocess.run(["python", "run_trading_stream.py", profile_name])
             elif action == '2':
-                subprocess.run(["python", "backtest.py", profile_name])
+                # Бэктест выполняется в этом же процессе: модуль (pandas/numpy) импортируется один раз за сессию меню
+                from backtest import run_backtest_interactive
+                from config.profile_loader import load_profile
+                try:
+                    run_backtest_interactive(load_profile(profile_name))
+                except Exception as e:
+                    print(f"❌ Ошибка бэктеста: {e}")
             else:
                 print("↩️ Назад в меню")
 
@@ -1,32 +1,37 @@
 # run_trading_stream.py
 import asyncio
-import threading
-
-import sys
+import functools
+import json
+import time
 import logging
-from types import SimpleNamespace
-import numpy as np
-import collections
-
-from config import settings
-from utils.profit_check import is_stop_loss_triggered, is_take_profit_reached, is_enough_profit, should_block_sell_due_to_low_price
-from utils.notifier import send_notification
-from utils.quantity_utils import get_lot_size
-from utils.position_manager import sync_position_from_binance
-from config.profile_loader import get_profile_by_name
-from services.binance_stream import listen_klines
-from services.trade_logic import check_buy_sell_signals, get_initial_ohlcv
-from services.order_execution import place_order_async, get_asset_balance_async
-from utils.logger import system_logger, trading_logger
-from bot_control.control_center import CURRENT_STATE
-from utils.position_manager import (load_last_buy_price, has_open_position,
-                                    save_last_buy_price, clear_position)
 from decimal import Decimal
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from utils.profit_check import (is_stop_loss_triggered, is_take_profit_reached, is_enough_profit,
+                                RiskParams, load_risk_params)
+from utils.notifier import notify, flush_notifications
+from utils.quantity_utils import get_lot_size, get_symbol_meta_async, prewarm_lot_sizes
+from config.profile_loader import Profile, load_profile
+from services.binance_stream import BinanceStreamHub, listen_klines
+from services.trade_logic import get_initial_ohlcv
+from services.indicator_state import IndicatorState, warm_up_kernels
+from services.order_execution import place_order_async, get_asset_balance_async, FILL_SUMMARY_KEY
+from services.binance_client import close_async_client, run_rest_call
+from utils.logger import system_logger, trading_logger, did_log_recently, stop_log_listeners
+from utils.loop_queue import PriceQueue
+from bot_control.control_center import CURRENT_STATE
+from utils.position_manager import (load_position_cache, save_last_buy_price, clear_position,
+                                    sync_position_from_binance)
+from utils.position_store import position_flusher, flush_positions_async
+
 
 # --- Константы для управления историей цен ---
 
-# Максимальная длина истории цен (количество свечей), которую мы храним для расчета индикаторов.
+# Длина начальной истории цен (количество свечей), которой прогреваются индикаторы (IndicatorState).
 # Это значение должно быть достаточным для самого "длинного" периода индикатора, который ты используешь.
 # Например, если у тебя EMA с периодом 200, то PRICE_HISTORY_MAX_LEN должен быть не меньше 200.
 PRICE_HISTORY_MAX_LEN = 250
@@ -34,12 +39,19 @@ PRICE_HISTORY_MAX_LEN = 250
 # Это значение также зависит от периодов используемых индикаторов. Например, MACD(12,26,9) требует около 35+ свечей,
 # RSI(14) требует около 15+. Устанавливается с запасом.
 MIN_PRICE_HISTORY_FOR_TRADE = 50
+# Сколько секунд переиспользуется полученный баланс базового актива в риск-проверках.
+BALANCE_CACHE_TTL_SEC = 2.0
+# Баланс не больше этого значения считается нулевым (сравнение float вместо Decimal("0")).
+ZERO_BALANCE_EPS = 1e-12
 
 
-async def execute_trade_action(action_type, symbol, profile, reason_message, execution_price: float):
+async def execute_trade_action(action_type, symbol, profile, reason_message, execution_price: float,
+                               position: dict | None = None, balance_cache: dict | None = None):
     """
     Выполняет торговое действие: 'buy' или 'sell'.
     Оборачивает place_order с логированием и управлением состоянием позиции.
+    position - кэш позиции price_processor; обновляется после сохранения/сброса позиции на диске.
+    balance_cache - кэш баланса; после размещенного ордера помечается устаревшим.
     """
     try:
         system_logger.info(
@@ -47,86 +59,177 @@ async def execute_trade_action(action_type, symbol, profile, reason_message, exe
         trading_logger.info(
             f"Order Execution ({symbol}): Инициировано размещение ордера '{action_type}'...")
 
-        success = await place_order_async(action_type, symbol, profile)
-        if not success:
+        # MARKET-ордер: количество рассчитывается по балансу, цена закрытия передается для оценки стоимости
+        # и защиты от продажи в убыток
+        order_response = await place_order_async(symbol, action_type, order_type="MARKET",
+                                                 limit_price=Decimal(str(execution_price)), profile_name=symbol)
+        if balance_cache is not None and order_response:
+            balance_cache["ts"] = 0.0  # Ордер отправлен: баланс мог измениться
+        if not order_response:
             system_logger.warning(
                 f"Ордер '{action_type}' по {symbol} не был размещён — действие отменено.")
             return False
+        # EXPIRED / CANCELED / PARTIALLY_FILLED и т.п. - не исполненная сделка: позицию не меняем
+        status = order_response.get("status")
+        if status != "FILLED":
+            system_logger.warning(
+                f"Ордер '{action_type}' по {symbol} не исполнен (status={status!r}) — позиция не изменена.")
+            notify(f"⚠️ Ордер {action_type.upper()} по {symbol} не исполнен: статус {status}.")
+            return False
 
-        await send_notification(reason_message)
-
+        # Уведомление уходит в фоновую очередь; позиция меняется в памяти, на диск ее пишет position_flusher
+        notify(reason_message)
         if action_type == "buy":
-            save_last_buy_price(symbol, execution_price)
+            fill = order_response.get(FILL_SUMMARY_KEY)
+            if fill is not None and fill.executed_qty > 0:
+                # Риск-менеджмент считает от фактической средней цены исполнения, а не от цены закрытия свечи
+                save_last_buy_price(symbol, float(fill.avg_price), quantity=float(fill.executed_qty))
+            else:
+                system_logger.warning(
+                    f"Ордер BUY по {symbol}: детали исполнения недоступны, цена позиции - цена закрытия {execution_price}.")
+                save_last_buy_price(symbol, execution_price)
         elif action_type == "sell":
-
-            if should_block_sell_due_to_low_price(symbol, execution_price):
-                trading_logger.warning(
-                    f"❌ Защита внутри execute_trade_action: {symbol} — продажа отменена, цена ниже покупки ({execution_price})."
-                )
-                return False
-
             clear_position(symbol)
 
+        if position is not None:
+            position.update(load_position_cache(symbol))
         return True
 
     except Exception as e:
+        # Во время сбоя Binance ошибка повторяется каждый тик: полный трейсбек - не чаще раза в минуту на тип ошибки
         system_logger.error(
-            f"Price processor ({symbol}): Ошибка при размещении ордера '{action_type}': {e}", exc_info=True)
+            f"Price processor ({symbol}): Ошибка при размещении ордера '{action_type}': {e!r}",
+            exc_info=not did_log_recently(("execute_trade_action", type(e))))
         return False
 
 
+_QUOTE_ASSETS = ("USDT", "BUSD", "BTC", "ETH", "BNB")
+
+
+@functools.lru_cache(maxsize=256)
 def extract_base_asset(symbol: str) -> str:
     """
     Универсально извлекает base asset из symbol для любых пар.
     Например: 'XRPUSDT' -> 'XRP', 'ETHBTC' -> 'ETH'
     """
-    for quote in ["USDT", "BUSD", "BTC", "ETH", "BNB"]:
+    for quote in _QUOTE_ASSETS:
         if symbol.endswith(quote):
             return symbol[:-len(quote)]
     # fallback: если не нашли, возьми первые три-четыре символа
     return symbol[:3]
 
 
-async def check_and_handle_risk_conditions(symbol, profile, current_price, strategy_has_issued_sell):
+def _load_min_qty(symbol: str) -> float | None:
+    """Возвращает minQty из фильтра LOT_SIZE как float или None, если фильтр недоступен."""
+    _, min_qty = get_lot_size(symbol)
+    if min_qty is None:
+        system_logger.error(
+            f"{symbol}: Невозможно получить minQty — фильтр отсутствует.")
+        return None
+    return float(min_qty)
+
+
+async def _get_cached_balance(asset: str, balance_cache: dict) -> float | None:
+    """
+    Возвращает баланс актива (float), переиспользуя значение не старше BALANCE_CACHE_TTL_SEC.
+    Кэш сбрасывается в execute_trade_action после собственных ордеров.
+    """
+    now = time.monotonic()
+    if balance_cache["value"] is not None and now - balance_cache["ts"] < BALANCE_CACHE_TTL_SEC:
+        return balance_cache["value"]
+    balance = await get_asset_balance_async(asset)
+    if balance is None:
+        return None
+    balance = float(balance)
+    balance_cache["value"] = balance
+    balance_cache["ts"] = now
+    return balance
+
+
+@functools.lru_cache(maxsize=16)
+def build_risk_sell_trigger(risk: RiskParams):
+    """
+    Специализирует проверки риск-менеджмента под флаги сессии (вместо ветвления по флагам на каждом тике).
+    Возвращает функцию (symbol, current_price, last_buy_price, strategy_has_issued_sell) -> причина продажи или None,
+    в которую входят только включенные проверки. Варианты кэшируются по RiskParams.
+    """
+    use_sl, sl_ratio, use_tp, tp_ratio, use_mp, mp_ratio, _ = risk
+    below_entry_checks = []  # Ниже цены покупки может сработать только стоп-лосс (порог отрицательный)
+    above_entry_checks = []  # Выше или на уровне цены покупки - только TP и min-профит
+
+    if use_sl:
+        def stop_loss(symbol, current_price, last_buy_price, strategy_has_issued_sell):
+            if is_stop_loss_triggered(symbol, current_price, last_buy_price, True, sl_ratio):
+                return f"‼️ Stop-loss: {symbol} принудительно продается (цена {current_price:.6f}) из-за достижения уровня стоп-лосс."
+            return None
+        below_entry_checks.append(stop_loss)
+
+    if use_tp:
+        def take_profit(symbol, current_price, last_buy_price, strategy_has_issued_sell):
+            if is_take_profit_reached(symbol, current_price, last_buy_price, True, tp_ratio):
+                return f"✅ Take-profit: {symbol} достиг цели прибыли (цена {current_price:.6f}). Принудительная продажа."
+            return None
+        above_entry_checks.append(take_profit)
+
+    if use_mp:
+        # Минимальный профит - только если стратегия не дала sell
+        def min_profit(symbol, current_price, last_buy_price, strategy_has_issued_sell):
+            if not strategy_has_issued_sell and is_enough_profit(symbol, current_price, last_buy_price, enabled=True, ratio=mp_ratio):
+                return f"💰 Минимальный профит: {symbol} продается (цена {current_price:.6f}) без сигнала стратегии."
+            return None
+        above_entry_checks.append(min_profit)
+
+    below_entry_checks = tuple(below_entry_checks)
+    above_entry_checks = tuple(above_entry_checks)
+
+    def risk_sell_trigger(symbol, current_price, last_buy_price, strategy_has_issued_sell):
+        checks = below_entry_checks if current_price < last_buy_price else above_entry_checks
+        for check in checks:
+            reason = check(symbol, current_price, last_buy_price, strategy_has_issued_sell)
+            if reason is not None:
+                return reason
+        return None
+
+    return risk_sell_trigger
+
+
+async def check_and_handle_risk_conditions(symbol, profile, current_price, strategy_has_issued_sell, risk_sell_trigger,
+                                           min_qty: float | None, base_asset: str, position: dict,
+                                           balance_cache: dict):
     """
     Проверяет стоп-лосс, тейк-профит и min-профит. Выполняет sell, если нужно.
+    risk_sell_trigger собирается один раз при запуске price_processor (build_risk_sell_trigger),
+    min_qty и base_asset также вычисляются один раз.
+    Состояние позиции берется из кэша position (см. load_position_cache), без чтения файла на каждом тике;
+    диск затрагивается только при смене позиции, и этот ввод-вывод выполняется в рабочем потоке (asyncio.to_thread).
+    Если min_qty не удалось получить при запуске (None), фильтр LOT_SIZE запрашивается повторно.
+    Баланс запрашивается (через balance_cache) только когда сработал SL/TP/min-профит.
     Возвращает True, если была продажа.
     """
-    if not has_open_position(symbol):
+    if not position["open"]:
         system_logger.debug(
-            f"Risk Check: позиция по {symbol} уже закрыта — пропускаем проверку TP/SL/MinProfit.")
+            "Risk Check: позиция по %s уже закрыта — пропускаем проверку TP/SL/MinProfit.", symbol)
         return False
 
-    last_buy_price = load_last_buy_price(symbol)
+    last_buy_price = position["last_buy_price"]
     if last_buy_price is None:
         system_logger.warning(
             f"Risk Check: не удалось загрузить цену покупки для {symbol}. Пропускаем проверки.")
         return False
 
-    # 🔒 Жесткая защита: если цена ниже покупки и нет условий — продажа запрещена
-    if (
-        current_price < last_buy_price
-        and not is_stop_loss_triggered(symbol, current_price, last_buy_price,)
-        and not is_take_profit_reached(symbol, current_price, last_buy_price)
-        and not is_enough_profit(symbol, current_price, last_buy_price)
-    ):
-        system_logger.info(
-            f"❌ Продажа {symbol} отклонена: текущая цена {current_price:.6f} ниже цены покупки {last_buy_price:.6f}, "
-            f"и не сработал ни SL, ни TP, ни min profit."
-        )
+    # === Сначала определяем причину продажи: без нее баланс и LOT_SIZE не запрашиваются.
+    # Если ничего не сработало - продажа запрещена (жесткая защита от продажи ниже цены покупки).
+    reason = risk_sell_trigger(symbol, current_price, last_buy_price, strategy_has_issued_sell)
+    if reason is None:
         return False
 
     # === Защита от продаж при нулевом балансе (MinQty check)
-    step_size, min_qty = get_lot_size(symbol)
     if min_qty is None:
-        system_logger.error(
-            f"{symbol}: Невозможно получить minQty — фильтр отсутствует.")
-        return False
-
-    min_qty = Decimal(min_qty)
+        min_qty = await run_rest_call(_load_min_qty, symbol)
+        if min_qty is None:
+            return False
 
-    asset = extract_base_asset(symbol)
-    balance = await get_asset_balance_async(asset)
+    balance = await _get_cached_balance(base_asset, balance_cache)
 
     if balance is None:
         system_logger.error(
@@ -134,56 +237,58 @@ async def check_and_handle_risk_conditions(symbol, profile, current_price, strat
         )
         return False
 
-    if balance < min_qty and balance != Decimal("0"):
+    # Только если явно получен баланс = 0 (и не по ошибке API)
+    if balance <= ZERO_BALANCE_EPS:
+        clear_position(symbol)
+        position.update(load_position_cache(symbol))
+        system_logger.info(f"{symbol}: Баланс стал 0 — позиция сброшена.")
+        return False
+
+    if balance < min_qty:
         # Возможно, стоит подождать, не сбрасывать сразу
         system_logger.warning(
             f"{symbol}: Баланс {balance} меньше MinQty ({min_qty}). НЕ сбрасываю позицию, жду подтверждения на следующей итерации."
         )
         return False
 
-# Только если явно получен баланс = 0 (и не по ошибке API)
-    if balance == Decimal("0"):
-        clear_position(symbol)
-        system_logger.info(f"{symbol}: Баланс стал 0 — позиция сброшена.")
-        return False
-
-    # === Стоп-лосс
-    if settings.USE_STOP_LOSS and is_stop_loss_triggered(symbol, current_price, last_buy_price):
-        reason = f"‼️ Stop-loss: {symbol} принудительно продается (цена {current_price:.6f}) из-за достижения уровня стоп-лосс."
-        return await execute_trade_action("sell", symbol, profile, reason, current_price,)
-
-    # === Тейк-профит
-    if settings.USE_TAKE_PROFIT and is_take_profit_reached(symbol, current_price, last_buy_price, context="risk"):
-        reason = f"✅ Take-profit: {symbol} достиг цели прибыли (цена {current_price:.6f}). Принудительная продажа."
-        return await execute_trade_action("sell", symbol, profile, reason, current_price)
-
-    # === Минимальный профит (только если стратегия не дала sell)
-    if settings.USE_MIN_PROFIT and not strategy_has_issued_sell:
-        if is_enough_profit(symbol, current_price, last_buy_price):
-            reason = f"💰 Минимальный профит: {symbol} продается (цена {current_price:.6f}) без сигнала стратегии."
-            return await execute_trade_action("sell", symbol, profile, reason, current_price)
-
-    return False
+    return await execute_trade_action("sell", symbol, profile, reason, current_price, position, balance_cache)
 
 
 async def price_processor(
-    price_queue: asyncio.Queue,
-    profile: SimpleNamespace,
-    stop_event_ref: threading.Event
+    price_queue: PriceQueue,
+    profile: Profile,
+    stop_event_ref: asyncio.Event
 ):
     """
     Асинхронно обрабатывает цены из очереди, обновляет историю цен,
     вызывает торговую логику (включая риск-менеджмент) и размещает ордера.
+    Ожидание новой цены прерывается сразу по установке stop_event_ref.
+    Элементы price_queue - уже разобранные цены закрытия (float, см. listen_klines), без разбора JSON здесь.
     """
     symbol = profile.SYMBOL
     timeframe = profile.TIMEFRAME
+    risk = load_risk_params()
+    use_mp_strat = risk.use_min_profit_for_strategy_sell
+    risk_sell_trigger = build_risk_sell_trigger(risk)
+    # Инварианты символа на всю сессию: не пересчитываются на каждом тике
+    min_qty = await run_rest_call(_load_min_qty, symbol)
+    symbol_meta = await get_symbol_meta_async(symbol)  # Уже в кеше после _load_min_qty
+    base_asset = symbol_meta.base if symbol_meta is not None else extract_base_asset(symbol)
+    # Кэш позиции: обновляется после собственных сделок, а не на каждом тике.
+    # Первое обращение читает файл позиции - в рабочем потоке, дальше позиция берется из памяти
+    position = await asyncio.to_thread(load_position_cache, symbol)
+    balance_cache = {"value": None, "ts": 0.0}
+    reported_high_water = 0
+    reported_dropped = 0     # Число вытесненных из очереди цен, о котором уже сообщено
+    # Уровень логирования не меняется во время сессии: проверяем его один раз, а не на каждом тике
+    log_debug = system_logger.isEnabledFor(logging.DEBUG)
     system_logger.info(
         f"Price processor ({symbol}): ЗАПУЩЕН. Ожидание инициализации истории цен...")
 
     # --- 1. Инициализация истории цен ---
     try:
-        initial_close_prices_np = get_initial_ohlcv(
-            symbol, timeframe, limit=PRICE_HISTORY_MAX_LEN + 50)
+        initial_close_prices_np = await run_rest_call(
+            get_initial_ohlcv, symbol, timeframe, limit=PRICE_HISTORY_MAX_LEN + 50)
     except Exception as e:
         system_logger.error(
             f"Price processor ({symbol}): Критическая ошибка при вызове get_initial_ohlcv: {e}", exc_info=True)
@@ -198,99 +303,98 @@ async def price_processor(
             stop_event_ref.set()
         return
 
-    price_history_deque = collections.deque(
-        initial_close_prices_np[-(PRICE_HISTORY_MAX_LEN):],
-        maxlen=PRICE_HISTORY_MAX_LEN
-    )
+    # Индикаторы прогреваются всей загруженной историей и далее обновляются за O(1) на каждую цену
+    indicator_state = IndicatorState.from_profile(profile, initial_close_prices_np)
     system_logger.info(
-        f"Price processor ({symbol}): Инициализирована история цен, {len(price_history_deque)} записей (maxlen={PRICE_HISTORY_MAX_LEN}).")
+        f"Price processor ({symbol}): Индикаторы прогреты историей из {initial_close_prices_np.size} цен.")
 
+    # Задача ожидания остановки создается один раз и живет весь цикл обработки
+    stop_wait_task = asyncio.ensure_future(stop_event_ref.wait())
+    get_task = None
     try:
         while not stop_event_ref.is_set():
-            new_close_price = None
-            try:
-                new_close_price = await asyncio.wait_for(price_queue.get(), timeout=1.0)
-            except asyncio.TimeoutError:
-                if stop_event_ref.is_set():
-                    break
-                continue
-
-            system_logger.debug(
-                f"Price processor ({symbol}): Получена новая цена закрытия {new_close_price} из очереди.")
-            price_history_deque.append(new_close_price)
-            current_prices_np_for_indicators = np.array(price_history_deque)
-
-            if current_prices_np_for_indicators.size < MIN_PRICE_HISTORY_FOR_TRADE:
-                trading_logger.info(
-                    f"Price processor ({symbol}): Накапливаем историю, {current_prices_np_for_indicators.size}/{MIN_PRICE_HISTORY_FOR_TRADE} цен. Сигналы не проверяются.")
-                price_queue.task_done()
-                continue
+            get_task = asyncio.ensure_future(price_queue.get())
+            done, _ = await asyncio.wait(
+                {get_task, stop_wait_task}, return_when=asyncio.FIRST_COMPLETED)
+            if get_task not in done:
+                get_task.cancel()
+                break
+            new_close_price = get_task.result()
+            indicator_state.update(new_close_price)
+
+            # Забираем все уже накопившиеся цены: индикаторы обновляются всей пачкой за один вызов,
+            # а стратегия и риск-проверки выполняются один раз по последней цене
+            backlog = price_queue.pop_all()
+            drained = len(backlog)
+            if drained:
+                new_close_price = float(backlog[-1])
+                indicator_state.update_many(backlog)
+
+            if log_debug:
+                system_logger.debug(
+                    "Price processor (%s): Получена новая цена закрытия %s из очереди (дополнительно из пачки: %d).",
+                    symbol, new_close_price, drained)
+            if price_queue.high_water > reported_high_water:
+                reported_high_water = price_queue.high_water
+                if reported_high_water > 1:
+                    system_logger.warning(
+                        f"Price processor ({symbol}): Новый максимум очереди цен: {reported_high_water} из {profile.PRICE_QUEUE_MAXSIZE}. Обработка отстает от потока.")
+            if price_queue.dropped != reported_dropped:
+                # Вытеснение безопасно (важна только последняя цена закрытия), но означает, что история неполна
+                system_logger.warning(
+                    f"Price processor ({symbol}): Очередь цен переполнена, вытеснено {price_queue.dropped - reported_dropped} старых цен (всего {price_queue.dropped}).")
+                reported_dropped = price_queue.dropped
 
             # --- Шаг 1: Проверки риск-менеджмента (Стоп-лосс, Тейк-профит) ---
             # Эти проверки имеют приоритет. strategy_has_issued_sell здесь False, т.к. основная стратегия еще не вызывалась.
             # Передаем new_close_price для актуальной проверки.
-            risk_sell_executed = await check_and_handle_risk_conditions(symbol, profile, new_close_price, strategy_has_issued_sell=False)
+            risk_sell_executed = await check_and_handle_risk_conditions(
+                symbol, profile, new_close_price, strategy_has_issued_sell=False,
+                risk_sell_trigger=risk_sell_trigger, min_qty=min_qty, base_asset=base_asset, position=position,
+                balance_cache=balance_cache)
             if risk_sell_executed:
-                price_queue.task_done()
                 continue  # Позиция закрыта, переходим к следующей цене
 
             # --- Шаг 2: Основная торговая стратегия ---
-            strategy_action = check_buy_sell_signals(
-                profile,
-                current_prices_np_for_indicators,
-                new_close_price
-            )
+            strategy_action = indicator_state.signal(profile, new_close_price)
 
-            action_taken_this_cycle = False
             # === Сигнал стратегии: BUY ===
             if strategy_action == 'buy':
                 # --- Защита от повторной покупки ---
                 # Если позиция уже открыта (есть сохранённая цена покупки),
                 # то игнорируем сигнал на покупку, чтобы не купить дважды.
-                if has_open_position(symbol):
+                if position["open"]:
                     msg = f"🛑 Покупка отменена: позиция по {symbol} уже открыта."
                     system_logger.info(msg)
-                    await send_notification(msg)  # Уведомляем Telegram
-                    price_queue.task_done()       # Сообщаем очереди, что элемент обработан
+                    notify(msg)  # Уведомляем Telegram
                     continue                      # Пропускаем дальнейшую обработку
 
     # --- Выполнение покупки ---
     # Если позиции ещё нет, выполняем покупку
                 reason_msg_buy = f"📈 Стратегия ({symbol}) подала сигнал на ПОКУПКУ по цене {new_close_price:.6f}."
-                if await execute_trade_action("buy", symbol, profile, reason_msg_buy, new_close_price):
-                    action_taken_this_cycle = True
+                await execute_trade_action("buy", symbol, profile, reason_msg_buy, new_close_price, position, balance_cache)
 
+            # === Сигнал стратегии: SELL ===
             elif strategy_action == 'sell':
-                strategy_has_issued_sell = True
-
-    # Жёсткая защита — не продавать ниже цены покупки без TP/SL/min-profit
-                if should_block_sell_due_to_low_price(symbol, new_close_price):
-                    price_queue.task_done()
-                    continue
-
-    # Проверка минимального профита включается опционально через settings
-                if getattr(settings, "USE_MIN_PROFIT_FOR_STRATEGY_SELL", False):
-                    if not is_enough_profit(symbol, new_close_price):
-                        trading_logger.info(
-                            f"Price processor ({symbol}): Продажа по стратегии отменена из-за недостаточной прибыли (согласно is_enough_profit)."
-                        )
-                        price_queue.task_done()
-                        continue
-
-    # Если проверки нет, или профита достаточно — совершаем продажу!
-                reason_msg_sell = f"📉 Стратегия ({symbol}) подала сигнал на ПРОДАЖУ по цене {new_close_price:.6f}."
-                if await execute_trade_action("sell", symbol, profile, reason_msg_sell, new_close_price):
-                    action_taken_this_cycle = True
-
-            # --- Шаг 3: Проверка минимального профита (если не было других действий) ---
-            # Вызываем, только если стратегия сказала 'hold' (т.е. strategy_action == 'hold')
-            # и не было других действий по риску или стратегии в этом цикле
-            if not action_taken_this_cycle and strategy_action == 'hold':
-                # Передаем strategy_has_issued_sell=False, так как стратегия не дала сигнал на продажу
-                await check_and_handle_risk_conditions(symbol, profile, new_close_price, strategy_has_issued_sell=False)
-                # Результат этой функции уже обработан внутри нее (если была продажа)
-
-            price_queue.task_done()
+                last_buy_price = position["last_buy_price"]
+                proceed = True
+                # Жёсткая защита — стратегия не продает ниже цены покупки (это делает только стоп-лосс)
+                if last_buy_price is not None and new_close_price < last_buy_price:
+                    system_logger.debug(
+                        "❌ Продажа %s отклонена: текущая цена %.6f < цена покупки %.6f (без TP/SL)",
+                        symbol, new_close_price, last_buy_price)
+                    proceed = False
+                # Проверка минимального профита включается опционально через settings.USE_MIN_PROFIT_FOR_STRATEGY_SELL
+                elif use_mp_strat and not is_enough_profit(
+                        symbol, new_close_price, last_buy_price, context="strategy",
+                        enabled=True, ratio=risk.min_profit_ratio):
+                    trading_logger.info(
+                        f"Price processor ({symbol}): Продажа по стратегии отменена из-за недостаточной прибыли (согласно is_enough_profit).")
+                    proceed = False
+
+                if proceed:
+                    reason_msg_sell = f"📉 Стратегия ({symbol}) подала сигнал на ПРОДАЖУ по цене {new_close_price:.6f}."
+                    await execute_trade_action("sell", symbol, profile, reason_msg_sell, new_close_price, position, balance_cache)
 
     except asyncio.CancelledError:
         system_logger.info(
@@ -301,106 +405,181 @@ async def price_processor(
         if not stop_event_ref.is_set():
             stop_event_ref.set()
     finally:
+        stop_wait_task.cancel()
+        if get_task is not None and not get_task.done():
+            get_task.cancel()
         system_logger.info(f"Price processor ({symbol}): Завершение работы.")
 
 
-async def trade_main(profile: SimpleNamespace):
-    """
-    Основная асинхронная функция для управления торговой сессией одного профиля.
-    Создает и управляет задачами listen_klines и price_processor.
+async def _register_stop_event(stop_event: asyncio.Event, log_prefix: str) -> bool:
     """
-    symbol = profile.SYMBOL
-    system_logger.info(
-        f"trade_main ({symbol}): Запуск торговой сессии для профиля '{profile.SYMBOL}'.")
-
-    """
-    Проверяет, есть ли купленная монета, и если куплено вне бота —  запишет цену и количество последней покупки.
+    Регистрирует stop_event сессии в CURRENT_STATE (предварительно останавливая предыдущую сессию, если она активна).
+    Возвращает False, если регистрация не удалась.
     """
-    sync_position_from_binance(profile)
-
-    stop_event = threading.Event()
-    price_queue = asyncio.Queue(maxsize=100)
-
-    listener_task = None
-    processor_task = None
-
     try:
         current_stop_event = CURRENT_STATE.get("stop_event")
         if current_stop_event is not None and not current_stop_event.is_set():
             system_logger.warning(
-                f"trade_main ({symbol}): Обнаружен активный stop_event в CURRENT_STATE от предыдущей сессии. Попытка остановить старую сессию.")
+                f"{log_prefix}: Обнаружен активный stop_event в CURRENT_STATE от предыдущей сессии. Попытка остановить старую сессию.")
             current_stop_event.set()
             await asyncio.sleep(0.5)  # Даем время на реакцию
 
         CURRENT_STATE["stop_event"] = stop_event
+        CURRENT_STATE["stop_event_setter"] = functools.partial(
+            asyncio.get_running_loop().call_soon_threadsafe, stop_event.set)
         system_logger.debug(
-            f"trade_main ({symbol}): stop_event ({id(stop_event)}) зарегистрирован в CURRENT_STATE.")
+            f"{log_prefix}: stop_event ({id(stop_event)}) зарегистрирован в CURRENT_STATE.")
+        return True
     except Exception as e:
         system_logger.critical(
-            f"trade_main ({symbol}): НЕ УДАЛОСЬ зарегистрировать stop_event в CURRENT_STATE: {e}", exc_info=True)
-        return
+            f"{log_prefix}: НЕ УДАЛОСЬ зарегистрировать stop_event в CURRENT_STATE: {e}", exc_info=True)
+        return False
+
 
+async def _follow_stop_event(parent_stop_event: asyncio.Event, stop_event: asyncio.Event):
+    """Переносит общий сигнал остановки на сессию профиля; завершается и при самостоятельной остановке сессии."""
+    parent_wait_task = asyncio.ensure_future(parent_stop_event.wait())
+    own_wait_task = asyncio.ensure_future(stop_event.wait())
     try:
-        listener_task = asyncio.create_task(
-            listen_klines(symbol, profile.TIMEFRAME, price_queue, stop_event)
-        )
-        processor_task = asyncio.create_task(
-            price_processor(price_queue, profile, stop_event)
-        )
+        await asyncio.wait({parent_wait_task, own_wait_task}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        parent_wait_task.cancel()
+        own_wait_task.cancel()
+    stop_event.set()
 
-        CURRENT_STATE["listener_task"] = listener_task
-        CURRENT_STATE["processor_task"] = processor_task
-        system_logger.debug(
-            f"trade_main ({symbol}): listener_task и processor_task зарегистрированы в CURRENT_STATE.")
 
-        await asyncio.gather(listener_task, processor_task)
+async def trade_main(profile: Profile, parent_stop_event: asyncio.Event | None = None,
+                     price_queue: PriceQueue | None = None):
+    """
+    Основная асинхронная функция для управления торговой сессией одного профиля.
+    Создает и управляет задачами listen_klines и price_processor.
+    parent_stop_event - общий сигнал остановки при запуске из trade_main_many. В этом случае
+    регистрацию в CURRENT_STATE и закрытие общего AsyncClient выполняет trade_main_many.
+    price_queue - очередь цен, которую наполняет внешний стрим (BinanceStreamHub в trade_main_many);
+    тогда собственный listen_klines не запускается.
+    """
+    symbol = profile.SYMBOL
+    standalone = parent_stop_event is None
+    system_logger.info(
+        f"trade_main ({symbol}): Запуск торговой сессии для профиля '{profile.SYMBOL}'.")
+
+    """
+    Проверяет, есть ли купленная монета, и если куплено вне бота —  запишет цену и количество последней покупки.
+    """
+    await run_rest_call(sync_position_from_binance, profile)
+
+    # asyncio.Event: все проверки идут в потоке цикла событий без блокировок.
+    # Установка из других потоков - через stop_event_setter (loop.call_soon_threadsafe).
+    # У каждого профиля свой stop_event: остановка одной сессии не затрагивает остальные в trade_main_many.
+    stop_event = asyncio.Event()
+    own_stream = price_queue is None
+    if own_stream:
+        price_queue = PriceQueue(maxsize=profile.PRICE_QUEUE_MAXSIZE)
+    # JIT-компиляция ядер индикаторов - в рабочем потоке и до запуска стрима, а не на первой живой цене
+    await asyncio.to_thread(warm_up_kernels)
+
+    if standalone and not await _register_stop_event(stop_event, f"trade_main ({symbol})"):
+        return
+
+    try:
+        # TaskGroup: ошибка любой из задач отменяет вторую, а отмена trade_main доходит до обеих
+        # и дожидается их завершения - ручная отмена и сбор задач не нужны
+        try:
+            async with asyncio.TaskGroup() as task_group:
+                listener_task = None
+                if own_stream:
+                    listener_task = task_group.create_task(
+                        listen_klines(symbol, profile.TIMEFRAME, price_queue, stop_event,
+                                      loads=orjson.loads if orjson else json.loads),
+                        name=f"listener:{symbol}"
+                    )
+                    listener_task.add_done_callback(lambda _task: stop_event.set())
+                processor_task = task_group.create_task(
+                    price_processor(price_queue, profile, stop_event),
+                    name=f"processor:{symbol}"
+                )
+                # Штатное завершение одной задачи (например, price_processor без истории цен) останавливает и вторую
+                processor_task.add_done_callback(lambda _task: stop_event.set())
+
+                if standalone:
+                    # Запись изменённых позиций на диск вне торгового пути
+                    task_group.create_task(position_flusher(stop_event), name=f"position-flusher:{symbol}")
+                    CURRENT_STATE["listener_task"] = listener_task
+                    CURRENT_STATE["processor_task"] = processor_task
+                    system_logger.debug(
+                        f"trade_main ({symbol}): listener_task и processor_task зарегистрированы в CURRENT_STATE.")
+                else:
+                    task_group.create_task(_follow_stop_event(parent_stop_event, stop_event),
+                                           name=f"stop-follower:{symbol}")
+        except* Exception as error_group:
+            for error in error_group.exceptions:
+                system_logger.error(
+                    f"trade_main ({symbol}): Дочерняя задача завершилась с ошибкой: {error!r}", exc_info=error)
         system_logger.info(
-            f"trade_main ({symbol}): asyncio.gather(listener, processor) завершен.")
+            f"trade_main ({symbol}): TaskGroup(listener, processor) завершена.")
 
     except asyncio.CancelledError:
         system_logger.info(
-            f"trade_main ({symbol}): Основная задача отменена (asyncio.CancelledError). Инициируем остановку компонентов.")
+            f"trade_main ({symbol}): Основная задача отменена (asyncio.CancelledError). Компоненты остановлены.")
+
+    finally:
         if not stop_event.is_set():
             system_logger.info(
-                f"trade_main ({symbol}): Установка stop_event из-за CancelledError в trade_main.")
+                f"trade_main ({symbol}): Блок finally. Устанавливаем stop_event.")
             stop_event.set()
+        if standalone:
+            # Досылаем уведомления и записываем позиции до закрытия цикла событий
+            await flush_positions_async()
+            await flush_notifications()
+            # Закрываем общий HTTP-пул AsyncClient: он привязан к текущему циклу событий
+            try:
+                await close_async_client()
+            except Exception as e:
+                system_logger.warning(
+                    f"trade_main ({symbol}): Ошибка при закрытии AsyncClient: {e!r}")
 
-        tasks_to_cancel = [t for t in [listener_task,
-                                       processor_task] if t and not t.done()]
-        if tasks_to_cancel:
-            for task in tasks_to_cancel:
-                task.cancel()
-            await asyncio.gather(*tasks_to_cancel, return_exceptions=True)
-            system_logger.info(
-                f"trade_main ({symbol}): Дочерние задачи собраны после отмены trade_main.")
+        system_logger.info(
+            f"trade_main ({symbol}): Функция для профиля '{symbol}' полностью завершена.")
 
-    except Exception as e:
-        system_logger.error(
-            f"trade_main ({symbol}): Непредвиденная ошибка в основной торговой логике: {e}", exc_info=True)
-        if not stop_event.is_set():
-            system_logger.info(
-                f"trade_main ({symbol}): Установка stop_event из-за непредвиденной ошибки.")
-            stop_event.set()
 
-        tasks_to_cancel_on_error = [t for t in [
-            listener_task, processor_task] if t and not t.done()]
-        if tasks_to_cancel_on_error:
-            for task in tasks_to_cancel_on_error:
-                task.cancel()
-            await asyncio.gather(*tasks_to_cancel_on_error, return_exceptions=True)
-            system_logger.info(
-                f"trade_main ({symbol}): Дочерние задачи собраны после непредвиденной ошибки в trade_main.")
+async def trade_main_many(profiles: list[Profile]):
+    """
+    Запускает торговые сессии нескольких профилей в одном процессе и одном цикле событий.
+    Все сессии используют общий AsyncClient (один пул HTTP-соединений), одно WebSocket-соединение
+    (BinanceStreamHub, combined stream) и общий сигнал остановки, зарегистрированный в CURRENT_STATE,
+    поэтому stop_trading останавливает их все.
+    """
+    symbols = ", ".join(profile.SYMBOL for profile in profiles)
+    system_logger.info(f"trade_main_many: Запуск {len(profiles)} торговых сессий: {symbols}.")
+    stop_event = asyncio.Event()
+    # Подписки оформляются до подключения: список стримов входит в URL combined-стрима
+    stream_hub = BinanceStreamHub()
+    price_queues = [stream_hub.subscribe(profile.SYMBOL, profile.TIMEFRAME, profile.PRICE_QUEUE_MAXSIZE)
+                    for profile in profiles]
+    if not await _register_stop_event(stop_event, "trade_main_many"):
+        return
+    # Фильтры LOT_SIZE всех пар - одной загрузкой exchange_info до старта сессий
+    await run_rest_call(prewarm_lot_sizes, [profile.SYMBOL for profile in profiles])
 
+    try:
+        async with asyncio.TaskGroup() as task_group:
+            task_group.create_task(stream_hub.run(stop_event, loads=orjson.loads if orjson else json.loads),
+                                   name="stream-hub")
+            task_group.create_task(position_flusher(stop_event), name="position-flusher")
+            for profile, price_queue in zip(profiles, price_queues):
+                task_group.create_task(trade_main(profile, parent_stop_event=stop_event, price_queue=price_queue),
+                                       name=f"session:{profile.SYMBOL}")
+    except asyncio.CancelledError:
+        system_logger.info("trade_main_many: Задача отменена (asyncio.CancelledError). Сессии остановлены.")
     finally:
-        system_logger.info(
-            f"trade_main ({symbol}): Блок finally. Гарантируем установку stop_event.")
-        if not stop_event.is_set():
-            system_logger.warning(
-                f"trade_main ({symbol}): stop_event не был установлен к моменту finally. Устанавливаем принудительно.")
-            stop_event.set()
-
-        system_logger.info(
-            f"trade_main ({symbol}): Функция для профиля '{symbol}' полностью завершена.")
+        stop_event.set()
+        await flush_positions_async()
+        await flush_notifications()
+        try:
+            await close_async_client()
+        except Exception as e:
+            system_logger.warning(f"trade_main_many: Ошибка при закрытии AsyncClient: {e!r}")
+        system_logger.info(f"trade_main_many: Все сессии ({symbols}) завершены.")
 
 
 async def trade_main_for_telegram(profile_name: str):
@@ -410,36 +589,39 @@ async def trade_main_for_telegram(profile_name: str):
     system_logger.info(
         f"trade_main_for_telegram: Загрузка профиля '{profile_name}'...")
     try:
-        profile_dict = get_profile_by_name(profile_name)
-        profile = SimpleNamespace(
-            **{k.upper(): v for k, v in profile_dict.items()})
+        profile = load_profile(profile_name)
         system_logger.info(
             f"trade_main_for_telegram: Профиль '{profile_name}' загружен. Вызов trade_main.")
         await trade_main(profile)
     except FileNotFoundError as e:
         system_logger.error(
             f"trade_main_for_telegram: Профиль '{profile_name}' не найден: {e}")
-        await send_notification(f"❌ Ошибка запуска: Профиль '{profile_name}' не найден.")
+        notify(f"❌ Ошибка запуска: Профиль '{profile_name}' не найден.")
     except Exception as e:
         system_logger.error(
             f"trade_main_for_telegram: Ошибка при выполнении для профиля '{profile_name}': {e}", exc_info=True)
-        await send_notification(f"❌ Критическая ошибка для профиля '{profile_name}'. Подробности в системном логе.")
+        notify(f"❌ Критическая ошибка для профиля '{profile_name}'. Подробности в системном логе.")
 
 # Блок для прямого запуска (если нужен для отладки)
 if __name__ == "__main__":
-    if len(sys.argv) == 2:
-        profile_name_arg = sys.argv[1]
+    # Импорты, нужные только для прямого запуска: путь из Telegram (trade_main_for_telegram) их не загружает
+    import sys
+    from utils.event_loop import run_event_loop
+
+    if len(sys.argv) >= 2:
+        profile_names_arg = sys.argv[1:]
         system_logger.info(
-            f"run_trading_stream.py: Запуск из __main__ для профиля: {profile_name_arg}")
+            f"run_trading_stream.py: Запуск из __main__ для профилей: {', '.join(profile_names_arg)}")
         try:
-            profile_dict_main = get_profile_by_name(profile_name_arg)
-            profile_main_obj = SimpleNamespace(
-                **{k.upper(): v for k, v in profile_dict_main.items()})
-            asyncio.run(trade_main(profile_main_obj))
+            profiles_main = [load_profile(name) for name in profile_names_arg]
+            if len(profiles_main) == 1:
+                run_event_loop(trade_main(profiles_main[0]))
+            else:
+                run_event_loop(trade_main_many(profiles_main))
         except FileNotFoundError:
             system_logger.error(
-                f"run_trading_stream.py (__main__): Профиль '{profile_name_arg}' не найден.")
-            print(f"❌ Профиль '{profile_name_arg}' не найден.")
+                "run_trading_stream.py (__main__): Файл профилей не найден.")
+            print("❌ Файл профилей не найден.")
         except KeyboardInterrupt:
             system_logger.info(
                 "run_trading_stream.py (__main__): Программа прервана пользователем (KeyboardInterrupt).")
@@ -449,7 +631,8 @@ if __name__ == "__main__":
         finally:
             system_logger.info(
                 "run_trading_stream.py (__main__): Завершение работы.")
+            stop_log_listeners()  # Дописываем записи из очередей логгеров до закрытия обработчиков
             if logging.getLogger().handlers:
                 logging.shutdown()
     else:
-        print("Для прямого запуска укажите имя профиля: python run_trading_stream.py <имя_профиля>")
+        print("Для прямого запуска укажите имя профиля: python run_trading_stream.py <имя_профиля> [<имя_профиля> ...]")
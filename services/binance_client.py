@@ -1,4 +1,131 @@
+import asyncio
+import functools
+import hashlib
+import hmac
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+from binance import AsyncClient
 from binance.client import Client
+from binance.exceptions import BinanceAPIException, BinanceRequestException
 from config.settings import API_KEY, API_SECRET
+from utils.event_loop import restore_worker_thread
+
+try:
+    import orjson  # Опционально: быстрый разбор JSON-ответов REST (ордера с fills, exchange_info)
+except ImportError:
+    orjson = None
+
+
+class _HmacTemplateMixin:
+    """
+    Подпись HMAC-SHA256 от заранее подготовленного объекта hmac: ключ API_SECRET постоянен, поэтому
+    подготовка ключа (ipad/opad) выполняется один раз, а на каждый запрос делается только copy().
+    """
+    _hmac_key = None
+    _hmac_template = None
+
+    def _hmac_signature(self, query_string: str) -> str:
+        assert self.API_SECRET, "API Secret required for private endpoints"
+        if self._hmac_key != self.API_SECRET:
+            self._hmac_template = hmac.new(self.API_SECRET.encode("utf-8"), digestmod=hashlib.sha256)
+            self._hmac_key = self.API_SECRET
+        signer = self._hmac_template.copy()
+        signer.update(query_string.encode("utf-8"))
+        return signer.hexdigest()
+
+
+class OrjsonClient(_HmacTemplateMixin, Client):
+    """Client, разбирающий ответы REST через orjson вместо стандартного json (если orjson установлен)."""
+
+    @staticmethod
+    def _handle_response(response):
+        if orjson is None:
+            return Client._handle_response(response)
+        if not (200 <= response.status_code < 300):
+            raise BinanceAPIException(response, response.status_code, response.text)
+        content = response.content
+        if not content:
+            return {}
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            raise BinanceRequestException("Invalid Response: %s" % response.text)
+
+
+class OrjsonAsyncClient(_HmacTemplateMixin, AsyncClient):
+    """AsyncClient с разбором ответов через orjson: тело читается один раз как bytes."""
+
+    async def _handle_response(self, response: aiohttp.ClientResponse):
+        if orjson is None:
+            return await super()._handle_response(response)
+        if not 200 <= response.status < 300:
+            raise BinanceAPIException(response, response.status, await response.text())
+        content = await response.read()
+        if not content:
+            return {}
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            raise BinanceRequestException(f"Invalid Response: {content[:200]!r}")
+
+
+# Таймаут REST-запроса: зависший запрос не держит ордер и поток пула бесконечно
+REST_TIMEOUT_SEC = 10
+
+# Синхронный клиент держит один requests.Session (keep-alive), повторные запросы идут без нового TLS-handshake
+client = OrjsonClient(API_KEY, API_SECRET, requests_params={"timeout": REST_TIMEOUT_SEC})
+
+# Пул HTTP-соединений общего AsyncClient: keep-alive к api.binance.com и кэш DNS
+HTTP_POOL_LIMIT = 10
+DNS_CACHE_TTL_SEC = 300
+# Сколько держать простаивающее соединение открытым (по умолчанию в aiohttp 15 с - меньше интервала
+# между ордерами на минутных свечах, и каждый ордер платил бы за новый TLS-handshake)
+KEEPALIVE_TIMEOUT_SEC = 75
+
+# Отдельный пул потоков для оставшихся синхронных REST-вызовов (client.*): не делит
+# стандартный executor цикла событий с файловым вводом-выводом и не блокирует цикл событий
+# Рабочие потоки создаются лениво из потока цикла событий: restore_worker_thread снимает
+# унаследованную привязку к ядру цикла (settings.EVENT_LOOP_CPU) и его nice
+REST_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="binance-rest",
+                                   initializer=restore_worker_thread)
+
+_async_client: OrjsonAsyncClient | None = None
+_async_client_lock: asyncio.Lock | None = None
+
+
+async def get_async_client() -> OrjsonAsyncClient:
+    """
+    Возвращает общий AsyncClient (один aiohttp.ClientSession с пулом соединений на весь процесс).
+    Создается лениво при первом вызове внутри работающего цикла событий.
+    """
+    global _async_client, _async_client_lock
+    if _async_client is not None:
+        return _async_client
+    if _async_client_lock is None:
+        _async_client_lock = asyncio.Lock()
+    async with _async_client_lock:
+        if _async_client is None:
+            connector = aiohttp.TCPConnector(limit=HTTP_POOL_LIMIT, ttl_dns_cache=DNS_CACHE_TTL_SEC,
+                                             keepalive_timeout=KEEPALIVE_TIMEOUT_SEC)
+            _async_client = await OrjsonAsyncClient.create(
+                API_KEY, API_SECRET, session_params={
+                    "connector": connector,
+                    "timeout": aiohttp.ClientTimeout(total=REST_TIMEOUT_SEC),
+                })
+    return _async_client
+
+
+async def close_async_client() -> None:
+    """Закрывает общий AsyncClient (вызывается при завершении торговой сессии)."""
+    global _async_client, _async_client_lock
+    async_client, _async_client = _async_client, None
+    _async_client_lock = None
+    if async_client is not None:
+        await async_client.close_connection()
+
 
-client = Client(API_KEY, API_SECRET)
+async def run_rest_call(func, *args, **kwargs):
+    """Выполняет блокирующий вызов синхронного клиента Binance в REST_EXECUTOR."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(REST_EXECUTOR, functools.partial(func, *args, **kwargs))
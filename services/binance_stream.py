@@ -1,247 +1,315 @@
 # services/binance_stream.py
 import json
-import threading # Модуль для работы с потоками (для _listen_thread)
-import asyncio # Модуль для асинхронного программирования (для listen_klines и очереди)
-import time    # Для организации задержек при переподключении
-import websocket # Библиотека для работы с WebSocket (убедись, что установлен websocket-client)
+import logging
+import random
+import socket
+import ssl
+import time
+import asyncio # Модуль для асинхронного программирования (listen_klines и очередь цен)
+
+from websockets.asyncio.client import connect # Асинхронный WebSocket-клиент (библиотека websockets)
+from websockets.exceptions import ConnectionClosed, InvalidHandshake, InvalidURI
+
+try:
+    import msgspec # Опционально: разбор кадров сразу в типизированную схему, без промежуточных dict
+except ImportError:
+    msgspec = None
 
 # system_logger импортируется из централизованного модуля utils.logger
 # Это позволяет управлять конфигурацией логирования в одном месте.
 from utils.logger import system_logger
+from utils.loop_queue import LoopQueue, PriceQueue
 
-def _listen_thread(
-    symbol: str,
-    interval: str,
-    price_queue: asyncio.Queue, # Очередь для передачи цен закрытия в асинхронный код
-    async_loop: asyncio.AbstractEventLoop, # Цикл событий asyncio, в котором работает price_queue
-    stop_event_local: threading.Event # Локальный экземпляр события для управления остановкой этого конкретного потока
-):
+BINANCE_WS_BASE_URL = "wss://stream.binance.com:9443"
+
+# TLS-контекст создается один раз на процесс (загрузка сертификатов CA - дорогая операция)
+# и переиспользуется всеми стримами и переподключениями
+_SSL_CTX = ssl.create_default_context()
+
+# Параметры соединения WebSocket
+OPEN_TIMEOUT_SEC = 10      # Таймаут установки соединения (TCP + TLS + handshake)
+PING_INTERVAL_SEC = 20     # Keepalive-пинги: обрыв обнаруживается без ожидания следующей свечи
+MAX_QUEUE_FRAMES = 32      # Буфер входящих кадров внутри websockets
+SOCKET_RCVBUF_BYTES = 1 << 20  # Буфер приема TCP-сокета: пачка кадров после паузы не упирается в окно TCP
+STATS_LOG_INTERVAL_SEC = 60  # Период сводной debug-строки о числе полученных закрытых свечей
+RECONNECT_DELAY_SEC = 5    # Начальная задержка перед повторным подключением
+MAX_RECONNECT_DELAY_SEC = 60  # Потолок экспоненциального роста задержки
+
+if msgspec is not None:
+    class KlineData(msgspec.Struct):
+        """Поля свечи из кадра kline, которые нужны боту: цена закрытия и признак закрытия свечи."""
+        c: float   # Цена закрытия (Binance присылает строкой, strict=False приводит к float)
+        x: bool    # True, если свеча закрыта
+
+    class KlineMessage(msgspec.Struct):
+        """Кадр kline-стрима; остальные поля кадра msgspec пропускает без создания объектов."""
+        k: KlineData | None = None
+
+    class CombinedKlineMessage(msgspec.Struct):
+        """Кадр combined-стрима (/stream?streams=...): имя стрима и вложенный кадр kline."""
+        stream: str = ""
+        data: KlineMessage | None = None
+
+    # Декодеры создаются один раз на модуль и переиспользуются для каждого кадра
+    _KLINE_DECODER = msgspec.json.Decoder(KlineMessage, strict=False)
+    _COMBINED_DECODER = msgspec.json.Decoder(CombinedKlineMessage, strict=False)
+    # Ошибки разбора поврежденного кадра (несоответствие схеме - тоже DecodeError)
+    _FRAME_ERRORS = (ValueError, KeyError, TypeError, AttributeError, msgspec.DecodeError)
+else:
+    _FRAME_ERRORS = (ValueError, KeyError, TypeError, AttributeError)
+
+
+# Признак закрытой свечи в сыром кадре. JSON публичных стримов Binance компактный (без пробелов),
+# поэтому незакрытые свечи (обновление примерно раз в секунду) отсеиваются без декодирования JSON
+_CLOSED_MARKER = '"x":true'
+_CLOSED_MARKER_BYTES = b'"x":true'
+
+
+def _may_be_closed(message) -> bool:
+    """Быстрая проверка подстроки: False - кадр точно не закрытая свеча, декодировать не нужно."""
+    return (_CLOSED_MARKER_BYTES if isinstance(message, bytes) else _CLOSED_MARKER) in message
+
+
+def parse_closed_price(message, loads=json.loads) -> float | None:
     """
-    Целевая функция, выполняемая в отдельном потоке (_thread).
-    Ее задачи:
-    1. Подключаться к WebSocket стриму Binance для указанной торговой пары и интервала.
-    2. Слушать сообщения о новых kline (свечах).
-    3. При закрытии свечи извлекать цену закрытия.
-    4. Помещать цену закрытия в потокобезопасную очередь (price_queue), чтобы ее мог обработать асинхронный код.
-    5. Корректно завершать свою работу при установке stop_event_local.
-    6. Реализовывать базовую логику автоматического переподключения в случае обрыва связи или ошибок.
+    Возвращает цену закрытия из кадра kline, если свеча закрыта ('x': true), иначе None.
+    С msgspec кадр декодируется прямо в KlineMessage общим _KLINE_DECODER (loads не используется),
+    без него - через loads (json.loads или orjson.loads) и dict.
+    Кадры без '"x":true' отбрасываются до декодирования.
     """
-    websocket_url = f"wss://stream.binance.com:9443/ws/{symbol.lower()}@kline_{interval}"
-    websocket_connection = None # Переменная для хранения объекта WebSocket соединения
+    if not _may_be_closed(message):
+        return None
+    if msgspec is not None:
+        kline_data = _KLINE_DECODER.decode(message).k
+        return kline_data.c if kline_data is not None and kline_data.x else None
+    kline_data = loads(message).get("k") # Извлекаем данные свечи (ключ 'k'), без пустого dict на каждый кадр
+    # Проверяем, является ли эта свеча закрытой ('x': True)
+    if kline_data is not None and kline_data.get("x"):
+        return float(kline_data["c"]) # 'c' - цена закрытия
+    return None
 
-    # Параметры для логики переподключения
-    initial_reconnect_delay_sec = 5  # Начальная задержка перед переподключением
-    current_reconnect_delay_sec = initial_reconnect_delay_sec # Текущая задержка, может увеличиваться
 
-    # Основной цикл работы потока. Он будет продолжаться, пока не будет установлен stop_event_local.
-    # Этот внешний цикл также отвечает за логику переподключения.
-    system_logger.info(f"WebSocket ({symbol}): Поток _listen_thread запущен.")
-    while not stop_event_local.is_set():
-        try:
-            system_logger.info(f"WebSocket ({symbol}): Попытка подключения к {websocket_url}...")
-            # Устанавливаем таймаут на операцию создания соединения (10 секунд)
-            websocket_connection = websocket.create_connection(websocket_url, timeout=10)
-            system_logger.info(f"WebSocket ({symbol}): Успешно подключено к {websocket_url}.")
-            # После успешного подключения сбрасываем задержку переподключения к начальной
-            current_reconnect_delay_sec = initial_reconnect_delay_sec
-            
-            # Устанавливаем таймаут на операции чтения (recv) с сокета (1 секунда).
-            # Это критически важно: ws.recv() не должен блокировать поток навечно.
-            # Таймаут позволяет регулярно проверять stop_event_local.is_set() в цикле.
-            websocket_connection.settimeout(1.0)
-
-            # Внутренний цикл: чтение сообщений из активного WebSocket соединения.
-            # Продолжается, пока не установлен stop_event_local.
-            while not stop_event_local.is_set():
-                try:
-                    # Пытаемся получить сообщение из WebSocket
-                    message = websocket_connection.recv()
-                    
-                    if not message: # Некоторые реализации WebSocket могут вернуть пустую строку при таймауте
-                        # system_logger.debug(f"WebSocket ({symbol}): получено пустое сообщение (возможно, recv таймаут без исключения).")
-                        continue # Возвращаемся к началу внутреннего цикла для проверки stop_event_local
-
-                    # Декодируем полученное JSON-сообщение
-                    data_payload = json.loads(message)
-                    kline_data = data_payload.get("k", {}) # Извлекаем данные свечи (ключ 'k')
-                    
-                    # Проверяем, является ли эта свеча закрытой ('x': True)
-                    if kline_data.get("x"):
-                        closing_price = float(kline_data["c"]) # 'c' - цена закрытия
-                        # Потокобезопасно помещаем цену закрытия в очередь asyncio.
-                        # Это позволяет передать данные из этого потока в асинхронный код (price_processor).
-                        asyncio.run_coroutine_threadsafe(price_queue.put(closing_price), async_loop)
-                        system_logger.debug(f"WebSocket ({symbol}): Цена закрытия {closing_price} отправлена в очередь.")
-
-                except websocket.WebSocketTimeoutException:
-                    # Это ожидаемое исключение из-за websocket_connection.settimeout(1.0).
-                    # Оно означает, что за 1 секунду новых сообщений не пришло.
-                    # Ничего страшного, просто продолжаем внутренний цикл, чтобы снова проверить stop_event_local.
-                    # system_logger.debug(f"WebSocket ({symbol}): таймаут при чтении (ws.recv()), продолжаем...")
-                    continue
-                except websocket.WebSocketConnectionClosedException as e:
-                    # Это исключение возникает, если соединение было закрыто удаленной стороной (Binance).
-                    system_logger.warning(f"WebSocket ({symbol}): Соединение закрыто Binance: {e}. Попытка переподключения...")
-                    break # Выходим из внутреннего цикла, чтобы инициировать переподключение во внешнем цикле.
-                except json.JSONDecodeError as e:
-                    # Ошибка при декодировании JSON. Возможно, пришло поврежденное сообщение.
-                    message_preview = message[:100] if 'message' in locals() and isinstance(message, str) else "N/A"
-                    system_logger.error(f"WebSocket ({symbol}): Ошибка декодирования JSON: {e}. Сообщение (начало): '{message_preview}'")
-                    # Продолжаем пытаться читать сообщения, это могла быть единичная проблема.
-                    continue
-                except Exception as e:
-                    # Ловим другие возможные ошибки внутри цикла чтения сообщений.
-                    if stop_event_local.is_set():
-                        # Если дана команда на остановку, эта ошибка может быть связана с процессом закрытия соединения.
-                        system_logger.info(f"WebSocket ({symbol}): Ошибка при чтении во время процесса остановки: {e}")
-                    else:
-                        # Если это неожиданная ошибка, логируем ее подробно.
-                        system_logger.error(f"WebSocket ({symbol}): Непредвиденная ошибка в цикле чтения (_listen_thread): {e}", exc_info=True)
-                    break # Выходим из внутреннего цикла. Если stop_event_local не установлен, будет попытка переподключения.
-
-            # Если мы вышли из внутреннего цикла (например, из-за WebSocketConnectionClosedException или другой ошибки),
-            # но stop_event_local еще не установлен, значит, внешний цикл попытается переподключиться.
-            # Перед этим нужно закрыть текущее соединение, если оно еще существует.
-            if websocket_connection:
-                websocket_connection.close()
-                system_logger.info(f"WebSocket ({symbol}): Соединение websocket_connection закрыто (внутренний цикл завершен).")
-                websocket_connection = None # Сбрасываем, чтобы избежать повторного закрытия в блоке finally внешнего цикла.
-
-        except websocket.WebSocketException as e: # Ошибки, связанные с библиотекой WebSocket (например, при create_connection)
-            if stop_event_local.is_set():
-                system_logger.info(f"WebSocket ({symbol}): Ошибка подключения WebSocket во время процесса остановки: {e}")
-                # Если дана команда на остановку, нет смысла пытаться переподключаться.
-                break # Выходим из внешнего цикла (while not stop_event_local.is_set())
-            system_logger.error(f"WebSocket ({symbol}): Ошибка подключения WebSocket (например, create_connection не удалось): {e}.")
-            # Не делаем break здесь, чтобы внешний цикл сделал задержку и попробовал переподключиться.
-        except Exception as e:
-            # Ловим любые другие неожиданные ошибки на уровне установки соединения или во внешнем цикле.
-            if stop_event_local.is_set():
-                system_logger.info(f"WebSocket ({symbol}): Непредвиденная ошибка во внешнем цикле во время процесса остановки: {e}")
-                break # Выходим из внешнего цикла, если дана команда на остановку.
-            system_logger.error(f"WebSocket ({symbol}): Непредвиденная ошибка во внешнем цикле _listen_thread: {e}", exc_info=True)
-            # Аналогично, не делаем break, чтобы внешний цикл попытался переподключиться.
-        
-        finally:
-            # Блок finally для try внутри внешнего цикла.
-            # Гарантирует закрытие соединения, если оно по какой-то причине осталось открытым
-            # и мы вышли из блока try (например, из-за исключения, которое не привело к break из внешнего цикла).
-            if websocket_connection and websocket_connection.connected:
-                websocket_connection.close()
-                system_logger.info(f"WebSocket ({symbol}): Соединение websocket_connection принудительно закрыто в блоке finally внешнего цикла.")
-                websocket_connection = None # Сбрасываем после закрытия
-
-        # Если stop_event_local все еще не установлен (т.е. мы здесь из-за ошибки, а не команды на остановку),
-        # делаем задержку перед следующей попыткой подключения во внешнем цикле.
-        if not stop_event_local.is_set():
-            system_logger.info(f"WebSocket ({symbol}): Ожидание {current_reconnect_delay_sec} секунд перед следующей попыткой подключения...")
-            # Реализуем прерываемую задержку: спим по 1 секунде, каждый раз проверяя stop_event_local.
-            for _ in range(current_reconnect_delay_sec):
-                if stop_event_local.is_set():
-                    system_logger.info(f"WebSocket ({symbol}): Остановка задержки переподключения из-за установки stop_event_local.")
-                    break # Прерываем задержку, если дана команда на остановку.
-                time.sleep(1)
-            # Здесь можно добавить логику для увеличения задержки при повторных неудачных попытках,
-            # например, current_reconnect_delay_sec = min(current_reconnect_delay_sec * 2, 60) # Удваивать, но не более 60с.
-        else:
-            # Если stop_event_local был установлен во время выполнения блока try или задержки,
-            # выходим из основного (внешнего) цикла потока.
-            system_logger.info(f"WebSocket ({symbol}): Получен сигнал stop_event_local, внешний цикл _listen_thread завершается.")
-            break 
-
-    system_logger.info(f"WebSocket ({symbol}): Поток _listen_thread полностью завершен.")
+def parse_combined_closed_price(message, loads=json.loads) -> tuple[str, float | None]:
+    """
+    Разбирает кадр combined-стрима: возвращает (имя стрима, цена закрытия или None).
+    Имя стрима в нижнем регистре, например 'btcusdt@kline_1m'.
+    Кадры без '"x":true' не декодируются: для них возвращается ('', None).
+    """
+    if not _may_be_closed(message):
+        return "", None
+    if msgspec is not None:
+        combined = _COMBINED_DECODER.decode(message)
+        kline_data = combined.data.k if combined.data is not None else None
+        return combined.stream, (kline_data.c if kline_data is not None and kline_data.x else None)
+    combined = loads(message)
+    payload = combined.get("data")
+    kline_data = payload.get("k") if payload is not None else None
+    if kline_data is not None and kline_data.get("x"):
+        return combined.get("stream", ""), float(kline_data["c"])
+    return combined.get("stream", ""), None
+
+
+def kline_stream_name(symbol: str, interval: str) -> str:
+    """Имя kline-стрима Binance для пары и интервала (например, 'btcusdt@kline_1m')."""
+    return f"{symbol.lower()}@kline_{interval}"
+
+
+def _tune_socket(websocket_connection, log: logging.Logger) -> None:
+    """
+    Настраивает TCP-сокет установленного соединения: TCP_NODELAY (без задержки Нейгла для мелких кадров,
+    в т.ч. pong и close) и увеличенный SO_RCVBUF. websockets не принимает опции сокета,
+    поэтому они выставляются на сокете транспорта сразу после подключения.
+    """
+    sock = websocket_connection.transport.get_extra_info("socket")
+    if sock is None:
+        return
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RCVBUF_BYTES)
+    except OSError as e:
+        log.warning("WebSocket: Не удалось настроить опции сокета: %r", e)
+
+
+def _closed_kline_counter(log: logging.Logger):
+    """
+    Возвращает функцию, которую стрим вызывает на каждую закрытую свечу. Вместо строки лога на каждую цену
+    она считает свечи и раз в STATS_LOG_INTERVAL_SEC пишет одну сводную debug-строку (только если DEBUG включен).
+    """
+    log_debug = log.isEnabledFor(logging.DEBUG)  # Уровень проверяется один раз на стрим
+    stats = {"count": 0, "since": time.monotonic()}
+
+    def count_closed_kline() -> None:
+        stats["count"] += 1
+        if log_debug:
+            now = time.monotonic()
+            elapsed = now - stats["since"]
+            if elapsed >= STATS_LOG_INTERVAL_SEC:
+                log.debug("WebSocket: Получено %d закрытых свечей за последние %.0f с.", stats["count"], elapsed)
+                stats["count"] = 0
+                stats["since"] = now
+
+    return count_closed_kline
+
+
+async def _close_on_stop(websocket_connection, stop_event: asyncio.Event) -> None:
+    """Закрывает соединение при установке stop_event: итерация async for по соединению штатно завершается."""
+    await stop_event.wait()
+    await websocket_connection.close()
+
+
+async def _run_stream(log: logging.Logger, websocket_url: str, handle_message, stop_event: asyncio.Event) -> None:
+    """
+    Общий цикл чтения WebSocket-стрима: подключение, передача каждого кадра в handle_message,
+    переподключение при обрыве и немедленное завершение по stop_event.
+    Задержка переподключения растет экспоненциально (до MAX_RECONNECT_DELAY_SEC) с полным джиттером,
+    чтобы стримы разных пар не переподключались синхронно; сбрасывается после первого полученного кадра.
+    handle_message вызывается в потоке цикла событий; ошибки разбора кадра (_FRAME_ERRORS)
+    логируются, и чтение продолжается. log - дочерний логгер стрима (system.<SYMBOL>), пара видна в имени логгера.
+    """
+    stop_wait_task = asyncio.ensure_future(stop_event.wait())
+    reconnect_delay = RECONNECT_DELAY_SEC
+    try:
+        while not stop_event.is_set():
+            received_any = False  # Получен ли хотя бы один кадр в текущем подключении
+            try:
+                log.info("WebSocket: Попытка подключения к %s...", websocket_url)
+                async with connect(websocket_url, ssl=_SSL_CTX, open_timeout=OPEN_TIMEOUT_SEC,
+                                   ping_interval=PING_INTERVAL_SEC, max_queue=MAX_QUEUE_FRAMES) as websocket_connection:
+                    log.info("WebSocket: Успешно подключено к %s.", websocket_url)
+                    _tune_socket(websocket_connection, log)
+                    close_task = asyncio.ensure_future(_close_on_stop(websocket_connection, stop_event))
+                    try:
+                        # Итерация завершается без исключения, когда соединение закрыто штатно (в т.ч. по stop_event)
+                        async for message in websocket_connection:
+                            received_any = True
+                            try:
+                                handle_message(message)
+                            except _FRAME_ERRORS as e:
+                                # Поврежденный кадр: логируем и продолжаем чтение, это могла быть единичная проблема
+                                message_preview = message[:100] if isinstance(message, (str, bytes)) else "N/A"
+                                log.error("WebSocket: Ошибка разбора сообщения: %r. Сообщение (начало): %r",
+                                          e, message_preview)
+                    finally:
+                        close_task.cancel()
+                if not stop_event.is_set():
+                    log.warning("WebSocket: Соединение закрыто Binance. Попытка переподключения...")
+
+            except ConnectionClosed as e:
+                # Соединение оборвано с ошибкой (без корректного close frame)
+                log.warning("WebSocket: Соединение закрыто Binance: %s. Попытка переподключения...", e)
+            except (OSError, TimeoutError, InvalidHandshake, InvalidURI) as e:
+                # Ошибки подключения: DNS/TCP/TLS, таймаут открытия, отказ в handshake
+                log.error("WebSocket: Ошибка подключения WebSocket: %r.", e)
+            except Exception as e:
+                log.error("WebSocket: Непредвиденная ошибка в цикле чтения: %s", e, exc_info=True)
+
+            if stop_event.is_set():
+                break
+            if received_any:
+                reconnect_delay = RECONNECT_DELAY_SEC  # Соединение работало - начинаем отсчет задержки заново
+            delay = random.uniform(0, reconnect_delay)
+            reconnect_delay = min(reconnect_delay * 2, MAX_RECONNECT_DELAY_SEC)
+            # Прерываемая задержка перед переподключением: просыпаемся сразу по stop_event
+            log.info("WebSocket: Ожидание %.1f секунд перед следующей попыткой подключения...", delay)
+            await asyncio.wait({stop_wait_task}, timeout=delay)
+    finally:
+        stop_wait_task.cancel()
 
 
 async def listen_klines(
     symbol: str,
     interval: str,
-    price_queue: asyncio.Queue,      # Очередь для передачи цен от _listen_thread
-    stop_event_from_caller: threading.Event # Экземпляр threading.Event, переданный от вызывающей стороны (trade_main)
+    price_queue: LoopQueue,          # Очередь цен закрытия (только float) для price_processor
+    stop_event_from_caller: asyncio.Event, # Экземпляр asyncio.Event, переданный от вызывающей стороны (trade_main)
+    loads=json.loads # Функция декодирования JSON-кадров без msgspec (например, orjson.loads)
 ):
     """
-    Асинхронная корутина-"менеджер" для WebSocket стрима.
+    Асинхронно слушает kline-стрим Binance в цикле событий (без отдельного потока).
     Ее задачи:
-    1. Получить текущий цикл событий asyncio.
-    2. Запустить функцию `_listen_thread` в отдельном потоке Python (`threading.Thread`).
-    3. Передать `_listen_thread` необходимые аргументы, включая `price_queue` и `stop_event_from_caller`.
-    4. "Жить" и оставаться активной, пока не будет установлен `stop_event_from_caller` или пока ее саму не отменят.
-    5. При получении сигнала на остановку (через `stop_event_from_caller` или `asyncio.CancelledError`),
-       гарантировать корректное завершение запущенного потока `_listen_thread`.
+    1. Подключаться к WebSocket стриму Binance для указанной торговой пары и интервала.
+    2. При закрытии свечи ('x': true) извлекать цену закрытия и класть ее в price_queue (put_nowait).
+    3. Завершаться сразу по установке stop_event_from_caller (соединение закрывается, async for выходит).
+    4. Переподключаться с задержкой в случае обрыва связи или ошибок.
+
+    Контракт очереди: в price_queue кладется только цена закрытия как float (не dict и не строка JSON).
+    Кадр декодируется здесь один раз (parse_closed_price: msgspec или loads), поэтому потребитель (price_processor)
+    ничего не разбирает и получает пачки цен сразу как float64 (PriceQueue.pop_all).
     """
-    async_loop = asyncio.get_event_loop() # Получаем текущий цикл событий asyncio
-    websocket_worker_thread = None         # Переменная для хранения объекта потока
+    websocket_url = f"{BINANCE_WS_BASE_URL}/ws/{kline_stream_name(symbol, interval)}"
+    # Логгер пары создается один раз на стрим
+    log = system_logger.getChild(symbol)
+    count_closed_kline = _closed_kline_counter(log)
 
+    def handle_message(message) -> None:
+        closing_price = parse_closed_price(message, loads)
+        if closing_price is not None:
+            # Мы в потоке цикла событий: кладем в LoopQueue напрямую, без межпоточного перехода
+            price_queue.put_nowait(closing_price)
+            count_closed_kline()
+
+    log.info("listen_klines: Запуск WebSocket стрима.")
     try:
-        system_logger.info(f"listen_klines ({symbol}): Запуск фонового потока _listen_thread...")
-        # Создаем объект потока.
-        # daemon=False означает, что основной процесс Python будет ждать завершения этого потока,
-        # если только не будет вызван sys.exit() или если join() не будет вызван/завершится.
-        # Для управляемого завершения мы будем использовать join().
-        websocket_worker_thread = threading.Thread(
-            target=_listen_thread, # Функция, которую будет выполнять поток
-            args=(symbol, interval, price_queue, async_loop, stop_event_from_caller), # Аргументы для _listen_thread
-            daemon=False # Явное указание, что поток не является демоном
-        )
-        websocket_worker_thread.start() # Запускаем поток
-
-        # Эта корутина (listen_klines) будет оставаться активной и периодически "просыпаться",
-        # чтобы проверить, не установлен ли stop_event_from_caller и жив ли еще рабочий поток.
-        # await asyncio.sleep(0.1) передает управление другим задачам asyncio, предотвращая блокировку.
-        while not stop_event_from_caller.is_set() and websocket_worker_thread.is_alive():
-            await asyncio.sleep(0.1)
-        
-        # Если мы вышли из цикла, анализируем причину:
-        if stop_event_from_caller.is_set():
-            system_logger.info(f"listen_klines ({symbol}): stop_event_from_caller установлен. Корутина готовится к завершению, ожидая поток.")
-        elif not websocket_worker_thread.is_alive(): # Поток завершился сам по себе (возможно, из-за ошибки)
-            system_logger.warning(f"listen_klines ({symbol}): Фоновый поток _listen_thread неожиданно завершился. Устанавливаем stop_event_from_caller.")
-            if not stop_event_from_caller.is_set(): # Если еще не установлен, устанавливаем, чтобы другие части системы знали.
-                 stop_event_from_caller.set()
-        
+        await _run_stream(log, websocket_url, handle_message, stop_event_from_caller)
     except asyncio.CancelledError:
-        # Этот блок выполняется, если сама задача listen_klines была отменена
-        # (например, из bot_control.control_center при остановке бота).
-        system_logger.info(f"listen_klines ({symbol}): Задача отменена (получен asyncio.CancelledError).")
-        # Важно сигнализировать фоновому потоку _listen_thread о необходимости остановиться,
-        # если это еще не было сделано через stop_event_from_caller.
-        if not stop_event_from_caller.is_set():
-            system_logger.info(f"listen_klines ({symbol}): Установка stop_event_from_caller из-за CancelledError.")
-            stop_event_from_caller.set()
-        # Не нужно пробрасывать CancelledError дальше (re-raise), если мы хотим,
-        # чтобы вызывающая корутина (например, trade_main) корректно обработала отмену этой задачи.
-    except Exception as e:
-        # Ловим любые другие непредвиденные ошибки в корутине listen_klines.
-        system_logger.error(f"listen_klines ({symbol}): Непредвиденная ошибка в корутине: {e}", exc_info=True)
-        # В случае любой ошибки также пытаемся корректно остановить фоновый поток.
-        if not stop_event_from_caller.is_set():
-            system_logger.info(f"listen_klines ({symbol}): Установка stop_event_from_caller из-за непредвиденной ошибки в корутине.")
-            stop_event_from_caller.set()
+        # Задача отменена (TaskGroup в trade_main или control_center при остановке бота)
+        log.info("listen_klines: Задача отменена (получен asyncio.CancelledError).")
+        raise
     finally:
-        # Блок finally выполняется всегда, независимо от того, как была завершена корутина (штатно или с ошибкой).
-        # Его задача - гарантировать, что фоновый поток _listen_thread будет корректно остановлен и дождан.
-        system_logger.info(f"listen_klines ({symbol}): Блок finally. Гарантируем установку stop_event_from_caller и ожидание завершения потока.")
-        
-        # Убеждаемся, что stop_event_from_caller точно установлен.
         if not stop_event_from_caller.is_set():
-            # Эта ситуация не должна возникать при штатной отмене или ошибке, но для надежности.
-            system_logger.warning(f"listen_klines ({symbol}): stop_event_from_caller не был установлен к моменту finally. Устанавливаем принудительно.")
+            # Стрим завершился не по команде остановки - сообщаем остальной сессии
             stop_event_from_caller.set()
+        log.info("listen_klines: WebSocket стрим полностью остановлен.")
+
+
+class BinanceStreamHub:
+    """
+    Одно WebSocket-соединение (combined stream /stream?streams=a/b/...) на все торговые пары сессии.
+    Кадры разбираются по имени стрима и раскладываются по очередям цен подписчиков,
+    поэтому N пар - это одно TLS-соединение и один цикл чтения вместо N.
+    Подписки оформляются до run(): список стримов входит в URL подключения.
+    """
+
+    def __init__(self):
+        self._queues: dict[str, LoopQueue] = {}  # имя стрима -> очередь цен закрытия
+
+    def subscribe(self, symbol: str, interval: str, maxsize: int) -> PriceQueue:
+        """Регистрирует kline-стрим пары и возвращает очередь, в которую будут приходить ее цены закрытия."""
+        stream_name = kline_stream_name(symbol, interval)
+        if stream_name in self._queues:
+            raise ValueError(f"Стрим {stream_name} уже подписан")
+        price_queue = PriceQueue(maxsize=maxsize)
+        self._queues[stream_name] = price_queue
+        return price_queue
+
+    @property
+    def websocket_url(self) -> str:
+        return f"{BINANCE_WS_BASE_URL}/stream?streams={'/'.join(self._queues)}"
 
-        # Проверяем, был ли создан поток и жив ли он еще.
-        if websocket_worker_thread and websocket_worker_thread.is_alive():
-            system_logger.info(f"listen_klines ({symbol}): Ожидание (join) завершения фонового потока _listen_thread (таймаут 10 секунд)...")
-            # Метод join() блокирует выполнение до тех пор, пока поток websocket_worker_thread не завершится,
-            # или пока не истечет таймаут.
-            websocket_worker_thread.join(timeout=10.0) 
-            if websocket_worker_thread.is_alive():
-                # Если поток все еще жив после таймаута, это указывает на проблему в _listen_thread
-                # (например, он не реагирует на stop_event_from_caller или завис).
-                system_logger.error(f"listen_klines ({symbol}): Фоновый поток _listen_thread НЕ ЗАВЕРШИЛСЯ за 10 секунд после вызова join! Возможна утечка ресурсов.")
-            else:
-                system_logger.info(f"listen_klines ({symbol}): Фоновый поток _listen_thread успешно завершен (joined).")
-        elif websocket_worker_thread: # Если объект потока был создан, но поток уже не активен
-            system_logger.info(f"listen_klines ({symbol}): Фоновый поток _listen_thread уже был завершен к моменту вызова join в finally.")
-        else: # Если объект потока даже не был создан (например, из-за ошибки до thread.start())
-            system_logger.info(f"listen_klines ({symbol}): Фоновый поток _listen_thread не был создан (websocket_worker_thread is None).")
-
-        system_logger.info(f"listen_klines ({symbol}): Корутина-менеджер полностью завершена.")
\ No newline at end of file
+    async def run(self, stop_event: asyncio.Event, loads=json.loads) -> None:
+        """
+        Читает combined-стрим до установки stop_event; по завершении устанавливает stop_event.
+        Весь разбор и раскладка по очередям идут в одной задаче цикла событий, поэтому пропускная
+        способность упирается в сетевой ввод-вывод цикла: при запуске через utils.event_loop.run_event_loop
+        используется uvloop (если установлен, см. requirements.txt), иначе стандартный asyncio.
+        """
+        if not self._queues:
+            raise ValueError("Нет подписок: вызовите subscribe до run")
+        queues = self._queues
+        log = system_logger.getChild("stream_hub")
+        count_closed_kline = _closed_kline_counter(log)
+
+        def handle_message(message) -> None:
+            stream_name, closing_price = parse_combined_closed_price(message, loads)
+            if closing_price is not None:
+                price_queue = queues.get(stream_name)
+                if price_queue is not None:
+                    price_queue.put_nowait(closing_price)
+                    count_closed_kline()
+
+        log.info("BinanceStreamHub: Запуск combined-стрима для %d пар: %s.", len(queues), ", ".join(queues))
+        try:
+            await _run_stream(log, self.websocket_url, handle_message, stop_event)
+        finally:
+            if not stop_event.is_set():
+                stop_event.set()
+            log.info("BinanceStreamHub: Combined-стрим полностью остановлен.")
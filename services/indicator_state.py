@@ -0,0 +1,182 @@
+# services/indicator_state.py
+import numpy as np
+
+from services.trade_logic import SignalParams, build_signal_params, evaluate_signal, signal_decision
+from utils._njit import njit, NUMBA_AVAILABLE
+
+# Раскладка вектора состояния (float64), который обновляется ядром update_indicator_state
+_PREV = 0       # предыдущая цена закрытия
+_COUNT = 1      # количество обработанных цен
+_AVG_GAIN = 2   # средний рост (Уайлдер)
+_AVG_LOSS = 3   # среднее падение (Уайлдер)
+_RSI = 4
+_FAST = 5       # быстрая EMA для MACD
+_FAST_SUM = 6
+_SLOW = 7       # медленная EMA для MACD
+_SLOW_SUM = 8
+_MACD = 9
+_MACD_COUNT = 10
+_SIGNAL = 11    # сигнальная линия MACD
+_SIGNAL_SUM = 12
+_EMA = 13       # EMA фильтра
+_EMA_SUM = 14
+_STATE_SIZE = 15
+# Индексы значений, которые нужны для решения стратегии (RSI, MACD, сигнальная линия, EMA)
+_SIGNAL_INPUTS = np.array([_RSI, _MACD, _SIGNAL, _EMA], dtype=np.intp)
+
+
+@njit(cache=True)
+def _ema_step(state, value_idx, sum_idx, count, period, x):
+    # EMA с затравкой SMA по первым period значениям (как в TA-Lib); до прогрева значение остается NaN
+    if count < period:
+        state[sum_idx] += x
+    elif count == period:
+        state[value_idx] = (state[sum_idx] + x) / period
+    else:
+        state[value_idx] += 2.0 / (period + 1) * (x - state[value_idx])
+
+
+@njit(cache=True)
+def update_indicator_state(state, price, rsi_period, fast_period, slow_period, signal_period, ema_period):
+    """Обновляет RSI (Уайлдер), MACD и EMA новой ценой закрытия за O(1). Работает только с float64-массивом."""
+    count = state[_COUNT] + 1.0
+    state[_COUNT] = count
+
+    # --- RSI ---
+    if count > 1.0:
+        delta = price - state[_PREV]
+        gain = delta if delta > 0.0 else 0.0
+        loss = -delta if delta < 0.0 else 0.0
+        deltas = count - 1.0
+        if deltas <= rsi_period:
+            # Затравка: простое среднее первых rsi_period изменений
+            state[_AVG_GAIN] += gain / rsi_period
+            state[_AVG_LOSS] += loss / rsi_period
+        else:
+            state[_AVG_GAIN] = (state[_AVG_GAIN] * (rsi_period - 1) + gain) / rsi_period
+            state[_AVG_LOSS] = (state[_AVG_LOSS] * (rsi_period - 1) + loss) / rsi_period
+        if deltas >= rsi_period:
+            if state[_AVG_LOSS] == 0.0:
+                state[_RSI] = 100.0
+            else:
+                state[_RSI] = 100.0 - 100.0 / (1.0 + state[_AVG_GAIN] / state[_AVG_LOSS])
+    state[_PREV] = price
+
+    # --- MACD ---
+    _ema_step(state, _FAST, _FAST_SUM, count, fast_period, price)
+    _ema_step(state, _SLOW, _SLOW_SUM, count, slow_period, price)
+    if count >= fast_period and count >= slow_period:
+        macd = state[_FAST] - state[_SLOW]
+        state[_MACD] = macd
+        macd_count = state[_MACD_COUNT] + 1.0
+        state[_MACD_COUNT] = macd_count
+        _ema_step(state, _SIGNAL, _SIGNAL_SUM, macd_count, signal_period, macd)
+
+    # --- EMA ---
+    _ema_step(state, _EMA, _EMA_SUM, count, ema_period, price)
+
+
+@njit(cache=True)
+def update_indicator_state_many(state, prices, rsi_period, fast_period, slow_period, signal_period, ema_period):
+    for i in range(prices.shape[0]):
+        update_indicator_state(state, prices[i], rsi_period, fast_period,
+                               slow_period, signal_period, ema_period)
+
+
+def warm_up_kernels() -> None:
+    """
+    Компилирует njit-ядра (индикаторы и signal_decision) заранее с теми же типами аргументов,
+    что и в price_processor, чтобы первая живая цена не ждала JIT-компиляцию.
+    С cache=True повторные запуски процесса берут машинный код из дискового кэша numba.
+    Без numba ничего не делает.
+    """
+    if not NUMBA_AVAILABLE:
+        return
+    state = IndicatorState(rsi_period=2, macd_fast_period=2, macd_slow_period=3,
+                           macd_signal_period=2, ema_period=2)
+    state.update_many(np.ones(8, dtype=np.float64))
+    state.update(1.0)
+    nan = float("nan")
+    signal_decision(1.0, nan, nan, nan, nan, True, True, False, False, 30.0, 70.0, 0.002, 0.002)
+
+
+def _none_if_nan(value: float) -> float | None:
+    return None if value != value else value
+
+
+class IndicatorState:
+    """
+    Инкрементальные RSI (сглаживание Уайлдера), MACD и EMA.
+    Состояние хранится в одном float64-массиве, а обновление выполняет ядро update_indicator_state
+    (компилируется numba, если она установлена), поэтому каждая новая цена обрабатывается за O(1)
+    без пересчета по всему окну истории. До прогрева значения равны NaN, а signal() передает для них None.
+    """
+    __slots__ = ("rsi_period", "macd_fast_period", "macd_slow_period",
+                 "macd_signal_period", "ema_period", "signal_params", "_state")
+
+    def __init__(self, rsi_period: int = 14, macd_fast_period: int = 12, macd_slow_period: int = 26,
+                 macd_signal_period: int = 9, ema_period: int = 50):
+        self.rsi_period = rsi_period
+        self.macd_fast_period = macd_fast_period
+        self.macd_slow_period = macd_slow_period
+        self.macd_signal_period = macd_signal_period
+        self.ema_period = ema_period
+        self.signal_params: SignalParams | None = None  # Параметры стратегии профиля (см. from_profile)
+        self._state = np.zeros(_STATE_SIZE, dtype=np.float64)
+        self._state[[_RSI, _FAST, _SLOW, _MACD, _SIGNAL, _EMA]] = np.nan
+
+    @classmethod
+    def from_profile(cls, profile, initial_prices=()) -> "IndicatorState":
+        """Создает состояние по периодам профиля и прогревает его начальной историей цен."""
+        state = cls(
+            rsi_period=int(getattr(profile, "RSI_PERIOD", 14)),
+            macd_fast_period=int(getattr(profile, "MACD_FAST_PERIOD", 12)),
+            macd_slow_period=int(getattr(profile, "MACD_SLOW_PERIOD", 26)),
+            macd_signal_period=int(getattr(profile, "MACD_SIGNAL_PERIOD", 9)),
+            ema_period=int(getattr(profile, "EMA_PERIOD", 50)),
+        )
+        state.signal_params = build_signal_params(profile)
+        state.update_many(initial_prices)
+        return state
+
+    def update(self, price: float) -> None:
+        update_indicator_state(self._state, float(price), self.rsi_period, self.macd_fast_period,
+                               self.macd_slow_period, self.macd_signal_period, self.ema_period)
+
+    def update_many(self, prices) -> None:
+        prices = np.ascontiguousarray(prices, dtype=np.float64)
+        update_indicator_state_many(self._state, prices, self.rsi_period, self.macd_fast_period,
+                                    self.macd_slow_period, self.macd_signal_period, self.ema_period)
+
+    @property
+    def rsi(self) -> float:
+        return float(self._state[_RSI])
+
+    @property
+    def macd(self) -> float:
+        return float(self._state[_MACD])
+
+    @property
+    def macd_signal(self) -> float:
+        return float(self._state[_SIGNAL])
+
+    @property
+    def ema(self) -> float:
+        return float(self._state[_EMA])
+
+    def signal(self, profile, current_close_price: float) -> str:
+        """
+        Возвращает 'buy' / 'sell' / 'hold' по текущим значениям индикаторов.
+        Параметры стратегии собраны один раз в from_profile; без них (прямой конструктор) берутся из profile.
+        """
+        # Один векторный выбор из вектора состояния вместо четырех скалярных обращений к массиву
+        rsi, macd, macd_signal, ema = self._state.take(_SIGNAL_INPUTS).tolist()
+        return evaluate_signal(
+            profile,
+            current_close_price,
+            _none_if_nan(rsi),
+            _none_if_nan(macd),
+            _none_if_nan(macd_signal),
+            _none_if_nan(ema),
+            self.signal_params,
+        )
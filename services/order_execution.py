@@ -1,31 +1,55 @@
 # services/order_execution.py
 import json
-import os
-import asyncio  # Для asyncio.to_thread
-from decimal import Decimal, ROUND_DOWN  # Для точной работы с числами
-from typing import Optional
+import asyncio
+from decimal import Decimal  # Для точной работы с числами
+from typing import NamedTuple, Optional
 
-from services.binance_client import client  # Клиент Binance
+import aiohttp
+from binance.exceptions import BinanceAPIException, BinanceOrderException, BinanceRequestException
+
+from services.binance_client import client, get_async_client  # Клиент Binance (синхронный и общий асинхронный)
 # Утилиты для расчета количества
-from utils.quantity_utils import get_lot_size, round_step_size
+from utils.quantity_utils import get_symbol_meta_async, round_step_size
 import config.settings as settings  # Глобальные настройки
-from colorama import Fore, Style  # Для цветного вывода в консоль
-from utils.profit_check import save_last_buy_price, get_last_buy_price_path
-from utils.notifier import send_notification  # Асинхронные уведомления
+from utils.position_manager import load_last_buy_price  # Цена покупки открытой позиции (в памяти)
+from utils.notifier import notify  # Уведомления через фоновую очередь (не ждут Telegram)
 from utils.logger import trading_logger, system_logger  # Логгеры
 
+# Комиссия разбирается в Decimal один раз при импорте, а не при каждом расчете количества
+COMMISSION_RATE = Decimal(str(settings.COMMISSION_RATE)) if getattr(
+    settings, 'USE_COMMISSION', False) else Decimal('0')
+ORDER_RESPONSE_TYPE = getattr(settings, 'ORDER_RESPONSE_TYPE', 'FULL')
+
+# Ожидаемые сбои запроса к Binance (ответ с ошибкой, сеть, таймаут). Прочие исключения - ошибки в коде:
+# они не маскируются под "ордер не размещен", а доходят до вызывающей стороны
+REST_ERRORS = (BinanceAPIException, BinanceOrderException, BinanceRequestException,
+               aiohttp.ClientError, asyncio.TimeoutError)
+# Некорректные данные в ответе (нет ключа, не число)
+RESPONSE_DATA_ERRORS = (KeyError, TypeError, ValueError, ArithmeticError)
+
+# Шаблоны сообщений об исполнении ордера: разбираются один раз, при вызове - только подстановка.
+# Общие позиционные аргументы: 0 symbol, 1 executed_qty, 2 base_asset, 3 avg_price, 4 quote_asset,
+# 5 quote_qty, 6 commission, 7 commission_asset, 8 точность количества, 9 точность цены
+_BUY_FILLED_LOG = ("✅ ПОКУПКА ({0}): {1:.{8}f} {2} @ ~{3:.{9}f} {4}. "
+                   "Потрачено: {5:.8f} {4}. Комиссия: {6:.8f} {7}.").format
+_SELL_FILLED_LOG = ("✅ ПРОДАЖА ({0}): {1:.{8}f} {2} @ ~{3:.{9}f} {4}. "
+                    "Получено: {5:.8f} {4}. Комиссия: {6:.8f} {7}.").format
+_BUY_FILLED_TG = "🟢 КУПЛЕНО: {1:.4f} {2} для {0} @ ~{3:.4f} {4}\nКомиссия: {6:.6f} {7}".format
+_SELL_FILLED_TG = "🔴 ПРОДАНО: {1:.4f} {2} для {0} @ ~{3:.4f} {4}\nКомиссия: {6:.6f} {7}".format
+
 
 async def get_asset_balance_async(asset: str) -> Optional[Decimal]:
     # ... (твой существующий код get_asset_balance_async)
     try:
         for attempt in range(3):
-            balance_info = await asyncio.to_thread(client.get_asset_balance, asset=asset)
+            async_client = await get_async_client()
+            balance_info = await async_client.get_asset_balance(asset=asset)
             if balance_info is not None:
                 break
             await asyncio.sleep(2)
         else:
             trading_logger.error(
-                f"Order Execution: Баланс не получен для  {asset} после 3 попыток, возвращаю 0.")
+                f"Order Execution: Баланс не получен для  {asset} после 3 попыток, возвращаю None.")
             return None
 
         if balance_info and 'free' in balance_info:
@@ -33,359 +57,425 @@ async def get_asset_balance_async(asset: str) -> Optional[Decimal]:
         trading_logger.warning(
             f"Order Execution: Не удалось получить 'free' баланс для {asset}, ответ: {balance_info}")
         return Decimal('0')  # Возвращаем 0 если 'free' нет
-    except Exception as e:
+    except REST_ERRORS + RESPONSE_DATA_ERRORS as e:
         trading_logger.error(
-            f"Order Execution: Ошибка при получении баланса для {asset}: {e}", exc_info=True)
-        return None  # Возвращаем None в случае других ошибок
+            f"Order Execution: Ошибка при получении баланса для {asset}: {e!r}")
+        return None  # Ожидаемый сбой REST или некорректный ответ: баланс неизвестен
 
 
-async def place_order_async(
-    symbol: str,
-    action: str,  # 'buy' or 'sell'
-    quantity_to_trade: Decimal,
-    order_type: str,  # 'MARKET' или 'LIMIT'
-    # Цена для LIMIT ордера или ТЕКУЩАЯ РЫНОЧНАЯ для MARKET SELL (для проверки)
-    limit_price: Optional[Decimal] = None,
-    stop_price: Optional[Decimal] = None,
-    profile_name: Optional[str] = "default"
-) -> Optional[dict]:
+async def get_balance_and_price_async(symbol: str, asset: str) -> tuple[Optional[Decimal], Optional[Decimal]]:
     """
-    Асинхронно размещает ордер на покупку или продажу с учетом всех проверок и логики.
-    Использует Decimal для всех расчетов, связанных с ценой и количеством.
+    Свободный баланс asset и текущая цена symbol: оба независимых запроса идут параллельно (asyncio.gather),
+    поэтому ожидание - один сетевой round-trip вместо двух. None вместо значения, которое не удалось получить.
     """
-    qty_str = f"{quantity_to_trade:.8f}" if isinstance(
-        quantity_to_trade, Decimal) else str(quantity_to_trade)
-    limit_price_str = f"{limit_price:.8f}" if limit_price else "N/A"
-
-    # --- НАЧАЛО БЛОКА ЛОГИРОВАНИЯ ДЛЯ ДИАГНОСТИКИ ---
-    trading_logger.info(
-        f"place_order_async ВЫЗВАН для {symbol}: action={action}, quantity_to_trade={qty_str}, "
-        f"order_type={order_type}, limit_price_ARG={limit_price_str}, profile={profile_name}"
+    async_client = await get_async_client()
+    balance, ticker = await asyncio.gather(
+        get_asset_balance_async(asset),
+        async_client.get_symbol_ticker(symbol=symbol),
+        return_exceptions=True,
     )
-    # --- КОНЕЦ БЛОКА ЛОГИРОВАНИЯ ДЛЯ ДИАГНОСТИКИ ---
+    if isinstance(balance, BaseException):
+        trading_logger.error(f"Order Execution: Ошибка при получении баланса для {asset}: {balance!r}")
+        balance = None
+    try:
+        if isinstance(ticker, BaseException):
+            raise ticker
+        price = Decimal(ticker['price'])
+    except REST_ERRORS + RESPONSE_DATA_ERRORS as e:
+        trading_logger.error(f"Order Execution ({symbol}): Не удалось получить текущую цену: {e!r}")
+        price = None
+    return balance, price
 
-    lot_size_info = await asyncio.to_thread(get_lot_size, symbol)
-    if not lot_size_info:
-        trading_logger.error(
-            f"Order Execution ({symbol}): Не удалось получить информацию о лоте. Ордер отменен.")
-        await send_notification(f"❌ Ошибка ордера {action.upper()} для {symbol}: Не получена информация о лоте.")
-        return None
 
-    min_qty = Decimal(lot_size_info['minQty'])
-    step_size = Decimal(lot_size_info['stepSize'])
-    base_asset = lot_size_info['baseAsset']
-    quote_asset = lot_size_info['quoteAsset']
-    precision_amount = int(lot_size_info['precision_amount'])
-    precision_price = int(lot_size_info['precision_price'])
+class OrderFill(NamedTuple):
+    """Итоги исполненного ордера (см. summarize_fill)."""
+    executed_qty: Decimal
+    cummulative_quote_qty: Decimal
+    avg_price: Decimal
+    commission: Decimal
+    commission_asset: str
 
-    if not isinstance(quantity_to_trade, Decimal):
-        quantity_to_trade = Decimal(str(quantity_to_trade))
 
-    rounded_quantity = round_step_size(quantity_to_trade, step_size)
+# Ключ, под которым _buy/_sell кладут OrderFill в ответ исполненного ордера (None - ответ не разобран)
+FILL_SUMMARY_KEY = "fill_summary"
 
-    # Пропускаем проверку если quantity_to_trade == 0 (например, при ошибке расчета)
-    if rounded_quantity < min_qty and rounded_quantity > Decimal('0'):
-        trading_logger.warning(
-            f"Order Execution ({symbol}): Рассчитанное количество {rounded_quantity:.8f} {base_asset} "
-            f"меньше минимально допустимого ({min_qty:.8f} {base_asset}). Действие '{action}' отменено."
-        )
-        return None
-    if rounded_quantity == Decimal('0'):
+
+def summarize_fill(order_response: dict, price_quantum: Decimal, default_commission_asset: str,
+                   commission_rate: Decimal = COMMISSION_RATE) -> OrderFill:
+    """
+    Итоги исполненного ордера за один проход по fills:
+    (executed_qty, cummulative_quote_qty, avg_executed_price, commission_total, commission_asset).
+    Количество и сумма берутся из executedQty/cummulativeQuoteQty ответа, по fills суммируется только комиссия.
+    В ответе RESULT fills нет: комиссия оценивается по commission_rate - от купленного количества для BUY
+    и от полученной суммы для SELL.
+    """
+    executed_qty = Decimal(order_response.get('executedQty', '0'))
+    cummulative_quote_qty = Decimal(order_response.get('cummulativeQuoteQty', '0'))
+    avg_executed_price = Decimal('0')
+    if executed_qty > Decimal('0'):
+        avg_executed_price = (cummulative_quote_qty / executed_qty).quantize(price_quantum)
+
+    fills = order_response.get('fills')
+    if not fills:
+        fee_base = executed_qty if order_response.get('side') == 'BUY' else cummulative_quote_qty
+        return OrderFill(executed_qty, cummulative_quote_qty, avg_executed_price,
+                         fee_base * commission_rate, default_commission_asset)
+    commission_total = sum((Decimal(fill['commission']) for fill in fills), Decimal('0'))
+    # Комиссия ордера списывается в одном активе: берем его из первого fill
+    commission_asset = fills[0]['commissionAsset']
+    return OrderFill(executed_qty, cummulative_quote_qty, avg_executed_price, commission_total, commission_asset)
+
+
+async def _buy(symbol: str, meta, rounded_quantity: Decimal, order_type: str,
+               limit_price: Optional[Decimal], quote_asset_balance: Optional[Decimal]) -> Optional[dict]:
+    """Проверка баланса котируемого актива и размещение ордера BUY. quote_asset_balance - уже полученный баланс или None."""
+    base_asset, quote_asset = meta.base, meta.quote
+    precision_amount, precision_price = meta.amount_precision, meta.price_precision
+    price_quantum = Decimal(1).scaleb(-precision_price)  # 10^-precision_price для quantize средней цены
+
+    trading_logger.info(
+        f"Order Execution ({symbol}): Инициация покупки {rounded_quantity:.{precision_amount}f} {base_asset}...")
+    if quote_asset_balance is None:  # Баланс еще не запрашивался при расчете количества
+        quote_asset_balance = await get_asset_balance_async(quote_asset)
+    if quote_asset_balance is None:  # Ошибка получения баланса
         trading_logger.error(
-            f"Order Execution ({symbol}): Количество для торговли равно 0 для {action}. Ордер отменен.")
+            f"Order Execution ({symbol}): Не удалось получить баланс {quote_asset}. Покупка отменена.")
+        notify(f"❌ Ошибка ордера BUY для {symbol}: Не удалось получить баланс {quote_asset}.")
         return None
 
-    order_response = None
+    estimated_cost = Decimal('0')
+    # Предполагаем, что limit_price - это текущая цена для MARKET
+    current_price_for_buy_check = limit_price
 
-    if action.lower() == 'buy':
-        # ... (существующая логика покупки: проверка баланса, расчет стоимости и т.д.)
-        # ВАЖНО: Убедись, что save_last_buy_price и position_manager.update_position вызываются корректно ПОСЛЕ УСПЕШНОЙ ПОКУПКИ
-        # Примерно так, как было в твоем коде (я добавил avg_executed_price):
-        trading_logger.info(
-            f"Order Execution ({symbol}): Инициация покупки {rounded_quantity:.{precision_amount}f} {base_asset}...")
-        try:
-            quote_asset_balance = await get_asset_balance_async(quote_asset)
-            if quote_asset_balance is None:  # Ошибка получения баланса
-                trading_logger.error(
-                    f"Order Execution ({symbol}): Не удалось получить баланс {quote_asset}. Покупка отменена.")
-                await send_notification(f"❌ Ошибка ордера BUY для {symbol}: Не удалось получить баланс {quote_asset}.")
-                return None
+    if order_type.upper() == 'MARKET':
+        if current_price_for_buy_check is None or current_price_for_buy_check <= Decimal('0'):
+            trading_logger.error(
+                f"Order Execution ({symbol}): Для MARKET BUY не передана текущая цена (через limit_price). Невозможно оценить стоимость. Покупка отменена.")
+            return None
+        estimated_cost = rounded_quantity * current_price_for_buy_check
+    elif order_type.upper() == 'LIMIT':
+        if limit_price is None or limit_price <= Decimal('0'):
+            trading_logger.error(
+                f"Order Execution ({symbol}): Для LIMIT BUY не указана корректная цена. Покупка отменена.")
+            return None
+        estimated_cost = rounded_quantity * limit_price
 
-            estimated_cost = Decimal('0')
-            # Предполагаем, что limit_price - это текущая цена для MARKET
-            current_price_for_buy_check = limit_price
-
-            if order_type.upper() == 'MARKET':
-                if current_price_for_buy_check is None or current_price_for_buy_check <= Decimal('0'):
-                    trading_logger.error(
-                        f"Order Execution ({symbol}): Для MARKET BUY не передана текущая цена (через limit_price). Невозможно оценить стоимость. Покупка отменена.")
-                    return None
-                estimated_cost = rounded_quantity * current_price_for_buy_check
-            elif order_type.upper() == 'LIMIT':
-                if limit_price is None or limit_price <= Decimal('0'):
-                    trading_logger.error(
-                        f"Order Execution ({symbol}): Для LIMIT BUY не указана корректная цена. Покупка отменена.")
-                    return None
-                estimated_cost = rounded_quantity * limit_price
-
-            if quote_asset_balance < estimated_cost:
-                trading_logger.error(
-                    f"Order Execution ({symbol}): Недостаточно средств на балансе {quote_asset}. "
-                    f"Требуется: ~{estimated_cost:.8f}, Доступно: {quote_asset_balance:.8f}. Покупка отменена."
-                )
-                await send_notification(
-                    f"❌ Ордер BUY для {symbol} отменен: недостаточно {quote_asset}. "
-                    f"Надо: ~{estimated_cost:.2f}, есть: {quote_asset_balance:.2f}"
-                )
-                return None
+    if quote_asset_balance < estimated_cost:
+        trading_logger.error(
+            f"Order Execution ({symbol}): Недостаточно средств на балансе {quote_asset}. "
+            f"Требуется: ~{estimated_cost:.8f}, Доступно: {quote_asset_balance:.8f}. Покупка отменена."
+        )
+        notify(
+            f"❌ Ордер BUY для {symbol} отменен: недостаточно {quote_asset}. "
+            f"Надо: ~{estimated_cost:.2f}, есть: {quote_asset_balance:.2f}"
+        )
+        return None
 
-            order_params = {
-                'symbol': symbol, 'side': client.SIDE_BUY, 'type': order_type.upper(),
-                'quantity': f"{rounded_quantity:.{precision_amount}f}"
-            }
-            if order_type.upper() == 'LIMIT':
-                order_params['price'] = f"{limit_price:.{precision_price}f}"
-                order_params['timeInForce'] = client.TIME_IN_FORCE_GTC
+    order_params = {
+        'symbol': symbol, 'side': client.SIDE_BUY, 'type': order_type.upper(),
+        'quantity': f"{rounded_quantity:.{precision_amount}f}",
+        'newOrderRespType': ORDER_RESPONSE_TYPE,
+    }
+    if order_type.upper() == 'LIMIT':
+        order_params['price'] = f"{limit_price:.{precision_price}f}"
+        order_params['timeInForce'] = client.TIME_IN_FORCE_GTC
 
-            trading_logger.info(
-                f"Order Execution ({symbol}): Отправка {order_type.upper()} BUY ордера: {order_params}")
-            order_response = await asyncio.to_thread(client.create_order, **order_params)
-            trading_logger.info(
-                f"Order Execution ({symbol}): Ответ на ордер BUY: {json.dumps(order_response, indent=2)}")
-
-            if order_response and order_response.get('status') == 'FILLED':
-                executed_qty_str = order_response.get('executedQty', '0')
-                cummulative_quote_qty_str = order_response.get(
-                    'cummulativeQuoteQty', '0')
-                executed_qty = Decimal(executed_qty_str)
-                cummulative_quote_qty = Decimal(cummulative_quote_qty_str)
-
-                avg_executed_price = Decimal('0')
-                if executed_qty > Decimal('0'):
-                    avg_executed_price = (
-                        cummulative_quote_qty / executed_qty).quantize(Decimal('1e-{}'.format(precision_price)))
-
-                commission_total = Decimal('0')
-                commission_asset_str = base_asset  # По умолчанию
-                if order_response.get('fills'):
-                    for fill in order_response['fills']:
-                        commission_total += Decimal(fill['commission'])
-                        commission_asset_str = fill['commissionAsset']
+    trading_logger.info(
+        f"Order Execution ({symbol}): Отправка {order_type.upper()} BUY ордера: {order_params}")
+    try:
+        order_response = await (await get_async_client()).create_order(**order_params)
+    except REST_ERRORS as e:
+        trading_logger.error(f"Order Execution ({symbol}): Ошибка при размещении ордера BUY: {e!r}")
+        notify(f"❌ Ошибка ордера BUY для {symbol}: {e}")
+        return None
+    trading_logger.info(
+        f"Order Execution ({symbol}): Ответ на ордер BUY: {json.dumps(order_response, indent=2)}")
 
-                trading_logger.info(
-                    f"✅ ПОКУПКА ({symbol}): {executed_qty:.{precision_amount}f} {base_asset} @ ~{avg_executed_price:.{precision_price}f} {quote_asset}. "
-                    f"Потрачено: {cummulative_quote_qty:.8f} {quote_asset}. Комиссия: {commission_total:.8f} {commission_asset_str}."
-                )
-                await send_notification(
-                    f"🟢 КУПЛЕНО: {executed_qty:.4f} {base_asset} для {symbol} @ ~{avg_executed_price:.4f} {quote_asset}\n"
-                    f"Комиссия: {commission_total:.6f} {commission_asset_str}"
-                )
-                save_last_buy_price(symbol, float(avg_executed_price), float(
-                    executed_qty), profile_name if profile_name else "unknown_profile")
-                # Здесь тебе нужно будет импортировать и использовать твой position_manager
-                # from utils.position_manager import position_manager # Сделай это в начале файла
-                # position_manager.update_position(...) # Раскомментируй и используй, если он глобальный
-                # или передавай его как аргумент, как мы обсуждали для Пути 2
-            # ... (остальная обработка ответа на покупку) ...
-        except Exception as e:
-            trading_logger.error(
-                f"Order Execution ({symbol}): Ошибка при размещении ордера BUY: {e}", exc_info=True)
-            await send_notification(f"❌ Ошибка ордера BUY для {symbol}: {e}")
-            order_response = None
+    if order_response and order_response.get('status') == 'FILLED':
+        # Ордер уже исполнен: ошибка разбора ответа не должна превращать покупку в "неудачную"
+        try:
+            fill = summarize_fill(order_response, price_quantum, base_asset)
+        except RESPONSE_DATA_ERRORS as e:
+            trading_logger.error(f"Order Execution ({symbol}): Ордер BUY исполнен, но ответ не разобран: {e!r}")
+            notify(f"🟢 КУПЛЕНО: {symbol} (детали исполнения не разобраны, см. лог)")
+            order_response[FILL_SUMMARY_KEY] = None
+            return order_response
+        order_response[FILL_SUMMARY_KEY] = fill
+        (executed_qty, cummulative_quote_qty, avg_executed_price,
+         commission_total, commission_asset_str) = fill
+
+        fill_args = (symbol, executed_qty, base_asset, avg_executed_price, quote_asset, cummulative_quote_qty,
+                     commission_total, commission_asset_str, precision_amount, precision_price)
+        trading_logger.info(_BUY_FILLED_LOG(*fill_args))
+        notify(_BUY_FILLED_TG(*fill_args))
+    return order_response
 
-    elif action.lower() == 'sell':
-        trading_logger.info(
-            f"Order Execution ({symbol}): Инициация продажи {rounded_quantity:.{precision_amount}f} {base_asset}...")
+
+async def _sell(symbol: str, meta, rounded_quantity: Decimal, order_type: str,
+                limit_price: Optional[Decimal], base_asset_balance: Optional[Decimal]) -> Optional[dict]:
+    """
+    Сверка с балансом базового актива, защита от продажи в убыток и размещение ордера SELL.
+    base_asset_balance - баланс, уже полученный при расчете количества, или None.
+    """
+    base_asset, quote_asset = meta.base, meta.quote
+    min_qty, step_size = meta.min_qty, meta.step_size
+    precision_amount, precision_price = meta.amount_precision, meta.price_precision
+    price_quantum = Decimal(1).scaleb(-precision_price)  # 10^-precision_price для quantize средней цены
+
+    trading_logger.info(
+        f"Order Execution ({symbol}): Инициация продажи {rounded_quantity:.{precision_amount}f} {base_asset}...")
+    if base_asset_balance is None:  # Баланс еще не запрашивался при расчете количества
         base_asset_balance = await get_asset_balance_async(base_asset)
 
-        # Убеждаемся, что количество для продажи не превышает доступный баланс
-        # и что оно соответствует тому, что мы хотим продать (rounded_quantity)
-        if base_asset_balance is None:
-            trading_logger.error(
-                f"Order Execution ({symbol}): Не удалось получить баланс {base_asset} для продажи. Продажа отменена.")
-            return None
-        if rounded_quantity > base_asset_balance:
+    # Убеждаемся, что количество для продажи не превышает доступный баланс
+    # и что оно соответствует тому, что мы хотим продать (rounded_quantity)
+    if base_asset_balance is None:
+        trading_logger.error(
+            f"Order Execution ({symbol}): Не удалось получить баланс {base_asset} для продажи. Продажа отменена.")
+        return None
+    if rounded_quantity > base_asset_balance:
+        trading_logger.warning(
+            f"Order Execution ({symbol}): Количество для продажи ({rounded_quantity:.{precision_amount}f}) "
+            f"превышает доступный баланс ({base_asset_balance:.{precision_amount}f} {base_asset}). "
+            f"Продаем доступный баланс."
+        )
+        rounded_quantity = round_step_size(
+            base_asset_balance, step_size)  # Округляем доступный баланс
+        if rounded_quantity < min_qty:
             trading_logger.warning(
-                f"Order Execution ({symbol}): Количество для продажи ({rounded_quantity:.{precision_amount}f}) "
-                f"превышает доступный баланс ({base_asset_balance:.{precision_amount}f} {base_asset}). "
-                f"Продаем доступный баланс."
-            )
-            rounded_quantity = round_step_size(
-                base_asset_balance, step_size)  # Округляем доступный баланс
-            if rounded_quantity < min_qty:
-                trading_logger.warning(
-                    f"Order Execution ({symbol}): Доступный баланс {base_asset_balance} после округления {rounded_quantity} меньше min_qty {min_qty}. Продажа отменена.")
-                return None
+                f"Order Execution ({symbol}): Доступный баланс {base_asset_balance} после округления {rounded_quantity} меньше min_qty {min_qty}. Продажа отменена.")
+            return None
+
+    if rounded_quantity < min_qty:  # Проверка после возможной коррекции по балансу
+        trading_logger.warning(
+            f"Order Execution ({symbol}): Рассчитанное количество для продажи {rounded_quantity:.{precision_amount}f} {base_asset} "
+            f"меньше минимально допустимого ({min_qty:.{precision_amount}f} {base_asset}). Продажа отменена."
+        )
+        return None
+
+    # --- НАЧАЛО БЛОКА ЛОГИРОВАНИЯ ДЛЯ ДИАГНОСТИКИ ЗАЩИТЫ ОТ УБЫТКА ---
+    # Позиция берется из памяти (utils.position_store), без чтения файла на пути ордера
+    last_buy_price = load_last_buy_price(symbol)
 
-        if rounded_quantity < min_qty:  # Проверка после возможной коррекции по балансу
+    # Цена, с которой будем сравнивать цену покупки
+    price_to_check_against_buy = Decimal('0')
+
+    if order_type.upper() == 'MARKET':
+        # limit_price используется для передачи current_market_price
+        if limit_price is not None and limit_price > Decimal('0'):
+            price_to_check_against_buy = limit_price
+            trading_logger.info(
+                f"Order Execution ({symbol}): Для MARKET SELL используем переданную рыночную цену для проверки: {price_to_check_against_buy:.{precision_price}f}")
+        else:
             trading_logger.warning(
-                f"Order Execution ({symbol}): Рассчитанное количество для продажи {rounded_quantity:.{precision_amount}f} {base_asset} "
-                f"меньше минимально допустимого ({min_qty:.{precision_amount}f} {base_asset}). Продажа отменена."
+                f"Order Execution ({symbol}): Для MARKET SELL не передана текущая рыночная цена (через аргумент limit_price) для проверки защиты от убытка. "
+                f"Защита от продажи в убыток НЕ БУДЕТ ВЫПОЛНЕНА."
             )
+            # Если цена для проверки не предоставлена, мы не можем выполнить защиту.
+            # Продолжаем без нее, но это рискованно.
+    elif order_type.upper() == 'LIMIT':
+        if limit_price is None or limit_price <= Decimal('0'):
+            trading_logger.error(
+                f"Order Execution ({symbol}): Для LIMIT SELL не указана корректная цена (в limit_price). Продажа отменена.")
             return None
+        # Для LIMIT ордера сравниваем с ценой лимита
+        price_to_check_against_buy = limit_price
+        trading_logger.info(
+            f"Order Execution ({symbol}): Для LIMIT SELL используем цену лимита для проверки: {price_to_check_against_buy:.{precision_price}f}")
 
-        # --- НАЧАЛО БЛОКА ЛОГИРОВАНИЯ ДЛЯ ДИАГНОСТИКИ ЗАЩИТЫ ОТ УБЫТКА ---
-        buy_price_file_path = get_last_buy_price_path(
-            symbol, profile_name if profile_name else "unknown_profile")
-        last_buy_info = None
-        if os.path.exists(buy_price_file_path):
-            try:
-                with open(buy_price_file_path, 'r') as f:
-                    last_buy_info = json.load(f)
-            except Exception as e_load:
-                trading_logger.error(
-                    f"Order Execution ({symbol}): Ошибка загрузки файла цены покупки '{buy_price_file_path}': {e_load}")
-
-        # Цена, с которой будем сравнивать цену покупки
-        price_to_check_against_buy = Decimal('0')
+    use_paper_trading = getattr(settings, 'USE_PAPER_TRADING', False)
+    if last_buy_price is not None:
+        try:
+            last_buy_price_from_file = Decimal(str(last_buy_price))
 
-        if order_type.upper() == 'MARKET':
-            # limit_price используется для передачи current_market_price
-            if limit_price is not None and limit_price > Decimal('0'):
-                price_to_check_against_buy = limit_price
-                trading_logger.info(
-                    f"Order Execution ({symbol}): Для MARKET SELL используем переданную рыночную цену для проверки: {price_to_check_against_buy:.{precision_price}f}")
-            else:
-                trading_logger.warning(
-                    f"Order Execution ({symbol}): Для MARKET SELL не передана текущая рыночная цена (через аргумент limit_price) для проверки защиты от убытка. "
-                    f"Защита от продажи в убыток НЕ БУДЕТ ВЫПОЛНЕНА."
-                )
-                # Если цена для проверки не предоставлена, мы не можем выполнить защиту.
-                # Продолжаем без нее, но это рискованно.
-        elif order_type.upper() == 'LIMIT':
-            if limit_price is None or limit_price <= Decimal('0'):
-                trading_logger.error(
-                    f"Order Execution ({symbol}): Для LIMIT SELL не указана корректная цена (в limit_price). Продажа отменена.")
-                return None
-            # Для LIMIT ордера сравниваем с ценой лимита
-            price_to_check_against_buy = limit_price
             trading_logger.info(
-                f"Order Execution ({symbol}): Для LIMIT SELL используем цену лимита для проверки: {price_to_check_against_buy:.{precision_price}f}")
+                f"ПРОВЕРКА ПЕРЕД ПРОДАЖЕЙ ({symbol}):\n"
+                f"  Цена покупки из файла (last_buy_price_from_file): {last_buy_price_from_file:.{precision_price}f}\n"
+                f"  Цена для проверки продажи (price_to_check_against_buy): {price_to_check_against_buy:.{precision_price}f}\n"
+                f"  settings.USE_PAPER_TRADING: {use_paper_trading}"
+            )
 
-        if last_buy_info:
-            try:
-                last_buy_price_from_file = Decimal(str(last_buy_info['price']))
-                # buy_quantity_from_file = Decimal(str(last_buy_info.get('quantity', '0.0'))) # Можем использовать позже, если нужно
+            # Только если есть актуальная цена для проверки
+            if price_to_check_against_buy > Decimal('0'):
+                check1_not_paper_trading = not use_paper_trading
+                check2_price_lower = price_to_check_against_buy < last_buy_price_from_file
 
                 trading_logger.info(
-                    f"ПРОВЕРКА ПЕРЕД ПРОДАЖЕЙ ({symbol}):\n"
-                    f"  Цена покупки из файла (last_buy_price_from_file): {last_buy_price_from_file:.{precision_price}f}\n"
-                    f"  Цена для проверки продажи (price_to_check_against_buy): {price_to_check_against_buy:.{precision_price}f}\n"
-                    f"  settings.USE_PAPER_TRADING: {settings.USE_PAPER_TRADING}"
+                    f"ПОДУСЛОВИЯ для отмены продажи ({symbol}):\n"
+                    f"  (not settings.USE_PAPER_TRADING) IS {check1_not_paper_trading}\n"
+                    f"  (price_to_check_against_buy < last_buy_price_from_file) IS {check2_price_lower} "
+                    f"({price_to_check_against_buy:.{precision_price}f} < {last_buy_price_from_file:.{precision_price}f})"
                 )
 
-                # Только если есть актуальная цена для проверки
-                if price_to_check_against_buy > Decimal('0'):
-                    check1_not_paper_trading = not settings.USE_PAPER_TRADING
-                    check2_price_lower = price_to_check_against_buy < last_buy_price_from_file
-
-                    trading_logger.info(
-                        f"ПОДУСЛОВИЯ для отмены продажи ({symbol}):\n"
-                        f"  (not settings.USE_PAPER_TRADING) IS {check1_not_paper_trading}\n"
-                        f"  (price_to_check_against_buy < last_buy_price_from_file) IS {check2_price_lower} "
-                        f"({price_to_check_against_buy:.{precision_price}f} < {last_buy_price_from_file:.{precision_price}f})"
+                if check1_not_paper_trading and check2_price_lower:
+                    trading_logger.warning(
+                        f"🚫 ОТМЕНА ПРОДАЖИ ({symbol}): Цена проверки ({price_to_check_against_buy:.{precision_price}f}) "
+                        f"НИЖЕ цены покупки ({last_buy_price_from_file:.{precision_price}f}). Защита сработала."
                     )
-
-                    if check1_not_paper_trading and check2_price_lower:
-                        trading_logger.warning(
-                            f"🚫 ОТМЕНА ПРОДАЖИ ({symbol}): Цена проверки ({price_to_check_against_buy:.{precision_price}f}) "
-                            f"НИЖЕ цены покупки ({last_buy_price_from_file:.{precision_price}f}). Защита сработала."
-                        )
-                        return None  # Отменяем продажу
-                    else:
-                        trading_logger.info(
-                            f"Условие отмены продажи НЕ ВЫПОЛНЕНО для {symbol}. Продажа РАЗРЕШЕНА."
-                        )
+                    return None  # Отменяем продажу
                 else:
-                    trading_logger.warning(
-                        f"Order Execution ({symbol}): Нет актуальной цены для проверки (price_to_check_against_buy = 0). "
-                        f"Продажа продолжается без ценовой защиты от убытков. ЭТО РИСК!"
+                    trading_logger.info(
+                        f"Условие отмены продажи НЕ ВЫПОЛНЕНО для {symbol}. Продажа РАЗРЕШЕНА."
                     )
-            except (ValueError, TypeError, KeyError) as e:
-                trading_logger.error(
-                    f"Order Execution ({symbol}): Ошибка данных в файле цены покупки '{buy_price_file_path}' при проверке: {e}. Содержимое: {last_buy_info}"
+            else:
+                trading_logger.warning(
+                    f"Order Execution ({symbol}): Нет актуальной цены для проверки (price_to_check_against_buy = 0). "
+                    f"Продажа продолжается без ценовой защиты от убытков. ЭТО РИСК!"
                 )
-                await send_notification(f"⚠️ Ошибка данных о покупке для {symbol}. Продажа отменена для безопасности.")
-                return None
-        else:
-            trading_logger.warning(
-                f"Информация для ПРОДАЖИ ({symbol}): Файл цены покупки '{buy_price_file_path}' не найден. "
-                f"Продажа без проверки цены покупки."
+        except (ValueError, TypeError, ArithmeticError) as e:
+            trading_logger.error(
+                f"Order Execution ({symbol}): Ошибка данных о цене покупки при проверке: {e}. Значение: {last_buy_price!r}"
             )
-        # --- КОНЕЦ БЛОКА ЛОГИРОВАНИЯ ДЛЯ ДИАГНОСТИКИ ЗАЩИТЫ ОТ УБЫТКА ---
+            notify(f"⚠️ Ошибка данных о покупке для {symbol}. Продажа отменена для безопасности.")
+            return None
+    else:
+        trading_logger.warning(
+            f"Информация для ПРОДАЖИ ({symbol}): Цена покупки не найдена. "
+            f"Продажа без проверки цены покупки."
+        )
+    # --- КОНЕЦ БЛОКА ЛОГИРОВАНИЯ ДЛЯ ДИАГНОСТИКИ ЗАЩИТЫ ОТ УБЫТКА ---
+
+    # Если все проверки пройдены, размещаем ордер на продажу
+    order_params = {
+        'symbol': symbol, 'side': client.SIDE_SELL, 'type': order_type.upper(),
+        'quantity': f"{rounded_quantity:.{precision_amount}f}",
+        'newOrderRespType': ORDER_RESPONSE_TYPE,
+    }
+    if order_type.upper() == 'LIMIT':
+        # Доп. проверка для LIMIT перед отправкой
+        if limit_price is None or limit_price <= Decimal('0'):
+            trading_logger.error(
+                f"Order Execution ({symbol}): Попытка отправить LIMIT SELL без корректной limit_price. Ордер отменен.")
+            return None
+        order_params['price'] = f"{limit_price:.{precision_price}f}"
+        order_params['timeInForce'] = client.TIME_IN_FORCE_GTC
+
+    trading_logger.info(
+        f"Order Execution ({symbol}): Отправка {order_type.upper()} SELL ордера: {order_params}")
+    try:
+        order_response = await (await get_async_client()).create_order(**order_params)
+    except REST_ERRORS as e:
+        trading_logger.error(f"Order Execution ({symbol}): Ошибка при размещении ордера SELL: {e!r}")
+        notify(f"❌ Ошибка ордера SELL для {symbol}: {e}")
+        return None
+    trading_logger.info(
+        f"Order Execution ({symbol}): Ответ на ордер SELL: {json.dumps(order_response, indent=2)}")
 
-        # Если все проверки пройдены, размещаем ордер на продажу
+    if order_response and order_response.get('status') == 'FILLED':
+        # Ордер уже исполнен: ошибка разбора ответа не должна превращать продажу в "неудачную"
         try:
-            order_params = {
-                'symbol': symbol, 'side': client.SIDE_SELL, 'type': order_type.upper(),
-                'quantity': f"{rounded_quantity:.{precision_amount}f}"
-            }
-            if order_type.upper() == 'LIMIT':
-                # Доп. проверка для LIMIT перед отправкой
-                if limit_price is None or limit_price <= Decimal('0'):
-                    trading_logger.error(
-                        f"Order Execution ({symbol}): Попытка отправить LIMIT SELL без корректной limit_price. Ордер отменен.")
-                    return None
-                order_params['price'] = f"{limit_price:.{precision_price}f}"
-                order_params['timeInForce'] = client.TIME_IN_FORCE_GTC
+            fill = summarize_fill(order_response, price_quantum, quote_asset)
+        except RESPONSE_DATA_ERRORS as e:
+            trading_logger.error(f"Order Execution ({symbol}): Ордер SELL исполнен, но ответ не разобран: {e!r}")
+            notify(f"🔴 ПРОДАНО: {symbol} (детали исполнения не разобраны, см. лог)")
+            order_response[FILL_SUMMARY_KEY] = None
+            return order_response
+        order_response[FILL_SUMMARY_KEY] = fill
+        (executed_qty, cummulative_quote_qty, avg_executed_price,
+         commission_total, commission_asset_str) = fill
+
+        fill_args = (symbol, executed_qty, base_asset, avg_executed_price, quote_asset, cummulative_quote_qty,
+                     commission_total, commission_asset_str, precision_amount, precision_price)
+        trading_logger.info(_SELL_FILLED_LOG(*fill_args))
+        notify(_SELL_FILLED_TG(*fill_args))
+    return order_response
 
-            trading_logger.info(
-                f"Order Execution ({symbol}): Отправка {order_type.upper()} SELL ордера: {order_params}")
-            order_response = await asyncio.to_thread(client.create_order, **order_params)
-            trading_logger.info(
-                f"Order Execution ({symbol}): Ответ на ордер SELL: {json.dumps(order_response, indent=2)}")
-
-            if order_response and order_response.get('status') == 'FILLED':
-                # ... (существующая логика обработки успешной продажи) ...
-                # Важно: Убедись, что delete_last_buy_price и position_manager.clear_position вызываются здесь
-                executed_qty_str = order_response.get('executedQty', '0')
-                cummulative_quote_qty_str = order_response.get(
-                    'cummulativeQuoteQty', '0')
-                executed_qty = Decimal(executed_qty_str)
-                cummulative_quote_qty = Decimal(cummulative_quote_qty_str)
-
-                avg_executed_price = Decimal('0')
-                if executed_qty > Decimal('0'):
-                    avg_executed_price = (
-                        cummulative_quote_qty / executed_qty).quantize(Decimal('1e-{}'.format(precision_price)))
-
-                commission_total = Decimal('0')
-                commission_asset_str = quote_asset
-                if order_response.get('fills'):
-                    for fill in order_response['fills']:
-                        commission_total += Decimal(fill['commission'])
-                        commission_asset_str = fill['commissionAsset']
 
-                trading_logger.info(
-                    f"✅ ПРОДАЖА ({symbol}): {executed_qty:.{precision_amount}f} {base_asset} @ ~{avg_executed_price:.{precision_price}f} {quote_asset}. "
-                    f"Получено: {cummulative_quote_qty:.8f} {quote_asset}. Комиссия: {commission_total:.8f} {commission_asset_str}."
-                )
-                await send_notification(
-                    f"🔴 ПРОДАНО: {executed_qty:.4f} {base_asset} для {symbol} @ ~{avg_executed_price:.4f} {quote_asset}\n"
-                    f"Комиссия: {commission_total:.6f} {commission_asset_str}"
-                )
+# Обработчик по действию: одна выборка из словаря вместо цепочки сравнений строк.
+# Сигнатура общая, последний аргумент - уже полученный баланс актива стороны сделки
+# (котируемого для BUY, базового для SELL) или None
+_ORDER_HANDLERS = {'buy': _buy, 'sell': _sell}
 
-                if os.path.exists(buy_price_file_path):
-                    try:
-                        await asyncio.to_thread(os.remove, buy_price_file_path)
-                        trading_logger.info(
-                            f"Order Execution ({symbol}): Файл цены покупки '{buy_price_file_path}' удален после продажи.")
-                    except OSError as e_remove:
-                        trading_logger.error(
-                            f"Order Execution ({symbol}): Не удалось удалить файл цены покупки '{buy_price_file_path}': {e_remove}")
-                # Здесь тебе нужно будет импортировать и использовать твой position_manager
-                # from utils.position_manager import position_manager # Сделай это в начале файла
-                # position_manager.clear_position(symbol) # Раскомментируй и используй, если он глобальный
-            # ... (остальная обработка ответа на продажу) ...
-        except Exception as e:
-            trading_logger.error(
-                f"Order Execution ({symbol}): Ошибка при размещении ордера SELL: {e}", exc_info=True)
-            await send_notification(f"❌ Ошибка ордера SELL для {symbol}: {e}")
-            order_response = None
 
-    else:
+async def place_order_async(
+    symbol: str,
+    action: str,  # 'buy' or 'sell'
+    # None - рассчитать по балансу: BUY на весь баланс котируемого актива (за вычетом комиссии), SELL - весь базовый актив
+    quantity_to_trade: Optional[Decimal] = None,
+    order_type: str = 'MARKET',  # 'MARKET' или 'LIMIT'
+    # Цена для LIMIT ордера или ТЕКУЩАЯ РЫНОЧНАЯ для MARKET SELL (для проверки)
+    limit_price: Optional[Decimal] = None,
+    stop_price: Optional[Decimal] = None,
+    profile_name: Optional[str] = "default"
+) -> Optional[dict]:
+    """
+    Асинхронно размещает ордер на покупку или продажу с учетом всех проверок и логики.
+    Использует Decimal для всех расчетов, связанных с ценой и количеством.
+    Все сетевые запросы (баланс, ордер) идут через общий AsyncClient, файловый ввод-вывод - в рабочем потоке,
+    поэтому цикл событий не блокируется. Позицию ведет вызывающая сторона (execute_trade_action).
+    Возвращает ответ Binance (успех - только status == 'FILLED') или None, если ордер не отправлен.
+    У исполненного ордера в ответе есть FILL_SUMMARY_KEY: OrderFill с фактической средней ценой и количеством.
+    """
+    qty_str = f"{quantity_to_trade:.8f}" if isinstance(
+        quantity_to_trade, Decimal) else str(quantity_to_trade)
+    limit_price_str = f"{limit_price:.8f}" if limit_price else "N/A"
+
+    # --- НАЧАЛО БЛОКА ЛОГИРОВАНИЯ ДЛЯ ДИАГНОСТИКИ ---
+    trading_logger.info(
+        f"place_order_async ВЫЗВАН для {symbol}: action={action}, quantity_to_trade={qty_str}, "
+        f"order_type={order_type}, limit_price_ARG={limit_price_str}, profile={profile_name}"
+    )
+    # --- КОНЕЦ БЛОКА ЛОГИРОВАНИЯ ДЛЯ ДИАГНОСТИКИ ---
+
+    action = action.lower()
+    handler = _ORDER_HANDLERS.get(action)
+    if handler is None:
         trading_logger.error(
             f"Order Execution ({symbol}): Неизвестное действие '{action}'. Допустимы 'buy' или 'sell'.")
         return None
 
-    return order_response
+    # Правила символа из кеша exchange_info (сетевой запрос - только при первой загрузке или устаревании кеша)
+    meta = await get_symbol_meta_async(symbol)
+    if meta is None:
+        trading_logger.error(
+            f"Order Execution ({symbol}): Не удалось получить информацию о лоте. Ордер отменен.")
+        notify(f"❌ Ошибка ордера {action.upper()} для {symbol}: Не получена информация о лоте.")
+        return None
+
+    min_qty = meta.min_qty
+    base_asset = meta.base
+    quote_asset = meta.quote
+
+    # Баланс актива стороны сделки запрашивается один раз и передается обработчику
+    balance = None
+    if action == 'buy' and order_type.upper() == 'MARKET' and (limit_price is None or limit_price <= Decimal('0')):
+        # Текущая цена не передана: баланс и цену запрашиваем одновременно
+        balance, limit_price = await get_balance_and_price_async(symbol, quote_asset)
+
+    if quantity_to_trade is None:
+        # Количество не задано - считаем его по балансу
+        if action == 'buy':
+            if limit_price is None or limit_price <= Decimal('0'):
+                trading_logger.error(
+                    f"Order Execution ({symbol}): Для расчета количества BUY нужна цена (limit_price). Покупка отменена.")
+                return None
+            if balance is None:
+                balance = await get_asset_balance_async(quote_asset)
+            if balance is None:
+                trading_logger.error(
+                    f"Order Execution ({symbol}): Не удалось получить баланс {quote_asset}. Покупка отменена.")
+                notify(f"❌ Ошибка ордера BUY для {symbol}: Не удалось получить баланс {quote_asset}.")
+                return None
+            quantity_to_trade = balance / limit_price * (Decimal('1') - COMMISSION_RATE)
+        else:
+            balance = await get_asset_balance_async(base_asset)
+            quantity_to_trade = balance if balance is not None else Decimal('0')
+    elif not isinstance(quantity_to_trade, Decimal):
+        quantity_to_trade = Decimal(str(quantity_to_trade))
+
+    rounded_quantity = round_step_size(quantity_to_trade, meta.step_size)
+
+    # Пропускаем проверку если quantity_to_trade == 0 (например, при ошибке расчета)
+    if rounded_quantity < min_qty and rounded_quantity > Decimal('0'):
+        trading_logger.warning(
+            f"Order Execution ({symbol}): Рассчитанное количество {rounded_quantity:.8f} {base_asset} "
+            f"меньше минимально допустимого ({min_qty:.8f} {base_asset}). Действие '{action}' отменено."
+        )
+        return None
+    if rounded_quantity == Decimal('0'):
+        trading_logger.error(
+            f"Order Execution ({symbol}): Количество для торговли равно 0 для {action}. Ордер отменен.")
+        return None
+
+    # Проверки и размещение ордера, специфичные для стороны сделки
+    return await handler(symbol, meta, rounded_quantity, order_type, limit_price, balance)
@@ -1,4 +1,6 @@
 # services/trade_logic.py
+from typing import NamedTuple
+
 import numpy as np
 # Импортируем функции расчета индикаторов и ошибку
 from services.technical_indicators import (
@@ -8,6 +10,7 @@ from services.technical_indicators import (
     IndicatorCalculationError
 )
 from utils.logger import trading_logger  # Логгер для торговых операций
+from utils._njit import njit
 
 # Минимальное количество свечей, необходимое для корректного расчета большинства индикаторов.
 # Это значение должно быть немного больше, чем самый длинный период используемого индикатора + период сглаживания.
@@ -17,6 +20,97 @@ from utils.logger import trading_logger  # Логгер для торговых
 # Здесь оно приведено для информации и может использоваться для внутренних проверок, если необходимо.
 MIN_CANDLES_REQUIRED_BY_LOGIC = 50
 
+# Неизменяемый пустой массив для индикаторов, которые не рассчитываются
+_EMPTY_PRICES = np.empty(0, dtype=np.float64)
+_EMPTY_PRICES.flags.writeable = False
+
+
+# Коды решения ядра signal_decision
+SIGNAL_HOLD = 0
+SIGNAL_BUY = 1
+SIGNAL_SELL = -1
+SIGNAL_BUY_FILTERED = 2    # RSI/MACD дали buy, но его отклонил EMA фильтр
+SIGNAL_SELL_FILTERED = -2  # RSI/MACD дали sell, но его отклонил EMA фильтр
+
+
+@njit(cache=True)
+def signal_decision(price, rsi, macd, macd_signal, ema, use_rsi, use_macd, use_macd_for_buy, use_macd_for_sell,
+                    rsi_oversold, rsi_overbought, ema_buy_buffer, ema_sell_buffer):
+    """
+    Числовое ядро evaluate_signal (компилируется numba, если она установлена).
+    Отсутствующие значения индикаторов передаются как NaN: любое сравнение с NaN ложно,
+    поэтому непрогретый индикатор не дает сигнала, а EMA фильтр без значения EMA не применяется.
+    fastmath не используется - он не гарантирует семантику NaN.
+    Возвращает один из кодов SIGNAL_*.
+    """
+    rsi_buy = use_rsi and rsi < rsi_oversold
+    rsi_sell = use_rsi and rsi > rsi_overbought
+    macd_buy = use_macd and macd > macd_signal
+    macd_sell = use_macd and macd < macd_signal
+
+    # Покупка/продажа: RSI (с подтверждением MACD, если включено) или только MACD, если RSI выключен
+    if use_rsi:
+        buy = rsi_buy and (macd_buy or not (use_macd_for_buy and use_macd))
+        sell = rsi_sell and (macd_sell or not (use_macd_for_sell and use_macd))
+    else:
+        buy = use_macd_for_buy and macd_buy
+        sell = use_macd_for_sell and macd_sell
+
+    if buy:
+        if price < ema * (1.0 - ema_buy_buffer):
+            return SIGNAL_BUY_FILTERED
+        return SIGNAL_BUY
+    if sell:
+        if price > ema * (1.0 + ema_sell_buffer):
+            return SIGNAL_SELL_FILTERED
+        return SIGNAL_SELL
+    return SIGNAL_HOLD
+
+
+class SignalParams(NamedTuple):
+    """Параметры стратегии из профиля, приведенные к нужным типам один раз (а не getattr на каждом тике)."""
+    symbol: str
+    rsi_period: int
+    rsi_overbought: float
+    rsi_oversold: float
+    macd_fast_period: int
+    macd_slow_period: int
+    macd_signal_period: int
+    use_rsi: bool
+    use_macd: bool
+    use_ema: bool
+    ema_period: int
+    ema_buy_buffer: float
+    ema_sell_buffer: float
+    use_macd_for_buy: bool
+    use_macd_for_sell: bool
+
+
+def build_signal_params(profile: object) -> SignalParams:
+    """Собирает SignalParams из профиля (Profile или любого объекта с теми же атрибутами)."""
+    ema_buffer = getattr(profile, "EMA_BUFFER", 0.002)
+    return SignalParams(
+        symbol=profile.SYMBOL,
+        rsi_period=int(getattr(profile, "RSI_PERIOD", 14)),
+        rsi_overbought=float(getattr(profile, "RSI_OVERBOUGHT", 70.0)),
+        rsi_oversold=float(getattr(profile, "RSI_OVERSOLD", 30.0)),
+        macd_fast_period=int(getattr(profile, "MACD_FAST_PERIOD", 12)),
+        macd_slow_period=int(getattr(profile, "MACD_SLOW_PERIOD", 26)),
+        macd_signal_period=int(getattr(profile, "MACD_SIGNAL_PERIOD", 9)),
+        use_rsi=bool(getattr(profile, "USE_RSI", True)),
+        use_macd=bool(getattr(profile, "USE_MACD", True)),
+        use_ema=bool(getattr(profile, "USE_EMA", False)),
+        ema_period=int(getattr(profile, "EMA_PERIOD", 50)),
+        ema_buy_buffer=float(getattr(profile, "EMA_BUY_BUFFER", ema_buffer)),
+        ema_sell_buffer=float(getattr(profile, "EMA_SELL_BUFFER", ema_buffer)),
+        use_macd_for_buy=bool(getattr(profile, "USE_MACD_FOR_BUY", False)),
+        use_macd_for_sell=bool(getattr(profile, "USE_MACD_FOR_SELL", False)),
+    )
+
+
+def _nan_if_none(value: float | None) -> float:
+    return np.nan if value is None else float(value)
+
 
 def get_initial_ohlcv(symbol: str, timeframe: str, limit: int) -> np.ndarray:
     """
@@ -59,7 +153,7 @@ def check_buy_sell_signals(profile: object, historic_prices_np_array: np.ndarray
     Анализирует исторические данные и текущую цену для генерации торгового сигнала.
 
     Args:
-        profile (SimpleNamespace): Объект профиля с настройками торговой пары и индикаторов.
+        profile (Profile): Объект профиля с настройками торговой пары и индикаторов.
         historic_prices_np_array (np.ndarray): Numpy массив исторических цен закрытия.
                                                 Предполагается, что этот массив УЖЕ включает
                                                 current_close_price как последний элемент, если индикаторы
@@ -74,8 +168,6 @@ def check_buy_sell_signals(profile: object, historic_prices_np_array: np.ndarray
 
     # Параметры профиля для индикаторов
     rsi_period = int(getattr(profile, "RSI_PERIOD", 14))
-    rsi_overbought = float(getattr(profile, "RSI_OVERBOUGHT", 70.0))
-    rsi_oversold = float(getattr(profile, "RSI_OVERSOLD", 30.0))
     macd_fast_period = int(getattr(profile, "MACD_FAST_PERIOD", 12))
     macd_slow_period = int(getattr(profile, "MACD_SLOW_PERIOD", 26))
     macd_signal_period = int(getattr(profile, "MACD_SIGNAL_PERIOD", 9))
@@ -85,14 +177,6 @@ def check_buy_sell_signals(profile: object, historic_prices_np_array: np.ndarray
     use_macd = bool(getattr(profile, "USE_MACD", True))
     use_ema = bool(getattr(profile, "USE_EMA", False))
     ema_period = int(getattr(profile, "EMA_PERIOD", 50))
-    ema_buy_buffer = getattr(profile, "EMA_BUY_BUFFER",
-                             getattr(profile, "EMA_BUFFER", 0.002))
-    ema_sell_buffer = getattr(
-        profile, "EMA_SELL_BUFFER", getattr(profile, "EMA_BUFFER", 0.002))
-
-    # Флаги использования MACD для подтверждения сигналов RSI
-    use_macd_for_buy = bool(getattr(profile, "USE_MACD_FOR_BUY", False))
-    use_macd_for_sell = bool(getattr(profile, "USE_MACD_FOR_SELL", False))
 
     prices_for_indicators = historic_prices_np_array
 
@@ -108,11 +192,8 @@ def check_buy_sell_signals(profile: object, historic_prices_np_array: np.ndarray
         )
         return 'hold'
 
-    # Инициализируем переменные для индикаторов
-    rsi_values = np.array([])
-    macd_line = np.array([])
-    macd_signal_line = np.array([])
-    ema_values = np.array([])
+    # Инициализируем переменные для индикаторов (общий пустой массив вместо новых аллокаций на каждый вызов)
+    rsi_values = macd_line = macd_signal_line = ema_values = _EMPTY_PRICES
 
     # Расчет индикаторов
     try:
@@ -151,56 +232,59 @@ def check_buy_sell_signals(profile: object, historic_prices_np_array: np.ndarray
     last_ema = ema_values[-1] if use_ema and ema_values.size > 0 and not np.isnan(
         ema_values[-1]) else None
 
-    # --- Логика принятия решений ---
-    buy_signal_triggered = False  # Флаг для итогового решения о покупке
-    sell_signal_triggered = False  # Флаг для итогового решения о продаже
+    return evaluate_signal(profile, current_close_price, last_rsi, last_macd, last_macd_signal, last_ema)
 
-    # Условия для RSI
-    rsi_gives_buy_signal = use_rsi and last_rsi is not None and last_rsi < rsi_oversold
-    rsi_gives_sell_signal = use_rsi and last_rsi is not None and last_rsi > rsi_overbought
 
-    # Условия для MACD (пересечение)
-    macd_gives_buy_signal = use_macd and last_macd is not None and last_macd_signal is not None and last_macd > last_macd_signal
-    macd_gives_sell_signal = use_macd and last_macd is not None and last_macd_signal is not None and last_macd < last_macd_signal
+def evaluate_signal(profile: object, current_close_price: float, last_rsi: float | None,
+                    last_macd: float | None, last_macd_signal: float | None, last_ema: float | None,
+                    params: SignalParams | None = None) -> str:
+    """
+    Принимает торговое решение по последним значениям индикаторов.
+    Используется и полным пересчетом (check_buy_sell_signals), и инкрементальным IndicatorState.
 
-    # --- Определение сигнала на покупку ---
-    if use_rsi:
-        if use_macd_for_buy and use_macd:
-            if rsi_gives_buy_signal and macd_gives_buy_signal:
-                buy_signal_triggered = True
-        elif rsi_gives_buy_signal:
-            buy_signal_triggered = True
-    elif use_macd_for_buy and use_macd:  # Если RSI не используется, но MACD для покупки используется
-        if macd_gives_buy_signal:
-            buy_signal_triggered = True
-
-    # --- Определение сигнала на продажу ---
-    if use_rsi:
-        if use_macd_for_sell and use_macd:
-            if rsi_gives_sell_signal and macd_gives_sell_signal:
-                sell_signal_triggered = True
-        elif rsi_gives_sell_signal:
-            sell_signal_triggered = True
-    elif use_macd_for_sell and use_macd:  # Если RSI не используется, но MACD для продажи используется
-        if macd_gives_sell_signal:
-            sell_signal_triggered = True
+    Args:
+        profile (Profile): Объект профиля с настройками торговой пары и индикаторов.
+        current_close_price (float): Самая последняя известная цена закрытия.
+        last_rsi, last_macd, last_macd_signal, last_ema (float | None): Последние значения индикаторов.
+            None - индикатор выключен или еще не прогрет.
+        params (SignalParams | None): Заранее собранные параметры профиля (build_signal_params).
+            Если не переданы, собираются из profile при каждом вызове.
+
+    Returns:
+        str: Торговый сигнал ('buy', 'sell', 'hold').
+    """
+    if params is None:
+        params = build_signal_params(profile)
+    (symbol, rsi_period, rsi_overbought, rsi_oversold, macd_fast_period, macd_slow_period,
+     macd_signal_period, use_rsi, use_macd, use_ema, ema_period, ema_buy_buffer, ema_sell_buffer,
+     use_macd_for_buy, use_macd_for_sell) = params
+
+    if not use_ema:
+        last_ema = None  # Значение EMA может прийти из IndicatorState даже при выключенном фильтре
+
+    # --- Логика принятия решений (ядро signal_decision) ---
+    decision = signal_decision(
+        float(current_close_price), _nan_if_none(last_rsi), _nan_if_none(last_macd),
+        _nan_if_none(last_macd_signal), _nan_if_none(last_ema),
+        use_rsi, use_macd, use_macd_for_buy, use_macd_for_sell,
+        rsi_oversold, rsi_overbought, ema_buy_buffer, ema_sell_buffer)
+    buy_signal_triggered = decision == SIGNAL_BUY
+    sell_signal_triggered = decision == SIGNAL_SELL
 
     # --- EMA Фильтр (если включен) ---
-    if buy_signal_triggered and current_close_price < last_ema * (1 - ema_buy_buffer):
+    # last_ema is None, если EMA выключена или еще не прогрета - фильтр не применяется
+    if decision == SIGNAL_BUY_FILTERED:
         border = last_ema * (1 - ema_buy_buffer)
         trading_logger.info(
             f"Signal Check ({symbol}): BUY IGNORED by EMA filter. "
             f"Price {current_close_price:.6f} < EMA({ema_period})-buffer {border:.6f} (buffer {ema_buy_buffer*100:.2f}%)"
         )
-        buy_signal_triggered = False
-
-    if sell_signal_triggered and current_close_price > last_ema * (1 + ema_sell_buffer):
+    elif decision == SIGNAL_SELL_FILTERED:
         border = last_ema * (1 + ema_sell_buffer)
         trading_logger.info(
             f"Signal Check ({symbol}): SELL IGNORED by EMA filter. "
             f"Price {current_close_price:.6f} > EMA({ema_period})+buffer {border:.6f} (buffer {ema_sell_buffer*100:.2f}%)"
         )
-        sell_signal_triggered = False
 
     # --- Формирование и логирование итогового сообщения и сигнала ---
     log_message_parts = [
@@ -215,16 +299,15 @@ def check_buy_sell_signals(profile: object, historic_prices_np_array: np.ndarray
         log_message_parts.append(
             f"MACD({macd_fast_period},{macd_slow_period},{macd_signal_period})={macd_val_str},Signal={signal_val_str}")
     if use_ema:
-        ema_val_str = f"{last_ema:.6f}" if last_ema is not None else "N/A"
-    # Показываем EMA-buffer и границы фильтра
-    if last_ema is not None:
-        lower = last_ema * (1 - ema_buy_buffer)
-        upper = last_ema * (1 + ema_sell_buffer)
-        log_message_parts.append(
-            f"EMA({ema_period})={ema_val_str} [buy buffer: -{ema_buy_buffer*100:.2f}% → {lower:.6f} | sell buffer: +{ema_sell_buffer*100:.2f}% → {upper:.6f}]"
-        )
-    else:
-        log_message_parts.append(f"EMA({ema_period})={ema_val_str}")
+        # Показываем EMA-buffer и границы фильтра
+        if last_ema is not None:
+            lower = last_ema * (1 - ema_buy_buffer)
+            upper = last_ema * (1 + ema_sell_buffer)
+            log_message_parts.append(
+                f"EMA({ema_period})={last_ema:.6f} [buy buffer: -{ema_buy_buffer*100:.2f}% → {lower:.6f} | sell buffer: +{ema_sell_buffer*100:.2f}% → {upper:.6f}]"
+            )
+        else:
+            log_message_parts.append(f"EMA({ema_period})=N/A")
 
     if buy_signal_triggered:
         log_message_parts.append("-> Decision: BUY")
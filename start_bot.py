@@ -1,12 +1,12 @@
 # start_bot.py (Исправленная версия)
 
-import asyncio
 import sys # Добавим для sys.exit в случае критической ошибки импорта
 
 try:
     from interfaces.telegram_bot.bot_entry import main as bot_entry_main
     # Также импортируем логгер для использования в этом файле
-    from utils.logger import system_logger
+    from utils.logger import system_logger, stop_log_listeners
+    from utils.event_loop import run_event_loop
     # Импортируем logging для финального shutdown
     import logging
 except ImportError as e:
@@ -24,14 +24,12 @@ if __name__ == '__main__':
     system_logger.info("="*20 + " Запуск основного скрипта start_bot.py " + "="*20)
 
     try:
-        # --- ИСПРАВЛЕНИЕ ВЫЗОВА ---
-        # Вместо: asyncio.run(start_aiogram_bot())
-        # Запускаем импортированную функцию bot_entry_main
-        asyncio.run(bot_entry_main())
+        # Запускаем bot_entry_main в цикле событий, выбранном run_event_loop (io_uring / uvloop / asyncio)
+        run_event_loop(bot_entry_main())
 
     except KeyboardInterrupt:
         # Обработка Ctrl+C на самом верхнем уровне, если signal_handler по какой-то причине не сработал
-        # или если KeyboardInterrupt произошел до запуска asyncio.run или после его завершения.
+        # или если KeyboardInterrupt произошел до запуска run_event_loop или после его завершения.
         system_logger.info("Скрипт start_bot.py прерван пользователем (KeyboardInterrupt).")
         print("\nПрограмма прервана пользователем.")
     except Exception as e:
@@ -41,6 +39,7 @@ if __name__ == '__main__':
     finally:
         # Финальное сообщение о завершении работы скрипта
         system_logger.info("="*20 + " Завершение работы скрипта start_bot.py " + "="*20)
+        stop_log_listeners()  # Дописываем записи из очередей логгеров до закрытия обработчиков
         # Дополнительная гарантия закрытия логов
         if logging.getLogger().handlers:
             logging.shutdown()
\ No newline at end of file
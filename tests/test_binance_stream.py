@@ -0,0 +1,148 @@
+import asyncio
+import json
+
+import pytest
+
+from websockets.asyncio.client import connect as ws_connect
+from websockets.asyncio.server import serve
+
+from services import binance_stream
+from utils.loop_queue import PriceQueue
+
+
+def to_frame(payload):
+    # Binance присылает компактный JSON без пробелов
+    return json.dumps(payload, separators=(",", ":"))
+
+
+def kline_frame(close, closed):
+    return to_frame({"e": "kline", "k": {"c": str(close), "x": closed}})
+
+
+def test_listen_klines_enqueues_closed_klines_and_stops(monkeypatch):
+    async def handler(websocket):
+        await websocket.send(kline_frame(1.0, False))
+        await websocket.send("not json")
+        await websocket.send(kline_frame(2.5, True))
+        await websocket.wait_closed()
+
+    async def scenario():
+        async with serve(handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            monkeypatch.setattr(binance_stream, "connect",
+                                lambda url, ssl, **kwargs: ws_connect(f"ws://127.0.0.1:{port}", **kwargs))
+            queue = PriceQueue(maxsize=8)
+            stop_event = asyncio.Event()
+            listener = asyncio.ensure_future(
+                binance_stream.listen_klines("TESTUSDT", "1m", queue, stop_event))
+            price = await asyncio.wait_for(queue.get(), timeout=5)
+            stop_event.set()
+            await asyncio.wait_for(listener, timeout=5)
+            return price, queue.empty()
+
+    assert asyncio.run(scenario()) == (2.5, True)
+
+
+def test_parse_closed_price_only_for_closed_klines():
+    assert binance_stream.parse_closed_price(kline_frame(3.25, True)) == 3.25
+    assert binance_stream.parse_closed_price(kline_frame(3.25, False)) is None
+    assert binance_stream.parse_closed_price(json.dumps({"result": None, "id": 1})) is None
+
+
+def test_parse_closed_price_skips_decoding_open_klines():
+    def failing_loads(message):
+        raise AssertionError("open kline must not be decoded")
+
+    assert binance_stream.parse_closed_price(kline_frame(3.25, False), loads=failing_loads) is None
+    assert binance_stream.parse_closed_price(kline_frame(3.25, True).encode()) == 3.25
+
+
+def combined_frame(stream, close, closed):
+    return to_frame({"stream": stream, "data": {"e": "kline", "k": {"c": str(close), "x": closed}}})
+
+
+def test_parse_combined_closed_price():
+    assert binance_stream.parse_combined_closed_price(
+        combined_frame("btcusdt@kline_1m", 10.5, True)) == ("btcusdt@kline_1m", 10.5)
+    assert binance_stream.parse_combined_closed_price(
+        combined_frame("btcusdt@kline_1m", 10.5, False)) == ("", None)
+
+
+def test_stream_hub_routes_prices_by_stream(monkeypatch):
+    requested_urls = []
+
+    async def handler(websocket):
+        await websocket.send(combined_frame("ethusdt@kline_1m", 2.0, True))
+        await websocket.send(combined_frame("xrpusdt@kline_1m", 9.0, True))
+        await websocket.send(combined_frame("btcusdt@kline_1m", 1.0, True))
+        await websocket.wait_closed()
+
+    async def scenario():
+        async with serve(handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+
+            def fake_connect(url, ssl, **kwargs):
+                assert ssl is binance_stream._SSL_CTX
+                requested_urls.append(url)
+                return ws_connect(f"ws://127.0.0.1:{port}", **kwargs)
+
+            monkeypatch.setattr(binance_stream, "connect", fake_connect)
+            hub = binance_stream.BinanceStreamHub()
+            btc_queue = hub.subscribe("BTCUSDT", "1m", maxsize=8)
+            eth_queue = hub.subscribe("ETHUSDT", "1m", maxsize=8)
+            stop_event = asyncio.Event()
+            runner = asyncio.ensure_future(hub.run(stop_event))
+            btc_price = await asyncio.wait_for(btc_queue.get(), timeout=5)
+            stop_event.set()
+            await asyncio.wait_for(runner, timeout=5)
+            return btc_price, eth_queue.get_nowait()
+
+    assert asyncio.run(scenario()) == (1.0, 2.0)
+    assert requested_urls[0].endswith("/stream?streams=btcusdt@kline_1m/ethusdt@kline_1m")
+
+
+def test_stream_hub_rejects_duplicate_subscription():
+    hub = binance_stream.BinanceStreamHub()
+    hub.subscribe("BTCUSDT", "1m", maxsize=8)
+    with pytest.raises(ValueError):
+        hub.subscribe("btcusdt", "1m", maxsize=8)
+
+
+def test_reconnect_delay_grows_exponentially_with_cap(monkeypatch):
+    delay_bounds = []
+
+    def failing_connect(url, **kwargs):
+        raise OSError("connection refused")
+
+    async def scenario():
+        stop_event = asyncio.Event()
+
+        def fake_uniform(low, high):
+            delay_bounds.append(high)
+            if len(delay_bounds) == 6:
+                stop_event.set()
+            return 0
+
+        monkeypatch.setattr(binance_stream, "connect", failing_connect)
+        monkeypatch.setattr(binance_stream.random, "uniform", fake_uniform)
+        queue = PriceQueue(maxsize=8)
+        await asyncio.wait_for(binance_stream.listen_klines("TESTUSDT", "1m", queue, stop_event), timeout=5)
+
+    asyncio.run(scenario())
+    assert delay_bounds == [5, 10, 20, 40, 60, 60]
+
+
+def test_closed_kline_counter_logs_one_summary_per_interval(monkeypatch):
+    clock = {"now": 100.0}
+    monkeypatch.setattr(binance_stream.time, "monotonic", lambda: clock["now"])
+    log = binance_stream.system_logger.getChild("COUNTERTEST")
+    messages = []
+    monkeypatch.setattr(log, "debug", lambda msg, *args: messages.append(msg % args))
+    count_closed_kline = binance_stream._closed_kline_counter(log)
+
+    for _ in range(3):
+        count_closed_kline()
+    assert messages == []
+    clock["now"] += binance_stream.STATS_LOG_INTERVAL_SEC
+    count_closed_kline()
+    assert len(messages) == 1 and "4" in messages[0]
@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+from config import settings
+from utils.event_loop import parse_kernel_release, run_event_loop
+
+
+def test_parse_kernel_release():
+    assert parse_kernel_release("5.15.0-91-generic") == (5, 15)
+    assert parse_kernel_release("6.1.0") == (6, 1)
+    assert parse_kernel_release("5.4.0-150-generic") < (5, 11)
+    assert parse_kernel_release("5.11") >= (5, 11)
+
+
+def test_parse_kernel_release_invalid():
+    assert parse_kernel_release("unknown") == (0, 0)
+
+
+def test_run_event_loop_returns_coroutine_result():
+    async def main():
+        return 42
+
+    assert run_event_loop(main()) == 42
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="sched_setaffinity только в Linux")
+def test_run_event_loop_pins_thread_to_configured_cpu(monkeypatch):
+    original_cpus = os.sched_getaffinity(0)
+    target_cpu = min(original_cpus)
+    monkeypatch.setattr(settings, "EVENT_LOOP_CPU", target_cpu)
+
+    async def main():
+        return os.sched_getaffinity(0)
+
+    try:
+        assert run_event_loop(main()) == {target_cpu}
+    finally:
+        os.sched_setaffinity(0, original_cpus)
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity") or len(os.sched_getaffinity(0)) < 2,
+                    reason="нужен Linux и не меньше двух доступных ядер")
+def test_default_executor_worker_is_not_pinned_to_loop_cpu(monkeypatch):
+    import asyncio
+
+    original_cpus = os.sched_getaffinity(0)
+    target_cpu = min(original_cpus)
+    monkeypatch.setattr(settings, "EVENT_LOOP_CPU", target_cpu)
+
+    async def main():
+        return os.sched_getaffinity(0), await asyncio.to_thread(os.sched_getaffinity, 0)
+
+    try:
+        loop_cpus, worker_cpus = run_event_loop(main())
+    finally:
+        os.sched_setaffinity(0, original_cpus)
+    assert loop_cpus == {target_cpu}
+    assert worker_cpus == original_cpus
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity") or len(os.sched_getaffinity(0)) < 2,
+                    reason="нужен Linux и не меньше двух доступных ядер")
+def test_rest_call_worker_is_not_pinned_to_loop_cpu(monkeypatch):
+    from services.binance_client import run_rest_call
+
+    original_cpus = os.sched_getaffinity(0)
+    target_cpu = min(original_cpus)
+    monkeypatch.setattr(settings, "EVENT_LOOP_CPU", target_cpu)
+
+    async def main():
+        return await run_rest_call(os.sched_getaffinity, 0)
+
+    try:
+        worker_cpus = run_event_loop(main())
+    finally:
+        os.sched_setaffinity(0, original_cpus)
+    assert worker_cpus != {target_cpu}
+    assert worker_cpus == original_cpus
@@ -0,0 +1,52 @@
+import math
+import numpy as np
+from config.profile_loader import build_profile
+from services.indicator_state import IndicatorState, warm_up_kernels
+
+
+def reference_ema(prices, period):
+    alpha = 2.0 / (period + 1)
+    value = float(np.mean(prices[:period]))
+    for price in prices[period:]:
+        value += alpha * (price - value)
+    return value
+
+
+def reference_rsi(prices, period):
+    deltas = np.diff(prices)
+    gains = np.clip(deltas, 0, None)
+    losses = np.clip(-deltas, 0, None)
+    avg_gain = gains[:period].mean()
+    avg_loss = losses[:period].mean()
+    for gain, loss in zip(gains[period:], losses[period:]):
+        avg_gain = (avg_gain * (period - 1) + gain) / period
+        avg_loss = (avg_loss * (period - 1) + loss) / period
+    return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+def test_incremental_values_match_full_recompute():
+    rng = np.random.default_rng(42)
+    prices = 100 + np.cumsum(rng.normal(0, 1, 300))
+    profile = build_profile({"symbol": "TESTUSDT", "timeframe": "1m"})
+
+    state = IndicatorState.from_profile(profile, prices)
+
+    assert math.isclose(state.rsi, reference_rsi(prices, 14), rel_tol=1e-9)
+    assert math.isclose(state.ema, reference_ema(prices, 50), rel_tol=1e-9)
+    fast = reference_ema(prices, 12)
+    slow = reference_ema(prices, 26)
+    assert math.isclose(state.macd, fast - slow, rel_tol=1e-9, abs_tol=1e-12)
+
+
+def test_signal_holds_until_warmed_up_and_buys_on_oversold():
+    profile = build_profile({"symbol": "TESTUSDT", "timeframe": "1m", "use_macd": False})
+    state = IndicatorState.from_profile(profile, [100.0, 99.0])
+    assert state.signal(profile, 99.0) == 'hold'
+
+    falling = np.linspace(100, 80, 30)
+    state = IndicatorState.from_profile(profile, falling)
+    assert state.signal(profile, float(falling[-1])) == 'buy'
+
+
+def test_warm_up_kernels_runs():
+    warm_up_kernels()
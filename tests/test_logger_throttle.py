@@ -0,0 +1,41 @@
+from utils import logger
+from utils.logger import did_log_recently
+
+
+def test_did_log_recently_within_window(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(logger.time, "monotonic", lambda: now[0])
+    key = ("test_did_log_recently", ValueError)
+
+    assert did_log_recently(key) is False
+    now[0] += 30
+    assert did_log_recently(key) is True
+    now[0] += 31
+    assert did_log_recently(key) is False
+
+
+def test_configure_logger_writes_through_queue_listener_once(tmp_path):
+    log_file = tmp_path / "queued.log"
+    name = "test_queued_logger"
+    queued = logger.configure_logger(name, str(log_file))
+    assert logger.configure_logger(name, str(log_file)) is queued
+    assert len(queued.handlers) == 1
+    assert isinstance(queued.handlers[0], logger.QueueHandler)
+
+    queued.info("через очередь")
+    logger._queue_listeners.pop(name).stop()
+    assert "через очередь" in log_file.read_text(encoding="utf-8")
+
+
+def test_color_formatter_colors_only_warnings_and_above():
+    import logging
+    from utils.logger import ColorFormatter, Fore, Style
+
+    def record(level):
+        return logging.LogRecord("test", level, __file__, 1, "msg", None, None)
+
+    formatter = ColorFormatter("%(message)s")
+    assert formatter.format(record(logging.INFO)) == "msg"
+    if Fore is not None:
+        assert formatter.format(record(logging.ERROR)) == f"{Fore.RED}msg{Style.RESET_ALL}"
+    assert ColorFormatter("%(message)s", use_color=False).format(record(logging.ERROR)) == "msg"
@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+import numpy as np
+from utils.loop_queue import LoopQueue, PriceQueue
+
+
+def test_get_waits_for_put():
+    async def scenario():
+        queue = LoopQueue(maxsize=10)
+        getter = asyncio.ensure_future(queue.get())
+        await asyncio.sleep(0)
+        assert not getter.done()
+        queue.put_nowait(1.5)
+        return await asyncio.wait_for(getter, timeout=1)
+
+    assert asyncio.run(scenario()) == 1.5
+
+
+def test_put_from_thread_via_call_soon_threadsafe():
+    async def scenario():
+        queue = LoopQueue(maxsize=10)
+        loop = asyncio.get_running_loop()
+        await asyncio.to_thread(loop.call_soon_threadsafe, queue.put_nowait, 2.0)
+        return await asyncio.wait_for(queue.get(), timeout=1)
+
+    assert asyncio.run(scenario()) == 2.0
+
+
+def test_overflow_drops_oldest():
+    async def scenario():
+        queue = LoopQueue(maxsize=2)
+        for price in (1.0, 2.0, 3.0):
+            queue.put_nowait(price)
+        return [await queue.get(), await queue.get()], queue.empty()
+
+    assert asyncio.run(scenario()) == ([2.0, 3.0], True)
+
+
+def test_overflow_counts_dropped():
+    async def scenario():
+        queue = LoopQueue(maxsize=2)
+        for price in (1.0, 2.0, 3.0, 4.0):
+            queue.put_nowait(price)
+        return queue.dropped
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_get_nowait_raises_when_empty():
+    async def scenario():
+        queue = LoopQueue(maxsize=2)
+        queue.put_nowait(1.0)
+        assert queue.get_nowait() == 1.0
+        with pytest.raises(asyncio.QueueEmpty):
+            queue.get_nowait()
+
+    asyncio.run(scenario())
+
+
+def test_high_water_tracks_max_backlog():
+    async def scenario():
+        queue = LoopQueue(maxsize=10)
+        for price in (1.0, 2.0, 3.0):
+            queue.put_nowait(price)
+        await queue.get()
+        queue.put_nowait(4.0)
+        return queue.high_water
+
+    assert asyncio.run(scenario()) == 3
+
+
+def test_pop_all_returns_backlog_in_order_after_wraparound():
+    async def scenario():
+        queue = LoopQueue(maxsize=3)
+        for price in (1.0, 2.0, 3.0, 4.0, 5.0):
+            queue.put_nowait(price)
+        drained = queue.pop_all()
+        return drained, queue.empty(), queue.pop_all()
+
+    assert asyncio.run(scenario()) == ([3.0, 4.0, 5.0], True, [])
+
+
+def test_price_queue_pop_all_wraps_and_drops_oldest():
+    queue = PriceQueue(maxsize=4)
+    for price in (1.0, 2.0, 3.0):
+        queue.put_nowait(price)
+    assert queue.get_nowait() == 1.0
+    for price in (4.0, 5.0, 6.0, 7.0):
+        queue.put_nowait(price)
+    batch = queue.pop_all()
+    assert batch.dtype == np.float64
+    assert batch.tolist() == [4.0, 5.0, 6.0, 7.0]
+    assert queue.empty()
+    assert queue.pop_all().size == 0
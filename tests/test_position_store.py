@@ -0,0 +1,57 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import utils.position_store as store
+
+
+@pytest.fixture(autouse=True)
+def positions_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, "POSITIONS_DIR", str(tmp_path))
+    monkeypatch.setattr(store, "_positions", {})
+    monkeypatch.setattr(store, "_dirty", set())
+    return tmp_path
+
+
+def test_reads_existing_file_once(positions_dir):
+    (positions_dir / "last_buy_price_XRPUSDT.json").write_text(json.dumps({"price": 0.5}))
+    assert store.get_position("XRPUSDT") == {"price": 0.5}
+    os.remove(positions_dir / "last_buy_price_XRPUSDT.json")
+    assert store.get_position("XRPUSDT") == {"price": 0.5}  # Из памяти, файл больше не читается
+
+
+def test_set_is_in_memory_until_flush(positions_dir):
+    assert store.set_position("XRPUSDT", 0.5, quantity=10.0)
+    assert not store.set_position("XRPUSDT", 0.6)  # Позиция уже открыта
+    path = positions_dir / "last_buy_price_XRPUSDT.json"
+    assert not path.exists()
+
+    assert store.flush_positions() == 1
+    assert json.loads(path.read_text()) == {"price": 0.5, "quantity": 10.0}
+    assert not (positions_dir / "last_buy_price_XRPUSDT.json.tmp").exists()
+    assert store.flush_positions() == 0  # Нечего записывать
+
+
+def test_clear_removes_file_on_flush(positions_dir):
+    store.set_position("XRPUSDT", 0.5)
+    store.flush_positions()
+    assert store.clear_position("XRPUSDT")
+    assert not store.clear_position("XRPUSDT")
+    assert store.get_position("XRPUSDT") is None
+    store.flush_positions()
+    assert not (positions_dir / "last_buy_price_XRPUSDT.json").exists()
+
+
+def test_flusher_writes_on_stop(positions_dir):
+    async def scenario():
+        stop_event = asyncio.Event()
+        flusher = asyncio.create_task(store.position_flusher(stop_event, interval=60))
+        await asyncio.sleep(0)
+        store.set_position("BTCUSDT", 100.0)
+        stop_event.set()
+        await asyncio.wait_for(flusher, timeout=1)
+
+    asyncio.run(scenario())
+    assert json.loads((positions_dir / "last_buy_price_BTCUSDT.json").read_text()) == {"price": 100.0}
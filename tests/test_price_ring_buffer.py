@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from utils.price_ring_buffer import PriceRingBuffer
+
+
+def test_view_before_full():
+    buf = PriceRingBuffer(5)
+    buf.extend([1.0, 2.0, 3.0])
+    assert len(buf) == 3
+    np.testing.assert_array_equal(buf.view(), [1.0, 2.0, 3.0])
+
+
+def test_view_after_wraparound_matches_last_values():
+    buf = PriceRingBuffer(4)
+    values = np.arange(1.0, 11.0)
+    for value in values:
+        buf.append(value)
+        view = buf.view()
+        assert view.flags["C_CONTIGUOUS"]
+        np.testing.assert_array_equal(view, values[:int(value)][-4:])
+
+
+def test_extend_keeps_only_capacity_tail():
+    buf = PriceRingBuffer(3)
+    buf.extend(np.arange(10.0))
+    np.testing.assert_array_equal(buf.view(), [7.0, 8.0, 9.0])
+
+
+def test_invalid_capacity():
+    with pytest.raises(ValueError):
+        PriceRingBuffer(0)
+
+
+def test_extend_across_wraparound_matches_append():
+    bulk = PriceRingBuffer(5)
+    single = PriceRingBuffer(5)
+    for chunk in (np.arange(3.0), np.arange(3.0, 7.0), np.arange(7.0, 9.0)):
+        bulk.extend(chunk)
+        for value in chunk:
+            single.append(value)
+        np.testing.assert_array_equal(bulk.view(), single.view())
+    bulk.append(100.0)
+    np.testing.assert_array_equal(bulk.view(), [5.0, 6.0, 7.0, 8.0, 100.0])
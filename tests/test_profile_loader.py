@@ -0,0 +1,42 @@
+import dataclasses
+import pytest
+import json
+import os
+import config.profile_loader as profile_loader
+from config.profile_loader import Profile, build_profile, load_profile
+
+
+def test_build_profile_uppercases_and_ignores_unknown_keys():
+    profile = build_profile({"symbol": "XRPUSDT", "timeframe": "3m", "rsi_period": 21, "unknown_key": 1})
+    assert isinstance(profile, Profile)
+    assert profile.SYMBOL == "XRPUSDT"
+    assert profile.TIMEFRAME == "3m"
+    assert profile.RSI_PERIOD == 21
+    assert not hasattr(profile, "UNKNOWN_KEY")
+
+
+def test_build_profile_ema_buffer_fallback():
+    profile = build_profile({"symbol": "BNBUSDT", "timeframe": "1m", "ema_buffer": 0.005, "EMA_SELL_BUFFER": 0.01})
+    assert profile.EMA_BUY_BUFFER == 0.005
+    assert profile.EMA_SELL_BUFFER == 0.01
+
+
+def test_profile_is_frozen():
+    profile = build_profile({"symbol": "XRPUSDT", "timeframe": "3m"})
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        profile.SYMBOL = "BNBUSDT"
+
+
+def test_load_profile_is_cached_until_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / "profiles.json"
+    path.write_text(json.dumps({"main": {"symbol": "XRPUSDT", "timeframe": "1m"}}), encoding="utf-8")
+    monkeypatch.setattr(profile_loader, "PROFILE_FILE", str(path))
+    profile_loader._load_profile_cached.cache_clear()
+
+    first = load_profile("main")
+    assert load_profile("main") is first
+
+    path.write_text(json.dumps({"main": {"symbol": "XRPUSDT", "timeframe": "5m"}}), encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert load_profile("main").TIMEFRAME == "5m"
@@ -9,3 +9,57 @@ from utils.quantity_utils import round_step_size
 ])
 def test_round_step_size(value, step, expected):
     assert round_step_size(value, step) == expected
+
+
+def test_parse_symbol_meta_reads_filters_as_decimal():
+    from decimal import Decimal
+    from utils.quantity_utils import _parse_symbol_meta
+
+    meta = _parse_symbol_meta({
+        "symbol": "XRPUSDT", "baseAsset": "XRP", "quoteAsset": "USDT",
+        "filters": [
+            {"filterType": "PRICE_FILTER", "tickSize": "0.00010000"},
+            {"filterType": "LOT_SIZE", "stepSize": "0.10000000", "minQty": "1.00000000"},
+        ],
+    })
+    assert meta.step_size == Decimal("0.1") and meta.min_qty == Decimal("1")
+    assert (meta.base, meta.quote) == ("XRP", "USDT")
+    assert (meta.amount_precision, meta.price_precision) == (1, 4)
+
+
+@pytest.mark.parametrize("value,step,expected", [
+    ("12.3456", "0.01", "12.34"),
+    ("0.0009", "0.0005", "0.0005"),
+    ("5", "1", "5"),
+])
+def test_round_step_size_decimal(value, step, expected):
+    from decimal import Decimal
+
+    result = round_step_size(Decimal(value), Decimal(step))
+    assert isinstance(result, Decimal) and result == Decimal(expected)
+
+
+def test_get_symbol_meta_async_uses_fresh_cache_without_rest_call(monkeypatch):
+    import asyncio
+    import time
+    from utils import quantity_utils
+
+    meta = quantity_utils._parse_symbol_meta({
+        "symbol": "XRPUSDT", "baseAsset": "XRP", "quoteAsset": "USDT",
+        "filters": [{"filterType": "LOT_SIZE", "stepSize": "0.1", "minQty": "1"}],
+    })
+    calls = []
+
+    async def fake_rest_call(func, *args):
+        calls.append(args)
+        return None
+
+    monkeypatch.setattr(quantity_utils, "run_rest_call", fake_rest_call)
+    monkeypatch.setitem(quantity_utils.SYMBOL_META, "XRPUSDT", meta)
+    monkeypatch.setitem(quantity_utils.exchange_info_cache, "last_update", time.time())
+
+    assert asyncio.run(quantity_utils.get_symbol_meta_async("XRPUSDT")) is meta
+    assert calls == []
+    # Неизвестный символ - загрузка через REST-пул
+    assert asyncio.run(quantity_utils.get_symbol_meta_async("BTCUSDT")) is None
+    assert calls == [("BTCUSDT",)]
@@ -0,0 +1,33 @@
+from config.profile_loader import build_profile
+from services.trade_logic import evaluate_signal
+
+
+def make_profile(**overrides):
+    data = {"symbol": "TESTUSDT", "timeframe": "1m", "use_rsi": True, "use_macd": False, "use_ema": False}
+    data.update(overrides)
+    return build_profile(data)
+
+
+def test_rsi_oversold_gives_buy():
+    assert evaluate_signal(make_profile(), 100.0, 25.0, None, None, None) == 'buy'
+
+
+def test_rsi_not_ready_holds():
+    assert evaluate_signal(make_profile(), 100.0, None, None, None, None) == 'hold'
+
+
+def test_ema_filter_blocks_buy_below_band():
+    profile = make_profile(use_ema=True, ema_buy_buffer=0.01)
+    assert evaluate_signal(profile, 100.0, 25.0, None, None, 110.0) == 'hold'
+    assert evaluate_signal(profile, 100.0, 25.0, None, None, 100.5) == 'buy'
+
+
+def test_macd_confirmation_required_for_sell():
+    profile = make_profile(use_macd=True, use_macd_for_sell=True)
+    assert evaluate_signal(profile, 100.0, 75.0, 2.0, 1.0, None) == 'hold'
+    assert evaluate_signal(profile, 100.0, 75.0, 1.0, 2.0, None) == 'sell'
+
+
+def test_macd_only_buy_when_rsi_disabled():
+    profile = make_profile(use_rsi=False, use_macd=True, use_macd_for_buy=True)
+    assert evaluate_signal(profile, 100.0, None, 2.0, 1.0, None) == 'buy'
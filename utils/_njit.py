@@ -0,0 +1,19 @@
+# utils/_njit.py
+try:
+    from numba import njit as _numba_njit
+except ImportError:
+    _numba_njit = None
+
+NUMBA_AVAILABLE = _numba_njit is not None
+
+
+def njit(*args, **kwargs):
+    """
+    numba.njit, если numba установлена; иначе декоратор возвращает функцию без изменений.
+    Поддерживает обе формы: @njit и @njit(cache=True).
+    """
+    if _numba_njit is not None:
+        return _numba_njit(*args, **kwargs)
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return args[0]
+    return lambda func: func
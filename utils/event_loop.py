@@ -0,0 +1,144 @@
+# utils/event_loop.py
+import asyncio
+import importlib
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from config import settings
+from utils.logger import system_logger
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# Минимальная версия ядра Linux, с которой io_uring поддерживает сетевые операции
+URING_MIN_KERNEL = (5, 11)
+
+# Привязка к ядру и nice потока цикла событий до _tune_loop_thread. Потоки, созданные из него,
+# наследуют настройки, поэтому пулы потоков восстанавливают исходные (restore_worker_thread)
+_original_thread_settings = {"affinity": None, "nice": None}
+
+
+def parse_kernel_release(release: str) -> tuple:
+    """
+    Извлекает (major, minor) из строки версии ядра, например '5.15.0-91-generic' -> (5, 15).
+    Возвращает (0, 0), если строку не удалось разобрать.
+    """
+    match = re.match(r"(\d+)\.(\d+)", release)
+    if not match:
+        return (0, 0)
+    return (int(match.group(1)), int(match.group(2)))
+
+
+def _try_install_uring_loop(module_name: str) -> bool:
+    if sys.platform != "linux":
+        return False
+    if parse_kernel_release(os.uname().release) < URING_MIN_KERNEL:
+        system_logger.info(
+            f"event_loop: Ядро {os.uname().release} старше {URING_MIN_KERNEL[0]}.{URING_MIN_KERNEL[1]}, io_uring цикл не используется.")
+        return False
+    try:
+        importlib.import_module(module_name).install()
+    except ImportError:
+        system_logger.warning(
+            f"event_loop: Модуль io_uring цикла '{module_name}' не установлен.")
+        return False
+    except Exception as e:
+        system_logger.error(
+            f"event_loop: Не удалось установить io_uring цикл '{module_name}': {e}", exc_info=True)
+        return False
+    return True
+
+
+def _tune_loop_thread() -> None:
+    """
+    Привязывает текущий поток (в нем будет работать цикл событий) к ядру settings.EVENT_LOOP_CPU
+    и меняет его приоритет на settings.EVENT_LOOP_NICE, чтобы планировщик ОС не переносил поток
+    приема цен между ядрами. Ошибки (не Linux, нет прав) только логируются.
+    """
+    cpu = getattr(settings, "EVENT_LOOP_CPU", None)
+    nice_increment = getattr(settings, "EVENT_LOOP_NICE", 0)
+    if cpu is not None:
+        if not hasattr(os, "sched_setaffinity"):
+            system_logger.info("event_loop: Привязка к ядру CPU недоступна на этой платформе.")
+        else:
+            try:
+                if _original_thread_settings["affinity"] is None:
+                    _original_thread_settings["affinity"] = os.sched_getaffinity(0)
+                os.sched_setaffinity(0, {cpu})
+                system_logger.info(f"event_loop: Поток цикла событий привязан к ядру CPU {cpu}.")
+            except OSError as e:
+                system_logger.warning(f"event_loop: Не удалось привязать поток к ядру CPU {cpu}: {e!r}")
+    if nice_increment:
+        try:
+            if _original_thread_settings["nice"] is None:
+                _original_thread_settings["nice"] = os.nice(0)
+            os.nice(nice_increment)
+            system_logger.info(f"event_loop: Приоритет потока цикла событий изменен на {nice_increment}.")
+        except (OSError, AttributeError) as e:
+            system_logger.warning(f"event_loop: Не удалось изменить приоритет (nice {nice_increment}): {e!r}")
+
+
+def restore_worker_thread() -> None:
+    """
+    initializer для пулов потоков (REST_EXECUTOR, default executor цикла): возвращает рабочему потоку
+    исходные привязку к ядрам и nice, унаследованные от потока цикла событий после _tune_loop_thread.
+    Иначе REST-вызовы, запись позиций и т.п. делили бы одно ядро с приемом цен.
+    """
+    affinity = _original_thread_settings["affinity"]
+    if affinity is not None:
+        try:
+            os.sched_setaffinity(0, affinity)
+        except OSError as e:
+            system_logger.warning(f"event_loop: Не удалось восстановить привязку рабочего потока к ядрам: {e!r}")
+    original_nice = _original_thread_settings["nice"]
+    if original_nice is not None:
+        try:
+            current_nice = os.nice(0)
+            if current_nice != original_nice:
+                os.nice(original_nice - current_nice)
+        except OSError as e:
+            # Понижение nice (повышение приоритета) требует CAP_SYS_NICE
+            system_logger.warning(f"event_loop: Не удалось восстановить приоритет рабочего потока: {e!r}")
+
+
+async def _run_with_default_executor(main_coro):
+    # Стандартный executor (asyncio.to_thread, run_in_executor(None, ...)) - с восстановлением настроек потока
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(thread_name_prefix="asyncio-default", initializer=restore_worker_thread))
+    return await main_coro
+
+
+def _select_loop_factory():
+    """
+    Выбирает наиболее быстрый доступный цикл событий.
+    Порядок: io_uring цикл (если задан settings.EVENT_LOOP_URING_MODULE и ядро Linux >= 5.11;
+    модуль сам устанавливает свою политику), затем uvloop, иначе стандартный цикл asyncio.
+    Возвращает (имя цикла, loop_factory или None для цикла текущей политики).
+    """
+    uring_module = getattr(settings, "EVENT_LOOP_URING_MODULE", None)
+    if uring_module and _try_install_uring_loop(uring_module):
+        return uring_module, None
+    if uvloop is not None:
+        return "uvloop", uvloop.new_event_loop
+    return "asyncio", None
+
+
+def run_event_loop(main_coro):
+    """
+    Аналог asyncio.run(main_coro) с выбором цикла событий через loop_factory (asyncio.Runner, Python 3.11+),
+    без изменения глобальной политики. На Windows и без uvloop используется стандартный цикл.
+    """
+    _tune_loop_thread()
+    loop_name, loop_factory = _select_loop_factory()
+    system_logger.info(f"event_loop: Используется цикл событий '{loop_name}'.")
+    if hasattr(asyncio, "Runner"):
+        with asyncio.Runner(loop_factory=loop_factory) as runner:
+            return runner.run(_run_with_default_executor(main_coro))
+    # Python < 3.11: asyncio.Runner недоступен, uvloop подключается через политику
+    if loop_factory is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return asyncio.run(_run_with_default_executor(main_coro))
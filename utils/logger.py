@@ -1,12 +1,80 @@
 # utils/logger.py
+import atexit
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import time
+from collections import OrderedDict
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+try:
+    from colorama import Fore, Style  # Опционально: цвет уровня записи в консоли
+except ImportError:
+    Fore = Style = None
 
 LOG_DIR = "logs"
 # Убедимся, что директория для логов существует
 os.makedirs(LOG_DIR, exist_ok=True)
 
+# Фоновые QueueListener по имени логгера: запись в файлы и консоль идет в их потоках
+_queue_listeners = {}
+
+
+def _move_handlers_to_queue(logger: logging.Logger) -> None:
+    """
+    Переносит обработчики логгера за QueueHandler: вызывающий поток только кладет запись в очередь,
+    а файловый/консольный вывод выполняет QueueListener в фоновом потоке.
+    """
+    handlers = list(logger.handlers)
+    if not handlers:
+        return
+    log_queue = queue.SimpleQueue()
+    for handler in handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _queue_listeners[logger.name] = listener
+
+
+def stop_log_listeners() -> None:
+    """Останавливает фоновые QueueListener, дописав накопленные записи (вызывается при завершении процесса)."""
+    while _queue_listeners:
+        _, listener = _queue_listeners.popitem()
+        listener.stop()
+
+
+atexit.register(stop_log_listeners)
+
+
+class ColorFormatter(logging.Formatter):
+    """
+    Консольный форматтер: окрашивает строку по уровню записи (WARNING и выше).
+    Цвет добавляется при форматировании в потоке QueueListener, а не в месте вызова логгера,
+    и только если вывод идет в терминал и установлен colorama.
+    """
+
+    def __init__(self, fmt=None, datefmt=None, use_color: bool = True):
+        super().__init__(fmt, datefmt)
+        self.level_colors = {}
+        if use_color and Fore is not None:
+            self.level_colors = {
+                logging.WARNING: Fore.YELLOW,
+                logging.ERROR: Fore.RED,
+                logging.CRITICAL: Fore.RED + Style.BRIGHT,
+            }
+
+    def format(self, record):
+        message = super().format(record)
+        color = self.level_colors.get(record.levelno)
+        return f"{color}{message}{Style.RESET_ALL}" if color else message
+
+
+def _is_tty(stream) -> bool:
+    isatty = getattr(stream, "isatty", None)
+    return bool(isatty and isatty())
+
+
 # --- Общая функция для настройки логгеров ---
 def configure_logger(
     logger_name: str,
@@ -15,13 +83,16 @@ def configure_logger(
     formatter_string: str = '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     max_bytes: int = 5 * 1024 * 1024,  # 5 MB
     backup_count: int = 5,
-    add_console_handler: bool = False  # По умолчанию не добавляем консольный вывод для всех логгеров
+    add_console_handler: bool = False,  # По умолчанию не добавляем консольный вывод для всех логгеров
+    use_queue: bool = True  # Вывод через QueueHandler/QueueListener (в фоновом потоке)
 ):
     """
     Configures and returns a logger instance with file rotation.
     Prevents duplicate handlers from being added.
     """
     logger = logging.getLogger(logger_name)
+    if logger_name in _queue_listeners:
+        return logger  # Уже настроен: обработчики работают в фоновом QueueListener
 
 
     if not logger.level or logger.level > level:
@@ -47,12 +118,15 @@ def configure_logger(
     if add_console_handler:
         has_console_handler = any(isinstance(h, logging.StreamHandler) and not isinstance(h, logging.FileHandler) for h in logger.handlers)
         if not has_console_handler:
-            console_formatter = logging.Formatter(formatter_string if formatter_string else '%(levelname)s: %(message)s')
             console_handler = logging.StreamHandler()
+            console_formatter = ColorFormatter(formatter_string if formatter_string else '%(levelname)s: %(message)s',
+                                               use_color=_is_tty(console_handler.stream))
             console_handler.setFormatter(console_formatter)
             console_handler.setLevel(level) # Уровень для консоли может быть таким же или другим
             logger.addHandler(console_handler)
-            
+
+    if use_queue:
+        _move_handlers_to_queue(logger)
     return logger
 
 #  Initializing specific loggers for the project
@@ -77,6 +151,29 @@ test_logger = configure_logger(
     add_console_handler=True 
 )
 
+# --- Ограничение частоты полных трейсбеков ---
+TRACEBACK_WINDOW_SEC = 60.0
+_TRACEBACK_CACHE_MAX = 256
+_last_traceback_at = OrderedDict()
+
+
+def did_log_recently(key, window_sec: float = TRACEBACK_WINDOW_SEC) -> bool:
+    """
+    Возвращает True, если для key уже логировался полный трейсбек за последние window_sec секунд.
+    Иначе запоминает текущий момент и возвращает False.
+    Используется как exc_info=not did_log_recently(...) на путях, где ошибка может повторяться каждый тик.
+    """
+    now = time.monotonic()
+    last = _last_traceback_at.get(key)
+    if last is not None and now - last < window_sec:
+        return True
+    _last_traceback_at[key] = now
+    _last_traceback_at.move_to_end(key)
+    if len(_last_traceback_at) > _TRACEBACK_CACHE_MAX:
+        _last_traceback_at.popitem(last=False)
+    return False
+
+
 def get_system_logger():
     return system_logger
 
@@ -0,0 +1,87 @@
+# utils/loop_queue.py
+import asyncio
+
+import numpy as np
+
+
+class LoopQueue:
+    """
+    Кольцевая очередь один производитель / один потребитель в одном цикле событий.
+    Вместо внутренних Future/блокировок asyncio.Queue - список фиксированного размера с индексами
+    head/tail и одно asyncio.Event для пробуждения потребителя.
+    При переполнении вытесняется самый старый элемент (put_nowait никогда не блокирует).
+    Не потокобезопасна: из других потоков класть только через loop.call_soon_threadsafe(queue.put_nowait, item).
+    """
+
+    def __init__(self, maxsize: int):
+        if maxsize <= 0:
+            raise ValueError("maxsize должна быть положительной")
+        self._buf = [None] * maxsize
+        self._capacity = maxsize
+        # Абсолютные счетчики чтения и записи; позиция в буфере - остаток от деления на capacity
+        self._head = 0
+        self._tail = 0
+        self._evt = asyncio.Event()
+        self.high_water = 0  # Максимальная наблюдавшаяся длина очереди (признак обратного давления)
+        self.dropped = 0     # Сколько элементов вытеснено при переполнении за все время
+
+    def put_nowait(self, item) -> None:
+        tail = self._tail
+        if tail - self._head == self._capacity:
+            self._head += 1  # Очередь полна - вытесняем самый старый элемент
+            self.dropped += 1
+        self._buf[tail % self._capacity] = item
+        self._tail = tail + 1
+        size = self._tail - self._head
+        if size > self.high_water:
+            self.high_water = size
+        self._evt.set()
+
+    async def get(self):
+        while self._head == self._tail:
+            self._evt.clear()
+            await self._evt.wait()
+        return self.get_nowait()
+
+    def get_nowait(self):
+        head = self._head
+        if head == self._tail:
+            raise asyncio.QueueEmpty
+        self._head = head + 1
+        return self._buf[head % self._capacity]
+
+    def pop_all(self) -> list:
+        """Забирает все накопившиеся элементы одним списком (в порядке поступления)."""
+        head, tail, cap, buf = self._head, self._tail, self._capacity, self._buf
+        self._head = tail
+        return [buf[i % cap] for i in range(head, tail)]
+
+    def qsize(self) -> int:
+        return self._tail - self._head
+
+    def empty(self) -> bool:
+        return self._head == self._tail
+
+
+class PriceQueue(LoopQueue):
+    """
+    LoopQueue для цен закрытия: элементы хранятся в предвыделенном float64-массиве вместо списка
+    объектов Python. pop_all возвращает пачку сразу как np.ndarray (одно-два копирования среза),
+    которую можно без преобразований передать в PriceRingBuffer.extend и IndicatorState.update_many.
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize)
+        self._buf = np.empty(maxsize, dtype=np.float64)
+
+    def get_nowait(self) -> float:
+        return float(super().get_nowait())
+
+    def pop_all(self) -> np.ndarray:
+        head, tail, cap, buf = self._head, self._tail, self._capacity, self._buf
+        self._head = tail
+        start = head % cap
+        end = start + (tail - head)
+        if end <= cap:
+            return buf[start:end].copy()
+        return np.concatenate((buf[start:], buf[:end - cap]))
@@ -1,8 +1,12 @@
+import asyncio
 import json
 import os
 from aiogram import Bot
 from dotenv import load_dotenv
 
+from utils.logger import system_logger
+from utils.loop_queue import LoopQueue
+
 load_dotenv()
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 bot = Bot(token=TELEGRAM_TOKEN)
@@ -20,5 +24,79 @@ async def send_notification(text: str):
         try:
             await bot.send_message(chat_id=chat_id, text=text)
         except Exception as e:
-            print(f"❌ Ошибка при отправке уведомления: {e}")
+            system_logger.error(f"❌ Ошибка при отправке уведомления: {e}")
+
+
+# --- Фоновая очередь уведомлений ---
+NOTIFICATION_QUEUE_MAXSIZE = 256   # При переполнении вытесняются самые старые сообщения
+TELEGRAM_MESSAGE_MAX_LEN = 4096    # Лимит длины одного сообщения Telegram
+NOTIFICATION_FLUSH_TIMEOUT_SEC = 5.0
+
+# Очередь и задача-отправитель привязаны к циклу событий, в котором созданы
+_notifier_state = {"loop": None, "queue": None, "task": None}
+_STOP = object()  # Маркер завершения отправителя (flush_notifications)
+
+
+def _join_batch(texts: list) -> list:
+    """Склеивает накопившиеся уведомления в как можно меньшее число сообщений не длиннее лимита Telegram."""
+    messages, current = [], ""
+    for text in texts:
+        candidate = f"{current}\n\n{text}" if current else text
+        if len(candidate) <= TELEGRAM_MESSAGE_MAX_LEN:
+            current = candidate
+            continue
+        if current:
+            messages.append(current)
+        current = text[:TELEGRAM_MESSAGE_MAX_LEN]
+    if current:
+        messages.append(current)
+    return messages
+
 
+async def _notification_worker(queue: LoopQueue) -> None:
+    """Единственный отправитель: забирает все накопившиеся уведомления и отправляет их пачкой."""
+    while True:
+        batch = [await queue.get()]
+        batch.extend(queue.pop_all())
+        stop = any(item is _STOP for item in batch)
+        texts = [item for item in batch if item is not _STOP]
+        for message in _join_batch(texts):
+            await send_notification(message)
+        if stop:
+            return
+
+
+def notify(text: str) -> None:
+    """
+    Ставит уведомление в очередь и сразу возвращается: торговый путь не ждет Telegram.
+    Отправитель запускается лениво в текущем цикле событий. Вызывать из потока цикла событий.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        system_logger.warning(f"notify: Нет работающего цикла событий, уведомление не отправлено: {text[:100]!r}")
+        return
+    state = _notifier_state
+    task = state["task"]
+    if state["loop"] is not loop or task is None or task.done():
+        queue = LoopQueue(maxsize=NOTIFICATION_QUEUE_MAXSIZE)
+        state["loop"] = loop
+        state["queue"] = queue
+        state["task"] = loop.create_task(_notification_worker(queue), name="notifier")
+    state["queue"].put_nowait(text)
+
+
+async def flush_notifications(timeout: float = NOTIFICATION_FLUSH_TIMEOUT_SEC) -> None:
+    """Отправляет все уведомления из очереди и останавливает отправителя (при завершении торговой сессии)."""
+    state = _notifier_state
+    task = state["task"]
+    if task is None or task.done() or state["loop"] is not asyncio.get_running_loop():
+        return
+    state["queue"].put_nowait(_STOP)
+    state["task"] = None
+    try:
+        await asyncio.wait_for(task, timeout)
+    except asyncio.TimeoutError:
+        system_logger.warning("flush_notifications: Не все уведомления отправлены за отведенное время.")
+    except Exception as e:
+        system_logger.error(f"flush_notifications: Ошибка отправителя уведомлений: {e!r}")
@@ -1,80 +1,75 @@
 # utils/position_manager.py
-import os
-import json
 from utils.logger import trading_logger, system_logger
 from services.binance_client import client
+from utils.quantity_utils import get_symbol_meta
+from utils.position_store import (position_path, get_position, set_position, flush_positions,
+                                  clear_position as store_clear_position)
 
 
 def get_last_buy_price_path(symbol: str) -> str:
     """Возвращает путь к файлу с ценой последней покупки."""
-    return f"data/last_buy_price_{symbol}.json"
+    return position_path(symbol)
 
 
 def has_open_position(symbol: str) -> bool:
     """True, если есть сохранённая цена покупки (открыта позиция)."""
-    return os.path.exists(get_last_buy_price_path(symbol))
+    return get_position(symbol) is not None
 
 
-def save_last_buy_price(symbol: str, price: float):
-    """Сохраняет цену покупки в файл. Не сохраняет, если уже есть активная позиция."""
-    path = get_last_buy_price_path(symbol)
-    if os.path.exists(path):
+def save_last_buy_price(symbol: str, price: float, quantity: float | None = None):
+    """
+    Сохраняет цену покупки (и исполненное количество, если известно) в памяти; на диск её записывает
+    position_flusher. Не сохраняет, если уже есть активная позиция.
+    """
+    if not set_position(symbol, price, quantity=quantity):
         trading_logger.warning(
             f"save_last_buy_price: позиция по {symbol} уже существует. Повторная покупка отменена.")
         return
-    try:
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump({"price": price}, f)
-        trading_logger.info(f"Цена покупки сохранена для {symbol}: {price}")
-    except Exception as e:
-        system_logger.error(
-            f"Ошибка сохранения цены покупки для {symbol}: {e}", exc_info=True)
+    trading_logger.info(f"Цена покупки сохранена для {symbol}: {price}")
 
 
 def load_last_buy_price(symbol: str) -> float | None:
-    """Загружает цену покупки. Возвращает None, если нет позиции."""
-    path = get_last_buy_price_path(symbol)
-    if not os.path.exists(path):
+    """Цена покупки открытой позиции. Возвращает None, если нет позиции."""
+    entry = get_position(symbol)
+    if entry is None:
         return None
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return float(data.get("price")) if "price" in data else None
-    except Exception as e:
-        system_logger.warning(
-            f"Ошибка загрузки цены покупки для {symbol}: {e}", exc_info=True)
+        return float(entry["price"])
+    except (TypeError, ValueError) as e:
+        system_logger.warning(f"Некорректная цена покупки для {symbol}: {entry!r} ({e})")
         return None
 
 
+def load_position_cache(symbol: str) -> dict:
+    """
+    Снимок позиции для горячего цикла price_processor: {"open": bool, "last_buy_price": float | None}.
+    Позиции хранятся в памяти (utils.position_store), диск читается только при первом обращении к символу.
+    """
+    last_buy_price = load_last_buy_price(symbol)
+    return {"open": has_open_position(symbol), "last_buy_price": last_buy_price}
+
+
 def clear_position(symbol: str):
-    """Удаляет файл с позицией — вызывать после продажи. Игнорирует повторный вызов."""
-    path = get_last_buy_price_path(symbol)
-    try:
-        if os.path.exists(path):
-            os.remove(path)
-            trading_logger.info(
-                f"Файл позиции удалён для {symbol} (позиция закрыта)")
-        else:
-            trading_logger.debug(
-                f"clear_position: позиция по {symbol} уже была закрыта ранее.")
-    except Exception as e:
-        system_logger.error(
-            f"Ошибка удаления позиции для {symbol}: {e}", exc_info=True)
+    """Закрывает позицию (файл удаляет position_flusher) — вызывать после продажи. Игнорирует повторный вызов."""
+    if store_clear_position(symbol):
+        trading_logger.info(f"Позиция по {symbol} закрыта")
+    else:
+        trading_logger.debug(
+            f"clear_position: позиция по {symbol} уже была закрыта ранее.")
 
 
-def position_manager(profile):
+def sync_position_from_binance(profile):
     """
     Если на счету есть монета, но файл last_buy_price отсутствует — 
     сохраняет среднюю цену последней покупки и количество по всем трейдам последнего BUY-ордера.
     """
     symbol = profile.SYMBOL
-    base_asset = symbol.replace('USDT', '')
-    file_path = get_last_buy_price_path(symbol)
+    meta = get_symbol_meta(symbol)
+    base_asset = meta.base if meta is not None else symbol.removesuffix('USDT')
 
-    if os.path.exists(file_path):
+    if has_open_position(symbol):
         trading_logger.info(
-            f"position_manager: Позиция по {symbol} уже синхронизирована.")
+            f"sync_position_from_binance: Позиция по {symbol} уже синхронизирована.")
         return
 
     try:
@@ -87,7 +82,7 @@ def position_manager(profile):
                 break
         if not balance or balance < 1e-8:
             trading_logger.info(
-                f"position_manager: Баланс {base_asset} отсутствует или слишком мал.")
+                f"sync_position_from_binance: Баланс {base_asset} отсутствует или слишком мал.")
             return
 
         # 2. Получаем трейды (исполнения) только на покупку
@@ -95,7 +90,7 @@ def position_manager(profile):
         buy_trades = [t for t in trades if t.get('isBuyer')]
         if not buy_trades:
             trading_logger.warning(
-                f"position_manager: Нет трейдов на покупку по {symbol}.")
+                f"sync_position_from_binance: Нет трейдов на покупку по {symbol}.")
             return
 
         # 3. Ищем orderId последней покупки
@@ -119,14 +114,13 @@ def position_manager(profile):
 
         if total_qty == 0:
             trading_logger.warning(
-                f"position_manager: Итоговое количество по последней покупке = 0.")
+                f"sync_position_from_binance: Итоговое количество по последней покупке = 0.")
             return
 
         avg_price = total_cost / total_qty
 
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump({"price": avg_price, "quantity": total_qty}, f)
+        set_position(symbol, avg_price, quantity=total_qty)
+        flush_positions()  # Уже в рабочем потоке (run_rest_call): пишем сразу
         trading_logger.info(
             f"🔄 Синхронизирована позиция по {symbol}: средняя цена {avg_price}, количество {total_qty}"
         )
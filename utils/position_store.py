@@ -0,0 +1,125 @@
+# utils/position_store.py
+import asyncio
+import json
+import os
+import threading
+
+from utils.logger import system_logger
+
+POSITIONS_DIR = "data"
+POSITION_FLUSH_INTERVAL_SEC = 1.0  # Период фоновой записи изменённых позиций на диск
+
+# Открытые позиции в памяти: symbol -> {"price": float, ...}; None - позиции нет (файла нет).
+# Символ попадает в словарь при первом обращении (один раз читается его файл).
+_positions: dict = {}
+_dirty: set = set()                 # Символы, изменённые в памяти и ещё не записанные на диск
+_positions_lock = threading.Lock()  # Торговый цикл и поток записи обращаются к словарю одновременно
+_flush_lock = threading.Lock()      # Не даём двум записям одного файла обогнать друг друга
+
+
+def position_path(symbol: str) -> str:
+    """Возвращает путь к файлу позиции (цена последней покупки)."""
+    return os.path.join(POSITIONS_DIR, f"last_buy_price_{symbol}.json")
+
+
+def _read_position_file(symbol: str) -> dict | None:
+    path = position_path(symbol)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        system_logger.warning(f"Ошибка чтения файла позиции {path}: {e}", exc_info=True)
+        return None
+    return data if isinstance(data, dict) and "price" in data else None
+
+
+def _entry(symbol: str) -> dict | None:
+    # Вызывается под _positions_lock
+    if symbol not in _positions:
+        _positions[symbol] = _read_position_file(symbol)
+    return _positions[symbol]
+
+
+def get_position(symbol: str) -> dict | None:
+    """Копия записи открытой позиции или None. Диск читается только при первом обращении к символу."""
+    with _positions_lock:
+        entry = _entry(symbol)
+        return dict(entry) if entry is not None else None
+
+
+def set_position(symbol: str, price: float, quantity: float | None = None) -> bool:
+    """Открывает позицию в памяти. False, если позиция по символу уже открыта (повторная покупка)."""
+    entry = {"price": price} if quantity is None else {"price": price, "quantity": quantity}
+    with _positions_lock:
+        if _entry(symbol) is not None:
+            return False
+        _positions[symbol] = entry
+        _dirty.add(symbol)
+    return True
+
+
+def clear_position(symbol: str) -> bool:
+    """Закрывает позицию в памяти. False, если позиции не было."""
+    with _positions_lock:
+        if _entry(symbol) is None:
+            return False
+        _positions[symbol] = None
+        _dirty.add(symbol)
+    return True
+
+
+def _write_atomic(path: str, data: dict) -> None:
+    # Запись во временный файл и os.replace: читатель видит либо старую, либо новую позицию целиком
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def flush_positions() -> int:
+    """
+    Записывает на диск позиции, изменённые после прошлой записи. Блокирующая: из цикла событий
+    вызывать через flush_positions_async. Возвращает количество записанных символов.
+    """
+    with _flush_lock:
+        with _positions_lock:
+            snapshot = {symbol: _positions[symbol] for symbol in _dirty}
+            _dirty.clear()
+        written = 0
+        for symbol, entry in snapshot.items():
+            path = position_path(symbol)
+            try:
+                if entry is None:
+                    if os.path.exists(path):
+                        os.remove(path)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    _write_atomic(path, entry)
+                written += 1
+            except Exception as e:
+                system_logger.error(f"Ошибка записи позиции {symbol} в {path}: {e}", exc_info=True)
+                with _positions_lock:
+                    _dirty.add(symbol)  # Повторим при следующей записи
+        return written
+
+
+async def flush_positions_async() -> int:
+    """flush_positions в рабочем потоке: файловые операции не блокируют цикл событий."""
+    if not _dirty:
+        return 0
+    return await asyncio.to_thread(flush_positions)
+
+
+async def position_flusher(stop_event: asyncio.Event, interval: float = POSITION_FLUSH_INTERVAL_SEC) -> None:
+    """Фоновая задача: раз в interval секунд записывает изменённые позиции, при остановке - финальная запись."""
+    try:
+        while not stop_event.is_set():
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            await flush_positions_async()
+    finally:
+        await flush_positions_async()
@@ -0,0 +1,62 @@
+# utils/price_ring_buffer.py
+import numpy as np
+
+
+class PriceRingBuffer:
+    """
+    Кольцевой буфер цен фиксированной емкости без копирования на каждом тике.
+    Каждое значение пишется дважды (в позицию head и head + capacity) в массив двойной длины,
+    поэтому последние len(self) цен всегда лежат непрерывным срезом и view() возвращает
+    C-contiguous float64 представление, пригодное для TA-Lib, без np.concatenate.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity должна быть положительной")
+        self._capacity = capacity
+        self._buf = np.zeros(2 * capacity, dtype=np.float64)
+        self._head = 0
+        self._count = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, value: float) -> None:
+        head = self._head
+        self._buf[head] = value
+        self._buf[head + self._capacity] = value
+        self._head = head + 1 if head + 1 < self._capacity else 0
+        if self._count < self._capacity:
+            self._count += 1
+
+    def extend(self, values) -> None:
+        # Берем только последние capacity значений - остальные все равно были бы вытеснены.
+        # Копируем не более чем двумя срезами (до конца кольца и с его начала) в обе половины буфера,
+        # без поэлементного append и упаковки каждого значения в float.
+        values = np.asarray(values, dtype=np.float64)[-self._capacity:]
+        n = values.shape[0]
+        if n == 0:
+            return
+        cap = self._capacity
+        head = self._head
+        first = min(n, cap - head)
+        self._buf[head:head + first] = values[:first]
+        self._buf[head + cap:head + cap + first] = values[:first]
+        rest = n - first
+        if rest:
+            self._buf[:rest] = values[first:]
+            self._buf[cap:cap + rest] = values[first:]
+        self._head = (head + n) % cap
+        self._count = min(self._count + n, cap)
+
+    def view(self) -> np.ndarray:
+        """
+        Возвращает последние len(self) цен в хронологическом порядке (без копирования).
+        Представление действительно до следующего append: не сохраняйте его между тиками.
+        """
+        end = self._head + self._capacity
+        return self._buf[end - self._count:end]
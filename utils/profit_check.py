@@ -2,15 +2,39 @@
 
 import json
 import os
-import asyncio
 
 # Глобальные настройки, такие как MIN_PROFIT_RATIO, STOP_LOSS_RATIO и т.д.
 from config import settings 
 # Асинхронные уведомления
-from utils.notifier import send_notification 
+from utils.notifier import notify
 # Логгер для торговых операций
 from utils.logger import trading_logger, system_logger 
 from decimal import Decimal, getcontext
+from typing import NamedTuple
+
+
+class RiskParams(NamedTuple):
+    """Флаги и пороги риск-менеджмента, прочитанные из settings один раз на сессию."""
+    use_stop_loss: bool
+    stop_loss_ratio: float
+    use_take_profit: bool
+    take_profit_ratio: float
+    use_min_profit: bool
+    min_profit_ratio: float
+    use_min_profit_for_strategy_sell: bool
+
+
+def load_risk_params() -> RiskParams:
+    """Снимает текущие значения USE_*/..._RATIO из settings для передачи в горячий цикл."""
+    return RiskParams(
+        use_stop_loss=getattr(settings, 'USE_STOP_LOSS', False),
+        stop_loss_ratio=getattr(settings, 'STOP_LOSS_RATIO', -0.02),
+        use_take_profit=getattr(settings, 'USE_TAKE_PROFIT', False),
+        take_profit_ratio=getattr(settings, 'TAKE_PROFIT_RATIO', 0.05),
+        use_min_profit=getattr(settings, 'USE_MIN_PROFIT', False),
+        min_profit_ratio=getattr(settings, 'MIN_PROFIT_RATIO', 0.01),
+        use_min_profit_for_strategy_sell=bool(getattr(settings, 'USE_MIN_PROFIT_FOR_STRATEGY_SELL', False)),
+    )
 
 
 def get_last_buy_price_path(symbol: str) -> str:
@@ -44,10 +68,10 @@ def save_last_buy_price(symbol: str, price: float):
     except IOError as e:
         trading_logger.error(f"Profit Check ({symbol}): Ошибка записи файла цены покупки '{path}': {e}", exc_info=True)
         # ВАЖНО: Рассмотреть отправку критического уведомления, если цена не может быть сохранена
-        asyncio.create_task(send_notification(f"🆘 КРИТИЧЕСКАЯ ОШИБКА: Не удалось сохранить цену покупки для {symbol}! Ручная проверка!"))
+        notify(f"🆘 КРИТИЧЕСКАЯ ОШИБКА: Не удалось сохранить цену покупки для {symbol}! Ручная проверка!")
     except Exception as e:
         trading_logger.error(f"Profit Check ({symbol}): Непредвиденная ошибка при сохранении цены покупки '{path}': {e}", exc_info=True)
-        asyncio.create_task(send_notification(f"🆘 КРИТИЧЕСКАЯ ОШИБКА: Непредвиденная ошибка при сохранении цены покупки для {symbol}!"))
+        notify(f"🆘 КРИТИЧЕСКАЯ ОШИБКА: Непредвиденная ошибка при сохранении цены покупки для {symbol}!")
 
 
 def load_last_buy_price(symbol: str) -> float | None:
@@ -81,7 +105,8 @@ def load_last_buy_price(symbol: str) -> float | None:
         return None
 
 
-def is_enough_profit(symbol: str, current_price: float, last_buy_price: float | None, context: str = "") -> bool:
+def is_enough_profit(symbol: str, current_price: float, last_buy_price: float | None, context: str = "",
+                     enabled: bool | None = None, ratio: float | None = None) -> bool:
     """
     Проверяет, достигнут ли минимальный профит.
 
@@ -90,11 +115,15 @@ def is_enough_profit(symbol: str, current_price: float, last_buy_price: float |
         current_price (float): Текущая цена.
         last_buy_price (float | None): Цена покупки.
         context (str): Источник вызова ("risk" или "strategy").
+        enabled (bool | None): Флаг проверки. None - берется settings.USE_MIN_PROFIT.
+        ratio (float | None): Порог профита. None - берется settings.MIN_PROFIT_RATIO.
 
     Returns:
         bool: True, если минимальный профит достигнут.
     """
-    if not getattr(settings, 'USE_MIN_PROFIT', False):
+    if enabled is None:
+        enabled = getattr(settings, 'USE_MIN_PROFIT', False)
+    if not enabled:
         return False
 
     if last_buy_price is None or last_buy_price <= 0:
@@ -102,7 +131,7 @@ def is_enough_profit(symbol: str, current_price: float, last_buy_price: float |
             trading_logger.debug(f"[MinProfit] {symbol}: Нет last_buy_price — считаем профит допустимым.")
         return True
 
-    min_profit_ratio = getattr(settings, 'MIN_PROFIT_RATIO', 0.01)
+    min_profit_ratio = ratio if ratio is not None else getattr(settings, 'MIN_PROFIT_RATIO', 0.01)
     target_price = last_buy_price * (1 + min_profit_ratio)
     price_change_ratio = (current_price - last_buy_price) / last_buy_price
     profit_pct = price_change_ratio * 100
@@ -124,7 +153,8 @@ def is_enough_profit(symbol: str, current_price: float, last_buy_price: float |
             )
         return False
     
-def is_stop_loss_triggered(symbol: str, current_price: float, last_buy_price: float | None) -> bool:
+def is_stop_loss_triggered(symbol: str, current_price: float, last_buy_price: float | None,
+                           enabled: bool | None = None, ratio: float | None = None) -> bool:
     """
     Проверяет, сработал ли стоп-лосс на основе STOP_LOSS_RATIO.
 
@@ -132,18 +162,22 @@ def is_stop_loss_triggered(symbol: str, current_price: float, last_buy_price: fl
         symbol (str): Торговый символ.
         current_price (float): Текущая рыночная цена актива.
         last_buy_price (float | None): Цена последней покупки. Если None, стоп-лосс не может сработать.
+        enabled (bool | None): Флаг стоп-лосса. None - берется settings.USE_STOP_LOSS.
+        ratio (float | None): Порог стоп-лосса. None - берется settings.STOP_LOSS_RATIO.
 
     Returns:
         bool: True, если убыток достиг или превысил порог стоп-лосса, иначе False.
     """
-    if not getattr(settings, 'USE_STOP_LOSS', False): # Проверяем флаг из настроек
+    if enabled is None:
+        enabled = getattr(settings, 'USE_STOP_LOSS', False) # Проверяем флаг из настроек
+    if not enabled:
         return False
 
     if last_buy_price is None or last_buy_price <= 0:
         trading_logger.debug(f"Stop-Loss Check ({symbol}): Проверка невозможна - нет корректной цены покупки (цена: {last_buy_price}).")
         return False
 
-    stop_loss_ratio = getattr(settings, 'STOP_LOSS_RATIO', -0.02) # Ожидается отрицательное значение
+    stop_loss_ratio = ratio if ratio is not None else getattr(settings, 'STOP_LOSS_RATIO', -0.02) # Ожидается отрицательное значение
 
     # Рассчитываем процент изменения цены
     # (цена_продажи - цена_покупки) / цена_покупки
@@ -168,7 +202,8 @@ def is_stop_loss_triggered(symbol: str, current_price: float, last_buy_price: fl
     return triggered
 
 
-def is_take_profit_reached(symbol: str, current_price: float, last_buy_price: float | None) -> bool:
+def is_take_profit_reached(symbol: str, current_price: float, last_buy_price: float | None,
+                           enabled: bool | None = None, ratio: float | None = None) -> bool:
     """
     Проверяет, достигнут ли тейк-профит на основе TAKE_PROFIT_RATIO.
 
@@ -176,18 +211,22 @@ def is_take_profit_reached(symbol: str, current_price: float, last_buy_price: fl
         symbol (str): Торговый символ.
         current_price (float): Текущая рыночная цена актива.
         last_buy_price (float | None): Цена последней покупки. Если None, тейк-профит не может быть достигнут.
+        enabled (bool | None): Флаг тейк-профита. None - берется settings.USE_TAKE_PROFIT.
+        ratio (float | None): Порог тейк-профита. None - берется settings.TAKE_PROFIT_RATIO.
 
     Returns:
         bool: True, если прибыль достигла или превысила порог тейк-профита, иначе False.
     """
-    if not getattr(settings, 'USE_TAKE_PROFIT', False):
+    if enabled is None:
+        enabled = getattr(settings, 'USE_TAKE_PROFIT', False)
+    if not enabled:
         return False
 
     if last_buy_price is None or last_buy_price <= 0:
         trading_logger.debug(f"Take-Profit Check ({symbol}): Проверка невозможна — нет корректной цены покупки (цена: {last_buy_price}).")
         return False
 
-    take_profit_ratio = getattr(settings, 'TAKE_PROFIT_RATIO', 0.05)
+    take_profit_ratio = ratio if ratio is not None else getattr(settings, 'TAKE_PROFIT_RATIO', 0.05)
     target_price = last_buy_price * (1 + take_profit_ratio)
     price_change_ratio = (current_price - last_buy_price) / last_buy_price
     profit_pct = price_change_ratio * 100
@@ -1,48 +1,149 @@
+import functools
 import math
+import threading
 import time
-from services.binance_client import client
+from dataclasses import dataclass
+from services.binance_client import client, run_rest_call
 from utils.logger import trading_logger
-from decimal import Decimal
+from decimal import Decimal, ROUND_DOWN
 from typing import Tuple, Optional
 
+
+@dataclass(slots=True, frozen=True)
+class SymbolMeta:
+    """
+    Торговые правила символа из exchange_info, разобранные один раз при загрузке кеша.
+    Шаги и минимумы уже в Decimal, поэтому ордер не конвертирует строки фильтров на каждом вызове.
+    """
+    step_size: Decimal         # Шаг количества (LOT_SIZE.stepSize)
+    min_qty: Decimal           # Минимальное количество (LOT_SIZE.minQty)
+    tick_size: Decimal         # Шаг цены (PRICE_FILTER.tickSize)
+    base: str                  # Базовый актив, например 'XRP'
+    quote: str                 # Котируемый актив, например 'USDT'
+    amount_precision: int      # Знаков после запятой в количестве (по step_size)
+    price_precision: int       # Знаков после запятой в цене (по tick_size)
+
+
+def _decimal_places(step: Decimal) -> int:
+    """Число знаков после запятой у шага фильтра: Decimal('0.00100000') -> 3."""
+    return max(0, -step.normalize().as_tuple().exponent) if step > 0 else 0
+
+
+def _parse_symbol_meta(symbol_info: dict) -> Optional[SymbolMeta]:
+    filters = {f["filterType"]: f for f in symbol_info.get("filters", [])}
+    lot_size = filters.get("LOT_SIZE")
+    if lot_size is None:
+        return None
+    step_size = Decimal(lot_size["stepSize"])
+    tick_size = Decimal(filters.get("PRICE_FILTER", {}).get("tickSize", "0"))
+    return SymbolMeta(
+        step_size=step_size,
+        min_qty=Decimal(lot_size["minQty"]),
+        tick_size=tick_size,
+        base=symbol_info["baseAsset"],
+        quote=symbol_info["quoteAsset"],
+        amount_precision=_decimal_places(step_size),
+        price_precision=_decimal_places(tick_size) if tick_size > 0 else 8,
+    )
+
 # Кеш exchange_info с автообновлением
 exchange_info_cache = {
     "symbols": [],
     "last_update": 0
 }
+# Правила символов, разобранные при загрузке exchange_info: symbol -> SymbolMeta.
+# Объект словаря не заменяется при обновлении, только содержимое
+SYMBOL_META: dict[str, SymbolMeta] = {}
 AUTO_REFRESH_INTERVAL = 6 * 60 * 60  # 6 часов
+# Сессии нескольких профилей стартуют одновременно в потоках REST-пула:
+# exchange_info (несколько МБ) загружает только один из них, остальные ждут и берут кеш
+_exchange_info_lock = threading.Lock()
 
-def get_lot_size(symbol: str) -> Tuple[Optional[float], Optional[float]]:
+
+def _refresh_exchange_info_if_stale() -> None:
+    now = time.time()
+    if exchange_info_cache["symbols"] and (now - exchange_info_cache["last_update"]) <= AUTO_REFRESH_INTERVAL:
+        return
+    with _exchange_info_lock:
+        if exchange_info_cache["symbols"] and (time.time() - exchange_info_cache["last_update"]) <= AUTO_REFRESH_INTERVAL:
+            return  # Кеш обновил другой поток, пока мы ждали блокировку
+        trading_logger.info("🔄 Загрузка exchange_info от Binance...")
+        exchange_info = client.get_exchange_info()
+        symbols = exchange_info.get("symbols", [])
+        symbol_meta = {}
+        for s in symbols:
+            meta = _parse_symbol_meta(s)
+            if meta is not None:
+                symbol_meta[s["symbol"]] = meta
+        exchange_info_cache["symbols"] = symbols
+        # Сначала обновляем, потом удаляем исчезнувшие символы: читатель без блокировки
+        # (get_symbol_meta_async) никогда не видит пустой словарь
+        SYMBOL_META.update(symbol_meta)
+        for stale_symbol in SYMBOL_META.keys() - symbol_meta.keys():
+            del SYMBOL_META[stale_symbol]
+        exchange_info_cache["last_update"] = time.time()
+        trading_logger.info(f"✅ Кеш обновлён. Получено символов: {len(symbols)}")
+
+
+def get_symbol_meta(symbol: str) -> Optional[SymbolMeta]:
     """
-    Возвращает (step_size, min_qty) из фильтра 'LOT_SIZE' для заданного symbol.
-    Использует кешированный exchange_info с автообновлением.
+    Возвращает SymbolMeta символа или None, если символ или его фильтр LOT_SIZE не найден.
+    Использует кешированный exchange_info с автообновлением: после загрузки это поиск в словаре,
+    без сетевого запроса и без перебора всех символов биржи.
     """
     try:
-        now = time.time()
-        if not exchange_info_cache["symbols"] or (now - exchange_info_cache["last_update"]) > AUTO_REFRESH_INTERVAL:
-            trading_logger.info("🔄 Загрузка exchange_info от Binance...")
-            exchange_info = client.get_exchange_info()
-            exchange_info_cache["symbols"] = exchange_info.get("symbols", [])
-            exchange_info_cache["last_update"] = now
-            trading_logger.info(f"✅ Кеш обновлён. Получено символов: {len(exchange_info_cache['symbols'])}")
-
-        for s in exchange_info_cache["symbols"]:
-            if s["symbol"] == symbol:
-                for f in s["filters"]:
-                    if f["filterType"] == "LOT_SIZE":
-                        step_size = float(f["stepSize"])
-                        min_qty = float(f["minQty"])
-                        return step_size, min_qty
+        _refresh_exchange_info_if_stale()
+        meta = SYMBOL_META.get(symbol)
+        if meta is not None:
+            return meta
 
         trading_logger.warning(f"LOT_SIZE фильтр не найден для {symbol}")
 
     except Exception as e:
         trading_logger.error(f"Ошибка при получении LOT_SIZE для {symbol}: {e}", exc_info=True)
 
-    return None, None
+    return None
 
 
-def round_step_size(quantity: float, step_size: float):
-    factor = int(round(Decimal("1.0") / Decimal(str(step_size))))
-    return math.floor(quantity * factor) / factor
+async def get_symbol_meta_async(symbol: str) -> Optional[SymbolMeta]:
+    """
+    get_symbol_meta для цикла событий: при свежем кеше - поиск в словаре прямо в цикле, без перехода
+    в поток REST-пула. Загрузка exchange_info (кеш устарел или символ не найден) - через run_rest_call.
+    """
+    if (time.time() - exchange_info_cache["last_update"]) <= AUTO_REFRESH_INTERVAL:
+        meta = SYMBOL_META.get(symbol)
+        if meta is not None:
+            return meta
+    return await run_rest_call(get_symbol_meta, symbol)
+
+
+def get_lot_size(symbol: str) -> Tuple[Optional[float], Optional[float]]:
+    """Возвращает (step_size, min_qty) из фильтра 'LOT_SIZE' для заданного symbol (см. get_symbol_meta)."""
+    meta = get_symbol_meta(symbol)
+    if meta is None:
+        return None, None
+    return float(meta.step_size), float(meta.min_qty)
+
+
+def prewarm_lot_sizes(symbols) -> None:
+    """Загружает exchange_info заранее (при старте бота), чтобы первый ордер не ждал этот запрос."""
+    for symbol in symbols:
+        get_symbol_meta(symbol)
 
+
+@functools.lru_cache(maxsize=256)
+def _step_factor(step_size: float) -> int:
+    """Целочисленный множитель 1/step_size; шагов мало (по одному на символ), поэтому он кешируется."""
+    return int(round(Decimal("1.0") / Decimal(str(step_size))))
+
+
+def round_step_size(quantity, step_size):
+    """
+    Округляет количество вниз до кратного step_size.
+    Для Decimal (ордера: SymbolMeta.step_size) - точно, одной операцией без преобразований в float и строки;
+    для float - через целочисленный множитель, который считается один раз на шаг.
+    """
+    if isinstance(quantity, Decimal) and isinstance(step_size, Decimal):
+        return (quantity / step_size).to_integral_value(rounding=ROUND_DOWN) * step_size
+    factor = _step_factor(step_size)
+    return math.floor(quantity * factor) / factor